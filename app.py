@@ -2,13 +2,63 @@
 
 from __future__ import annotations
 
-from plex_tmdb import app
+import argparse
+from typing import List, Optional
 
+from plex_tmdb import app, scheduler, worker
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="plex-tmdb", description="Plex-TMDB web interface and job worker.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="run the web interface (default)")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=5000)
+    serve_parser.add_argument(
+        "--no-worker",
+        action="store_true",
+        help="only queue jobs; leave them to separate 'plex-tmdb worker' processes",
+    )
+    serve_parser.add_argument(
+        "--no-scheduler",
+        action="store_true",
+        help="do not start scheduled detection runs from this process",
+    )
+
+    worker_parser = subparsers.add_parser("worker", help="process queued detection, reprocessing and cleanup jobs")
+    worker_parser.add_argument("--threads", type=int, default=1, help="jobs to run at once (default: 1)")
+    worker_parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    worker_parser.add_argument(
+        "--kind",
+        dest="kinds",
+        action="append",
+        help="only take jobs of this kind (detection, detection_shard, reprocessing, orphan_cleanup); repeatable",
+    )
+    worker_parser.add_argument(
+        "--scheduler",
+        action="store_true",
+        help="also start the scheduled detection runs configured in config.json",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        if args.scheduler:
+            scheduler.start(app)
+        worker.run(app, threads=args.threads, once=args.once, kinds=args.kinds)
+        return
+
+    host = getattr(args, "host", "0.0.0.0")
+    port = getattr(args, "port", 5000)
+    if not getattr(args, "no_worker", False):
+        worker.start(app)
+    if not getattr(args, "no_scheduler", False):
+        scheduler.start(app)
 
-def main() -> None:
     print("Starting Plex-TMDB Web Interface...")
-    print("Access the interface at: http://localhost:5000")
-    app.run(debug=False, host="0.0.0.0", port=5000)
+    print(f"Access the interface at: http://localhost:{port}")
+    app.run(debug=False, host=host, port=port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""Measure API read latency while a writer holds SQLite write transactions.
+
+The same workload runs twice against a throwaway database: once with
+SQLite's defaults (``SQLITE_TUNING=False``) and once with the WAL/read-engine
+setup from ``plex_tmdb.database``. A writer thread imitates detection,
+inserting missing episode rows and refreshing episode metadata in transactions that stay open for a while,
+and reader threads call ``/api/get_missing_episodes`` and
+``/api/database_stats``. Read latency percentiles, failed reads and
+committed write transactions are printed for both runs.
+
+Usage::
+
+    python benchmarks/db_concurrency.py --seconds 10 --readers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from models import DetectionRun, Episode, MissingEpisode, Show, db  # noqa: E402
+from plex_tmdb import create_app  # noqa: E402
+
+
+def seed(app, shows: int, episodes: int) -> None:
+    with app.app_context():
+        run = DetectionRun(status="completed", completed_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.flush()
+        for show_index in range(shows):
+            show = Show(tmdb_id=show_index + 1, title=f"Show {show_index:04d}", year=2000 + show_index % 25)
+            db.session.add(show)
+            db.session.flush()
+            for episode_index in range(episodes):
+                episode = Episode(
+                    tmdb_id=show_index * episodes + episode_index + 1,
+                    show_id=show.id,
+                    season_number=episode_index // 10 + 1,
+                    episode_number=episode_index % 10 + 1,
+                    title=f"Episode {episode_index}",
+                    overview="x" * 1000,
+                )
+                db.session.add(episode)
+                db.session.flush()
+                db.session.add(
+                    MissingEpisode(
+                        show_id=show.id,
+                        episode_id=episode.id,
+                        detection_run_id=run.id,
+                        plex_library_id="1",
+                        plex_library_name="TV Shows",
+                    )
+                )
+        db.session.commit()
+
+
+def writer(app, stop: threading.Event, hold: float, batch: int, result: Dict[str, int]) -> None:
+    with app.app_context():
+        run = DetectionRun(status="running")
+        db.session.add(run)
+        db.session.commit()
+        show_of = dict(db.session.query(Episode.id, Episode.show_id).all())
+        episode_ids = list(show_of)
+
+        position = 0
+        while not stop.is_set():
+            try:
+                for _ in range(batch):
+                    episode_id = episode_ids[position % len(episode_ids)]
+                    position += 1
+                    db.session.add(
+                        MissingEpisode(
+                            show_id=show_of[episode_id],
+                            episode_id=episode_id,
+                            detection_run_id=run.id,
+                            plex_library_id="1",
+                            plex_library_name="TV Shows",
+                        )
+                    )
+                # Detection rewrites stored episode metadata as it goes; enough
+                # dirty pages make SQLite's default journal take the exclusive lock.
+                db.session.execute(Episode.__table__.update().values(vote_average=position % 10))
+                db.session.flush()
+                # The write lock is held while the "TMDB work" for the show runs.
+                time.sleep(hold)
+                db.session.commit()
+                result["commits"] += 1
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                result["errors"] += 1
+
+
+def reader(app, stop: threading.Event, latencies: List[float], result: Dict[str, int]) -> None:
+    client = app.test_client()
+    paths = ["/api/get_missing_episodes?limit=200&sort=show", "/api/database_stats"]
+    request_number = 0
+    while not stop.is_set():
+        # A unique query string keeps the response cache out of the measurement.
+        path = paths[request_number % len(paths)]
+        path = f"{path}{'&' if '?' in path else '?'}nocache={request_number}"
+        request_number += 1
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        body = response.get_json(silent=True) or {}
+        if response.status_code != 200 or body.get("success") is False:
+            result["errors"] += 1
+        else:
+            latencies.append(elapsed)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_benchmark(tuned: bool, args) -> Dict[str, float]:
+    workdir = Path(tempfile.mkdtemp(prefix="plex-tmdb-bench-"))
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{workdir / 'bench.db'}",
+            "SQLITE_TUNING": tuned,
+            "STATS_RECONCILE_INTERVAL": 3600,
+        }
+    )
+    seed(app, args.shows, args.episodes)
+
+    stop = threading.Event()
+    write_result = {"commits": 0, "errors": 0}
+    read_result = {"errors": 0}
+    latencies: List[float] = []
+
+    threads = [threading.Thread(target=writer, args=(app, stop, args.hold, args.batch, write_result))]
+    threads += [
+        threading.Thread(target=reader, args=(app, stop, latencies, read_result)) for _ in range(args.readers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    return {
+        "reads": len(latencies),
+        "read_errors": read_result["errors"],
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "max_ms": max(latencies, default=float("nan")) * 1000,
+        "mean_ms": (statistics.mean(latencies) if latencies else float("nan")) * 1000,
+        "write_commits": write_result["commits"],
+        "write_errors": write_result["errors"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent reader threads")
+    parser.add_argument("--shows", type=int, default=200, help="shows in the seeded database")
+    parser.add_argument("--episodes", type=int, default=30, help="episodes per seeded show")
+    parser.add_argument("--batch", type=int, default=500, help="rows written per transaction")
+    parser.add_argument("--hold", type=float, default=0.2, help="seconds each write transaction stays open")
+    args = parser.parse_args()
+
+    results = {
+        "defaults": run_benchmark(False, args),
+        "tuned": run_benchmark(True, args),
+    }
+
+    columns = list(results["defaults"].keys())
+    print(f"{'':10}" + "".join(f"{column:>14}" for column in columns))
+    for name, result in results.items():
+        print(
+            f"{name:10}"
+            + "".join(
+                f"{result[column]:>14.1f}" if isinstance(result[column], float) else f"{result[column]:>14}"
+                for column in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
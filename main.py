@@ -1,17 +1,24 @@
 import json
-import os
 import re
+import sqlite3
+import sys
+import threading
 import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
 from plexapi.server import PlexServer
 from tqdm import tqdm
 from colorama import init, Fore, Style
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 from datetime import datetime, timedelta
 import argparse
 import json
 
+from show_filters import FilterIndex, load_filter_index, show_filter_key
+
 # Initialize colorama for cross-platform terminal colors
 init()
 
@@ -19,67 +26,241 @@ init()
 PLEX_BASEURL = '****'
 PLEX_TOKEN = '****'
 TMDB_API_KEY = '****'
-CACHE_DIR = Path("./.tmdb_cache")
+CACHE_FILE = Path("./.tmdb_cache.sqlite3")
 CACHE_EXPIRY = 86400  # 24 hours in seconds
+CACHE_MAX_MB = 256
 ALT_MISSING_CHECK_METHOD = False
 IGNORE_MISSING_SEASON_IN_TMDB = False
 HIDE_UNAIRED_EPISODES = False
 AIR_DATE_OFFSET_DAYS=0
 FILTERS_FILE=None
-
-# Create cache directory if it doesn't exist
-CACHE_DIR.mkdir(exist_ok=True)
-
-showFilters=None
-
-
-def get_cached_response(cache_file, url, params=None):
+JOBS = 1
+RATE_LIMIT = 40  # TMDB requests per second, shared by all workers
+
+showFilters=FilterIndex()
+cache=None
+rate_limiter=None
+
+
+class RateLimiter:
+    """Token bucket shared by every worker thread that talks to TMDB."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """Single-file SQLite store for TMDB responses.
+
+    Entries are zlib-compressed JSON blobs keyed by the request URL and its
+    (sorted) query parameters. Entries older than ``ttl`` seconds are treated
+    as misses, and once the stored payloads exceed ``max_bytes`` the least
+    recently used entries are evicted (checked every ``EVICT_INTERVAL`` writes
+    to keep inserts cheap). The database runs in WAL mode with a
+    busy timeout so several CLI processes can share one cache file.
+    """
+
+    EVICT_INTERVAL = 50
+
+    def __init__(self, path, ttl=CACHE_EXPIRY, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   data BLOB NOT NULL,
+                   size INTEGER NOT NULL,
+                   stored_at REAL NOT NULL,
+                   accessed_at REAL NOT NULL
+               )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_stored ON responses (stored_at)"
+        )
+
+    @staticmethod
+    def make_key(url, params=None):
+        """Build a stable cache key; the API key never becomes part of it."""
+        items = sorted(
+            (k, str(v)) for k, v in (params or {}).items() if k != 'api_key'
+        )
+        return f"{url}?{urlencode(items)}" if items else url
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, data):
+        blob = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front so concurrent
+            # processes serialize on the busy timeout instead of failing.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, data, size, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), now, now),
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_INTERVAL == 1:
+                    self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            count, total, oldest, newest, expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(stored_at), MAX(stored_at), "
+                "COALESCE(SUM(stored_at < ?), 0) FROM responses",
+                (now - self.ttl,),
+            ).fetchone()
+        return {
+            'path': str(self.path),
+            'entries': count,
+            'expired': expired,
+            'size_bytes': total,
+            'file_bytes': self.path.stat().st_size if self.path.exists() else 0,
+            'max_bytes': self.max_bytes,
+            'oldest': datetime.fromtimestamp(oldest) if oldest else None,
+            'newest': datetime.fromtimestamp(newest) if newest else None,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._writes:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._evict()
+                self._conn.execute("COMMIT")
+            self._conn.close()
+
+
+def get_cached_response(url, params=None):
     """Get response from cache or from API with caching"""
-    if cache_file.exists():
-        # Check if cache is still valid
-        file_age = time.time() - os.path.getmtime(cache_file)
-        if file_age < CACHE_EXPIRY:
-            with open(cache_file, 'r') as f:
-                return json.load(f)
-    
+    key = ResponseCache.make_key(url, params)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
     # Cache miss or expired - fetch from API
+    rate_limiter.acquire()
     response = session.get(url, params=params, timeout=10)
     response.raise_for_status()
     data = response.json()
-    
-    # Save to cache
-    with open(cache_file, 'w') as f:
-        json.dump(data, f)
-    
+
+    cache.put(key, data)
     return data
 
-def fetch_plex_episodes():
-    """Fetch all TV episodes from Plex server"""
+
+def display_cache_stats(stats):
+    """Print a summary of the response cache"""
+    def mb(num_bytes):
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+    print(f"{Fore.YELLOW}===== TMDB CACHE ====={Style.RESET_ALL}")
+    print(f"File:     {stats['path']} ({mb(stats['file_bytes'])} on disk)")
+    print(f"Entries:  {stats['entries']} ({stats['expired']} expired)")
+    print(f"Payload:  {mb(stats['size_bytes'])} of {mb(stats['max_bytes'])} cap")
+    if stats['oldest']:
+        print(f"Oldest:   {stats['oldest']:%Y-%m-%d %H:%M:%S}")
+        print(f"Newest:   {stats['newest']:%Y-%m-%d %H:%M:%S}")
+    lookups = stats['hits'] + stats['misses']
+    if lookups:
+        print(f"Hit rate: {stats['hits']}/{lookups} ({stats['hits'] * 100 // lookups}%)")
+
+def format_show_name(show):
+    """Plex show title with its year appended, e.g. 'Show (2020)'"""
+    return show_filter_key(show.title, show.year)
+
+def iter_plex_shows():
+    """Yield (show_name, seasons) for each TV show on the Plex server.
+
+    Episodes are fetched one show at a time, so only the show currently being
+    yielded is held in memory.
+    """
     plex = PlexServer(PLEX_BASEURL, PLEX_TOKEN)
-    tv_episodes = {}
-    
-    for show in plex.library.section('TV Shows').all():
-        show_name = show.title
-
-        # append show year to name if not present
-        if show.year != 0:
-            dated = False
-            if len(show_name) > 6:
-                if show_name[-6] == '(' and show_name[-1] == ')':
-                    if show_name[-2].isnumeric() and show_name[-3].isnumeric() and show_name[-4].isnumeric() and show_name[-5].isnumeric():
-                        dated = True
-            if not dated:
-                show_name += " (" + str(show.year) + ")"
 
+    for show in plex.library.section('TV Shows').all():
+        seasons = {}
         for episode in show.episodes():
-            season_num = episode.seasonNumber
-            episode_num = episode.index
-            episode_title = episode.title
-
-            tv_episodes.setdefault(show_name, {}).setdefault(season_num, {})[episode_num] = {
-                'title': episode_title,
+            seasons.setdefault(episode.seasonNumber, {})[episode.index] = {
+                'title': episode.title,
             }
-    
+        yield format_show_name(show), seasons
+
+def fetch_plex_episodes():
+    """Fetch all TV episodes from Plex server"""
+    tv_episodes = {}
+    for show_name, seasons in iter_plex_shows():
+        # merge rather than overwrite, in case two Plex entries share a name
+        for season_num, episodes in seasons.items():
+            tv_episodes.setdefault(show_name, {}).setdefault(season_num, {}).update(episodes)
+
     return tv_episodes
 
 def extract_year_from_title(title):
@@ -96,10 +277,6 @@ def get_tmdb_show_id(show_name):
     unquoted_clear_name = clean_name
     clean_name = quote(clean_name)
     
-    # Create a unique cache key including year if available
-    cache_key = f"{clean_name}_{year}" if year else clean_name
-    cache_file = CACHE_DIR / f"search_{cache_key.replace('/', '_').replace(':', '_')}.json"
-    
     search_url = 'https://api.themoviedb.org/3/search/tv'
     search_params = {
         'api_key': TMDB_API_KEY,
@@ -111,14 +288,13 @@ def get_tmdb_show_id(show_name):
         search_params['first_air_date_year'] = year
     
     # Try with year parameter first if available
-    data = get_cached_response(cache_file, search_url, params=search_params)
+    data = get_cached_response(search_url, params=search_params)
     results = data.get('results', [])
     
     # If no results and we used a year, try again without the year
     if not results and year:
-        alt_cache_file = CACHE_DIR / f"search_{clean_name.replace('/', '_').replace(':', '_')}_noyear.json"
         alt_params = {'api_key': TMDB_API_KEY, 'query': clean_name}
-        data = get_cached_response(alt_cache_file, search_url, params=alt_params)
+        data = get_cached_response(search_url, params=alt_params)
     
         results = data.get('results', [])
 
@@ -150,12 +326,10 @@ def get_tmdb_season_episodes(show_id, season_num):
             raise ValueError
     except (ValueError, TypeError):
         raise ValueError(f"Invalid TMDB show_id: {show_id!r}")
-    cache_file = CACHE_DIR / f"show_{show_id_int}_season_{season_num}.json"
     url = f'https://api.themoviedb.org/3/tv/{show_id_int}/season/{season_num}'
     
     # Defensive: If show_id is not confirmed via search, do not proceed (should not happen with fixed get_tmdb_show_id)
     data = get_cached_response(
-        cache_file,
         url,
         params={'api_key': TMDB_API_KEY}
     )
@@ -164,11 +338,9 @@ def get_tmdb_season_episodes(show_id, season_num):
 
 def get_tmdb_season_episodes_data(show_id, season_num):
     """Get episodes for a season from TMDB with caching"""
-    cache_file = CACHE_DIR / f"show_{show_id}_season_{season_num}.json"
     url = f'https://api.themoviedb.org/3/tv/{show_id}/season/{season_num}'
     
     data = get_cached_response(
-        cache_file,
         url,
         params={'api_key': TMDB_API_KEY}
     )
@@ -184,15 +356,54 @@ def get_tmdb_show_info(show_id):
             return None
     except (ValueError, TypeError):
         return None
-    cache_file = CACHE_DIR / f"show_{sid}.json"
     url = f'https://api.themoviedb.org/3/tv/{sid}'
     
     return get_cached_response(
-        cache_file,
         url,
         params={'api_key': TMDB_API_KEY, 'append_to_response': 'seasons'}
     )
 
+SHOW_COLORS = [Fore.CYAN, Fore.MAGENTA, Fore.BLUE, Fore.GREEN, Fore.YELLOW, Fore.RED]
+
+def is_episode_aired(episode):
+    """True if the episode has aired (taking AIR_DATE_OFFSET_DAYS into account)"""
+    air_dt = episode['air_dt']
+    chk_dt = datetime.now() + timedelta(days=-AIR_DATE_OFFSET_DAYS)
+    return (air_dt == None) or (air_dt < chk_dt)
+
+def display_show_episodes(show_name, episodes, color, separate=False, write=print):
+    """Display the missing episodes of one show; returns True if anything was printed"""
+    # Sort episodes by season and episode number
+    episodes.sort(key=lambda e: (e['season_num'], e['episode_num']))
+
+    header_shown = False
+
+    # Display each missing episode
+    for episode in episodes:
+        season_num = episode['season_num']
+        episode_num = episode['episode_num']
+
+        aired = is_episode_aired(episode)
+        if (not HIDE_UNAIRED_EPISODES) or aired:
+            if not header_shown:
+                # Add a blank line before each show (except the first one)
+                if separate:
+                    write("")
+                # Show header
+                write(f"{color}[{show_name}]{Style.RESET_ALL}")
+                header_shown = True
+
+            if aired:
+                write(f"  {color}Season {season_num}, "
+                    f"Episode {episode_num}: "
+                    f"{episode['title']}{Style.RESET_ALL}")
+            else:
+                write(f"  Season {season_num}, "
+                    f"Episode {episode_num}: "
+                    f"{episode['title']} [Airs {episode['air_dt'].strftime('%d %B, %Y').lstrip('0')}]")
+
+    return header_shown
+
 def display_missing_episodes(missing_episodes):
     """Display missing episodes with colored output and grouped by show"""
     if not missing_episodes:
@@ -209,46 +420,22 @@ def display_missing_episodes(missing_episodes):
             episodes_by_show[show_name] = []
         episodes_by_show[show_name].append(episode)
     
-    # Generate a cycle of colors for different shows
-    colors = [Fore.CYAN, Fore.MAGENTA, Fore.BLUE, Fore.GREEN, Fore.YELLOW, Fore.RED]
-    
-    # store curr dt
-    chk_dt = datetime.now() + timedelta(days=-AIR_DATE_OFFSET_DAYS)
-
     # Display missing episodes grouped by show with alternating colors
     for i, (show_name, episodes) in enumerate(episodes_by_show.items()):
         # Select a color from the cycle for this show
-        color = colors[i % len(colors)]
-        
-        # Sort episodes by season and episode number
-        episodes.sort(key=lambda e: (e['season_num'], e['episode_num']))
-        
-        header_shown = False
-
-        # Display each missing episode
-        for episode in episodes:
-            season_num = episode['season_num']
-            episode_num = episode['episode_num']
-
-            air_dt = episode['air_dt']
-            aired = (air_dt == None) or (air_dt < chk_dt)
-            if (not HIDE_UNAIRED_EPISODES) or aired:
-                if not header_shown:
-                    # Add a blank line before each show (except the first one)
-                    if i > 0:
-                        print()
-                    # Show header
-                    print(f"{color}[{show_name}]{Style.RESET_ALL}")
-                    header_shown = True
-
-                if aired:
-                    print(f"  {color}Season {season_num}, "
-                        f"Episode {episode_num}: "
-                        f"{episode['title']}{Style.RESET_ALL}")
-                else:
-                    print(f"  Season {season_num}, "
-                        f"Episode {episode_num}: "
-                        f"{episode['title']} [Airs {episode['air_dt'].strftime('%d %B, %Y').lstrip('0')}]")
+        display_show_episodes(show_name, episodes, SHOW_COLORS[i % len(SHOW_COLORS)], separate=i > 0)
+
+def episode_to_ndjson(episode):
+    """Serialize a missing episode as one NDJSON line"""
+    return json.dumps({
+        'type': 'missing',
+        'show': episode['show_name'],
+        'season': episode['season_num'],
+        'episode': episode['episode_num'],
+        'title': episode['title'],
+        'air_date': episode['air_dt'].strftime('%Y-%m-%d') if episode['air_dt'] else None,
+        'aired': is_episode_aired(episode),
+    })
 
 def display_not_found_shows(not_found_shows):
     """Display shows not found in TMDB with colored output"""
@@ -261,52 +448,130 @@ def display_not_found_shows(not_found_shows):
         print(f"{Fore.RED}{show_name}{Style.RESET_ALL}")
 
 
-def findFilteredShow(showName):
-    if showFilters != None:
-        for show in showFilters:
-            if show['show'] == showName:
-                return show;
-    return None
+def process_show(show_name, seasons):
+    """Compare one Plex show against TMDB.
 
+    Returns a tuple of (missing episodes, found in TMDB, log lines). Log lines
+    are returned rather than printed so that worker threads never interleave
+    their output.
+    """
+    missing_episodes = []
+    messages = []
 
-def isEpisodeFiltered(showFilter, seasonNum, episodeNum):
-    if showFilter == None:
-        return False
-    try:
-        eps = showFilter["episodes"]
-    except:
-        # no episodes listed for show - hide all
-        return True
-    # negative value is season number in json
+    # check if show hidden by filter
+    show_filter = showFilters.lookup(show_name)
+    if show_filter.hide_show:
+        return missing_episodes, True, messages
+
+    # Get TMDB show ID
     try:
-        # iterate episode filters starting after queried season
-        lpd = False
-        for ep in eps[eps.index(-seasonNum) + 1:]:
-            # (positive) episode number
-            # ...matches query?
-            if ep == episodeNum:
-                # yep, so hide it
-                return True
-            # different season number?
-            if ep < 0:
-                # ...immediately after queried season number?
-                if not lpd:
-                    # yep - hide entire season
-                    return True
-                # no, but season is now different, so don't hide
-                return False
-            lpd = True
-        return not lpd # hide if single season number in array
+        show_id = get_tmdb_show_id(show_name)
     except:
-        # season not found in filters
-        return False
-
+        show_id = None
+
+    if not show_id:
+        messages.append(f"{Fore.RED}TV show '{show_name}' not found in TMDb API{Style.RESET_ALL}")
+        return missing_episodes, False, messages
+
+    # Get show info with seasons
+    show_info = get_tmdb_show_info(show_id)
+    tmdb_name = show_info['name']
+
+    # Get available seasons from TMDB
+    tmdb_seasons = {s['season_number'] for s in show_info['seasons']}
+
+    # Compare seasons and episodes
+    for season_num, episodes in seasons.items():
+        # Skip season 0 (specials) if needed
+        if season_num == 0:
+            continue
+
+        # check if season hidden by filter
+        if show_filter.is_season_hidden(season_num):
+            continue;
+
+        if season_num not in tmdb_seasons:
+            # Entire season missing in TMDB
+            if IGNORE_MISSING_SEASON_IN_TMDB == False:
+                messages.append(f"{Fore.RED} Season {season_num} not found on TMDB: {show_name} [{show_id}]{Style.RESET_ALL}")
+
+                for episode_num, episode_data in episodes.items():
+                    # check if episode hidden by filter
+                    if show_filter.is_episode_hidden(season_num, episode_num):
+                        continue;
+
+                    missing_episodes.append({
+                        'show_name': show_name,
+                        'season_num': season_num,
+                        'episode_num': episode_num,
+                        'title': episode_data['title'],
+                        'air_dt': None
+                    })
+        else:
+            # Check individual episodes
+            tmdb_episodes = get_tmdb_season_episodes(show_id, season_num)
+            tmdb_episodes_data = get_tmdb_season_episodes_data(show_id, season_num)
+
+            if ALT_MISSING_CHECK_METHOD == False:
+                for episode_num, episode_data in episodes.items():
+                    if episode_num not in tmdb_episodes:
+                        # check if episode hidden by filter
+                        if show_filter.is_episode_hidden(season_num, episode_num):
+                            continue;
+
+                        tmdb_episode_data = tmdb_episodes_data[episode_num-1]
+                        missing_episodes.append({
+                            'show_name': show_name,
+                            'season_num': season_num,
+                            'episode_num': episode_num,
+                            'title': episode_data['title'],
+                            'air_dt': datetime.strptime(tmdb_episode_data['air_date'], "%Y-%m-%d")
+                        })
+            else:
+                # invert the missing episode check logic
+                for episode_num in tmdb_episodes:
+                    if episode_num not in episodes:
+                        # check if episode hidden by filter
+                        if show_filter.is_episode_hidden(season_num, episode_num):
+                            continue;
+
+                        tmdb_episode_data = tmdb_episodes_data[episode_num-1]
+                        missing_episodes.append({
+                            'show_name': show_name,
+                            'season_num': season_num,
+                            'episode_num': episode_num,
+                            'title': tmdb_episode_data['name'],
+                            'air_dt': datetime.strptime(tmdb_episode_data['air_date'], "%Y-%m-%d")
+                        })
+
+    return missing_episodes, True, messages
+
+
+def process_shows(shows, jobs=1):
+    """Run process_show over (show_name, seasons) pairs.
+
+    With more than one job the shows are fanned out to a thread pool, but
+    results are still yielded in input order so output stays deterministic.
+    At most ``jobs * 2`` shows are in flight at any time.
+    """
+    if jobs <= 1:
+        for show_name, seasons in shows:
+            yield (show_name,) + process_show(show_name, seasons)
+        return
 
-def isSeasonFiltered(showFilter, seasonNum):
-    return isEpisodeFiltered(showFilter, seasonNum, 0)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for show_name, seasons in shows:
+            pending.append((show_name, executor.submit(process_show, show_name, seasons)))
+            if len(pending) >= jobs * 2:
+                name, future = pending.popleft()
+                yield (name,) + future.result()
+        while pending:
+            name, future = pending.popleft()
+            yield (name,) + future.result()
 
 
-def main():
+def main(jobs=1):
     # Fetch all episodes from Plex
     print(f"{Fore.CYAN}Fetching shows from Plex server...{Style.RESET_ALL}")
     plex_episodes = fetch_plex_episodes()
@@ -316,103 +581,55 @@ def main():
     not_found_shows = []
     
     with tqdm(total=len(plex_episodes), desc="Processing TV Shows") as pbar:
-        for show_name, seasons in plex_episodes.items():
-            # Get TMDB show ID
-            try:
-                show_id = get_tmdb_show_id(show_name)
-            except:
-                show_id = None
-           
-            if not show_id:
+        for show_name, show_missing, found, messages in process_shows(plex_episodes.items(), jobs):
+            for message in messages:
+                pbar.write(message)
+            if not found:
                 not_found_shows.append(show_name)
-                pbar.write(f"{Fore.RED}TV show '{show_name}' not found in TMDb API{Style.RESET_ALL}")
-                pbar.update(1)
-                continue
-            
-            # check if show hidden by filter
-            show_filter = findFilteredShow(show_name)
-            if show_filter != None:
-                if not "episodes" in show_filter:
-                    # no episodes listed, so hide all
-                    continue
-                        
-            # Get show info with seasons
-            show_info = get_tmdb_show_info(show_id)
-            tmdb_name = show_info['name']
-            
-            # Get available seasons from TMDB
-            tmdb_seasons = {s['season_number'] for s in show_info['seasons']}
-            
-            # Compare seasons and episodes
-            for season_num, episodes in seasons.items():
-                # Skip season 0 (specials) if needed
-                if season_num == 0:
-                    continue
-
-                # check if season hidden by filter                
-                if isSeasonFiltered(show_filter, season_num):
-                    continue;
-
-                if season_num not in tmdb_seasons:
-                    # Entire season missing in TMDB
-                    if IGNORE_MISSING_SEASON_IN_TMDB == False:
-                        print(f"{Fore.RED} Season {season_num} not found on TMDB: {show_name} [{show_id}]{Style.RESET_ALL}")
-
-                        for episode_num, episode_data in episodes.items():
-                            # check if episode hidden by filter                
-                            if isEpisodeFiltered(show_filter, season_num, episode_num):
-                                continue;
-
-                            missing_episodes.append({
-                                'show_name': show_name,
-                                'season_num': season_num,
-                                'episode_num': episode_num,
-                                'title': episode_data['title'],
-                                'air_dt': None
-                            })
-                else:
-                    # Check individual episodes
-                    tmdb_episodes = get_tmdb_season_episodes(show_id, season_num)
-                    tmdb_episodes_data = get_tmdb_season_episodes_data(show_id, season_num)
-
-                    if ALT_MISSING_CHECK_METHOD == False:
-                        for episode_num, episode_data in episodes.items():
-                            if episode_num not in tmdb_episodes:
-                                # check if episode hidden by filter                
-                                if isEpisodeFiltered(show_filter, season_num, episode_num):
-                                    continue;
-                                
-                                tmdb_episode_data = tmdb_episodes_data[episode_num-1]
-                                missing_episodes.append({
-                                    'show_name': show_name,
-                                    'season_num': season_num,
-                                    'episode_num': episode_num,
-                                    'title': episode_data['title'],
-                                    'air_dt': datetime.strptime(tmdb_episode_data['air_date'], "%Y-%m-%d")
-                                })
-                    else:
-                        # invert the missing episode check logic
-                        for episode_num in tmdb_episodes:
-                            if episode_num not in episodes:
-                                # check if episode hidden by filter                
-                                if isEpisodeFiltered(show_filter, season_num, episode_num):
-                                    continue;
-
-                                tmdb_episode_data = tmdb_episodes_data[episode_num-1]
-                                missing_episodes.append({
-                                    'show_name': show_name,
-                                    'season_num': season_num,
-                                    'episode_num': episode_num,
-                                    'title': tmdb_episode_data['name'],
-                                    'air_dt': datetime.strptime(tmdb_episode_data['air_date'], "%Y-%m-%d")
-                                })
-
+            missing_episodes.extend(show_missing)
             pbar.update(1)
     
     # Display results with improved formatting
     display_missing_episodes(missing_episodes)
     display_not_found_shows(not_found_shows)
 
+def main_streaming(jobs=1, ndjson=False):
+    """Check shows while Plex is still being enumerated.
+
+    Each show is reported as soon as it finishes, either as coloured text or
+    as NDJSON lines on stdout, so memory use does not grow with the library.
+    """
+    status_file = sys.stderr if ndjson else sys.stdout
+    print(f"{Fore.CYAN}Streaming shows from Plex server...{Style.RESET_ALL}", file=status_file)
+
+    not_found_shows = []
+    shows_printed = 0
+
+    with tqdm(desc="Processing TV Shows", unit=" shows") as pbar:
+        for show_name, show_missing, found, messages in process_shows(iter_plex_shows(), jobs):
+            for message in messages:
+                pbar.write(message, file=status_file)
+
+            if not found:
+                not_found_shows.append(show_name)
+                if ndjson:
+                    print(json.dumps({'type': 'not_found', 'show': show_name}), flush=True)
+            elif ndjson:
+                for episode in show_missing:
+                    if (not HIDE_UNAIRED_EPISODES) or is_episode_aired(episode):
+                        print(episode_to_ndjson(episode), flush=True)
+            else:
+                color = SHOW_COLORS[shows_printed % len(SHOW_COLORS)]
+                if display_show_episodes(show_name, show_missing, color, separate=shows_printed > 0, write=pbar.write):
+                    shows_printed += 1
+
+            pbar.update(1)
+
+    if not ndjson:
+        if not shows_printed:
+            print(f"\n{Fore.GREEN}No missing episodes found.{Style.RESET_ALL}")
+        display_not_found_shows(not_found_shows)
+
 if __name__ == "__main__":
     # parse command line arguments
     parser = argparse.ArgumentParser(
@@ -427,6 +644,21 @@ if __name__ == "__main__":
     parser.add_argument('-x', '--hide_unaired_episodes', action='store_true')
     parser.add_argument('-d', '--air_date_offset_days', type=int, default=AIR_DATE_OFFSET_DAYS)
     parser.add_argument('-f', '--filters_file', type=str, default=FILTERS_FILE)
+    parser.add_argument('--cache_file', '--cache-file', type=str, default=str(CACHE_FILE))
+    parser.add_argument('--cache_ttl', '--cache-ttl', type=int, default=CACHE_EXPIRY,
+                        help='seconds before a cached TMDB response is refetched')
+    parser.add_argument('--cache_max_mb', '--cache-max-mb', type=int, default=CACHE_MAX_MB,
+                        help='evict least recently used responses above this size')
+    parser.add_argument('--cache_stats', '--cache-stats', action='store_true',
+                        help='print a report of the TMDB response cache and exit')
+    parser.add_argument('-j', '--jobs', type=int, default=JOBS,
+                        help='number of shows to check against TMDB concurrently')
+    parser.add_argument('--rate_limit', '--rate-limit', type=float, default=RATE_LIMIT,
+                        help='maximum TMDB requests per second across all jobs (0 disables)')
+    parser.add_argument('-s', '--stream', action='store_true',
+                        help='check shows while Plex is still being enumerated and print each as it finishes')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='stream results to stdout as newline-delimited JSON (implies --stream)')
     args = parser.parse_args()
     PLEX_BASEURL = args.plex_baseurl
     PLEX_TOKEN = args.plex_token
@@ -436,20 +668,39 @@ if __name__ == "__main__":
     HIDE_UNAIRED_EPISODES = args.hide_unaired_episodes
     AIR_DATE_OFFSET_DAYS = args.air_date_offset_days
     FILTERS_FILE = args.filters_file
+    CACHE_FILE = Path(args.cache_file)
+    CACHE_EXPIRY = args.cache_ttl
+    CACHE_MAX_MB = args.cache_max_mb
+    JOBS = max(1, args.jobs)
+    RATE_LIMIT = args.rate_limit
+
+    cache = ResponseCache(CACHE_FILE, ttl=CACHE_EXPIRY, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+    if args.cache_stats:
+        display_cache_stats(cache.stats())
+        cache.close()
+        raise SystemExit(0)
 
     # load filters json
     if FILTERS_FILE != None:
-        with open(FILTERS_FILE) as f:
-            showFilters = json.load(f)
+        showFilters = load_filter_index(FILTERS_FILE)
+
+    rate_limiter = RateLimiter(RATE_LIMIT)
 
     # Use a persistent session for all requests
     with requests.Session() as session:
         # Set up retry with backoff
         session.mount('https://', requests.adapters.HTTPAdapter(
+            pool_maxsize=max(10, JOBS),
             max_retries=requests.adapters.Retry(
                 total=3,
                 backoff_factor=0.5,
                 status_forcelist=[429, 500, 502, 503, 504]
             )
         ))
-        main()
+        try:
+            if args.stream or args.ndjson:
+                main_streaming(jobs=JOBS, ndjson=args.ndjson)
+            else:
+                main(jobs=JOBS)
+        finally:
+            cache.close()
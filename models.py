@@ -19,6 +19,7 @@ class Show(db.Model):
     number_of_episodes = db.Column(db.Integer)
     status = db.Column(db.String(50))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_fetch_seconds = db.Column(db.Float)  # time the last TMDB refresh took, for scheduling
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -144,6 +145,11 @@ class DetectionRun(db.Model):
     completed_at = db.Column(db.DateTime)
     status = db.Column(db.String(50), default='running')  # running, completed, failed, cancelled
     error_message = db.Column(db.Text)
+    max_duration_seconds = db.Column(db.Integer)  # optional time budget
+    max_api_calls = db.Column(db.Integer)  # optional TMDB call budget
+    budget_exhausted = db.Column(db.Boolean, default=False)  # refreshing stopped early
+    duration_seconds = db.Column(db.Float)
+    trigger = db.Column(db.String(20), default='manual')  # manual, scheduled
     
     def __repr__(self):
         return f'<DetectionRun {self.id} - {self.status}>'
@@ -161,7 +167,12 @@ class DetectionRun(db.Model):
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'status': self.status,
-            'error_message': self.error_message
+            'error_message': self.error_message,
+            'max_duration_seconds': self.max_duration_seconds,
+            'max_api_calls': self.max_api_calls,
+            'budget_exhausted': bool(self.budget_exhausted),
+            'duration_seconds': self.duration_seconds,
+            'trigger': self.trigger or 'manual'
         }
     
     def get_library_ids(self):
@@ -175,3 +186,74 @@ class DetectionRun(db.Model):
     
     def set_library_names(self, library_names):
         self.plex_library_names = json.dumps(library_names)
+
+class StatCounter(db.Model):
+    """Running totals behind /api/database_stats, maintained by plex_tmdb.services.stats"""
+    __tablename__ = 'stat_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<StatCounter {self.name}={self.value}>'
+
+class Job(db.Model):
+    """Queued background work, claimed by a worker under a time-limited lease"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False, index=True)  # detection, detection_shard, reprocessing
+    payload = db.Column(db.Text)  # JSON object
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed, cancelled
+    detection_run_id = db.Column(db.Integer, db.ForeignKey('detection_runs.id'), index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_owner = db.Column(db.String(255))
+    lease_expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    progress = db.Column(db.Float, default=0.0)  # 0..1
+    cost_estimate = db.Column(db.Float)  # estimated seconds of work, weights progress and ETA
+    result = db.Column(db.Text)  # JSON object
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_job_status_lease', 'status', 'lease_expires_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} - {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.get_payload(),
+            'status': self.status,
+            'detection_run_id': self.detection_run_id,
+            'attempts': self.attempts,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'progress': self.progress,
+            'cost_estimate': self.cost_estimate,
+            'result': self.get_result(),
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+    
+    def set_payload(self, payload):
+        self.payload = json.dumps(payload)
+    
+    def get_result(self):
+        return json.loads(self.result) if self.result else {}
+    
+    def set_result(self, result):
+        self.result = json.dumps(result)
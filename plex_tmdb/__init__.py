@@ -3,14 +3,17 @@
 from __future__ import annotations
 
 import logging
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 from flask import Flask
 
 from models import db
 
+from . import database, state
 from .routes import register_blueprints
+from .services import stats
 
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -43,15 +46,37 @@ def create_app(config: Optional[dict] = None) -> Flask:
 	if config:
 		app.config.update(config)
 
+	# Task state is kept next to the database so every worker process shares it.
+	state.configure(app.config.get("TASK_STATE_PATH") or Path(app.instance_path) / "task_state.sqlite3")
+
 	db.init_app(app)
+	database.init_app(app)
 
 	with app.app_context():
 		db.create_all()
+		database.add_missing_columns()
+
+	stats.init_app(app)
 
 	register_blueprints(app)
 
 	return app
 
 
-# Provide a module-level application object for WSGI servers.
-app = create_app()
+_app_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+	"""Provide a module-level application object for WSGI servers.
+
+	The app is created on first access rather than on import, so processes
+	that only run tasks from this package, such as detection pool workers,
+	do not set up the database and the stats thread.
+	"""
+	if name != "app":
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	global app  # pylint: disable=global-variable-undefined
+	with _app_lock:
+		if "app" not in globals():
+			app = create_app()
+	return app
@@ -0,0 +1,134 @@
+"""SQLite connection tuning and separate reader/writer sessions.
+
+Every connection to a file-backed SQLite database is switched to WAL
+journaling with ``synchronous=NORMAL``, a busy timeout and a memory-mapped
+read window. With WAL a reader works from the last committed snapshot, so it
+never waits for the detection thread's write transaction.
+
+``db.session`` stays the writer session. Read-only endpoints use
+:func:`read_session`, which is bound to a second engine whose connections
+are opened with ``query_only`` so they cannot take the write lock.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import List, Optional, Union
+
+from flask import Flask, current_app
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+from models import db
+
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_MS = 30000
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+READ_POOL_SIZE = 10
+
+_EXTENSION_KEY = "plex_tmdb.database"
+
+
+class _ReadState:
+    def __init__(self, engine: Optional[Engine], sessions: Optional[scoped_session]) -> None:
+        self.engine = engine
+        self.sessions = sessions
+
+
+def _is_file_sqlite(engine: Engine) -> bool:
+    url = engine.url
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _set_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+    finally:
+        cursor.close()
+
+
+def create_read_engine(url: Union[str, URL]) -> Engine:
+    """Engine for ``url`` whose connections are opened with ``query_only``."""
+    read_engine = create_engine(
+        url,
+        pool_size=READ_POOL_SIZE,
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(read_engine, "connect", lambda conn, record: _set_pragmas(conn, read_only=True))
+    return read_engine
+
+
+def init_app(app: Flask) -> None:
+    """Tune the SQLite engine of ``app`` and create its read-only engine.
+
+    Must run after ``db.init_app(app)`` and before the first connection is
+    made. Set ``SQLITE_TUNING`` to False to keep SQLite's defaults; reads then
+    share the writer session.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    if not app.config.get("SQLITE_TUNING", True) or not _is_file_sqlite(engine):
+        app.extensions[_EXTENSION_KEY] = _ReadState(None, None)
+        return
+
+    event.listen(engine, "connect", lambda conn, record: _set_pragmas(conn, read_only=False))
+
+    read_engine = create_read_engine(engine.url)
+
+    sessions = scoped_session(
+        sessionmaker(bind=read_engine, autoflush=False, expire_on_commit=False),
+        scopefunc=lambda: id(app_ctx._get_current_object()),
+    )
+    app.extensions[_EXTENSION_KEY] = _ReadState(read_engine, sessions)
+
+    @app.teardown_appcontext
+    def _remove_read_session(exc: Optional[BaseException]) -> None:  # pylint: disable=unused-argument
+        sessions.remove()
+
+    logger.info("SQLite tuned for concurrent access (WAL, separate read engine)")
+
+
+def add_missing_columns() -> List[str]:
+    """Add columns that models gained after their tables were created.
+
+    ``db.create_all()`` only creates missing tables, so new nullable columns
+    are added to existing tables here. Must run inside an app context.
+    Returns the ``table.column`` names that were added.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    added: List[str] = []
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    if added:
+        logger.info("Added database columns: %s", ", ".join(added))
+    return added
+
+
+def read_session() -> Session:
+    """Session for queries that never write, bound to the read-only engine."""
+    state: Optional[_ReadState] = current_app.extensions.get(_EXTENSION_KEY)
+    if state is None or state.sessions is None:
+        return db.session()
+    return state.sessions()
@@ -0,0 +1,108 @@
+"""Conditional GET and compression for read endpoints keyed on the data version."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Callable, Optional, Tuple
+
+from flask import Response, make_response, request
+
+from .. import state
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+RESPONSE_CACHE_SIZE = 64
+# Smaller bodies are sent as-is; compressing them saves next to nothing.
+COMPRESS_MIN_SIZE = 1024
+
+_cache_lock = Lock()
+_response_cache: "OrderedDict[Tuple[str, str], Tuple[str, bytes, str, Optional[str]]]" = OrderedDict()
+
+
+def _make_etag(version: str, key: str, encoding: str) -> str:
+    return hashlib.sha1(f"{version}|{key}|{encoding}".encode("utf-8")).hexdigest()[:20]
+
+
+def _preferred_encoding() -> str:
+    """The best content coding the client accepts, or ``""`` for none."""
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered) or ""
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _finish(response: Response, etag: str, encoding: Optional[str]) -> Response:
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _not_modified(etag: str) -> Response:
+    return _finish(Response(status=304), etag, None)
+
+
+def versioned_response(view: Callable) -> Callable:
+    """Serve ``view`` with an ETag derived from the data version.
+
+    Requests carrying a matching ``If-None-Match`` get a 304. Otherwise a
+    response rendered at the current version is reused from an in-process
+    cache, so the payload is only rebuilt after the data has changed.
+    Bodies of at least :data:`COMPRESS_MIN_SIZE` bytes are compressed with
+    brotli or gzip, whichever the client prefers, and cached compressed.
+    Responses reporting ``"success": false`` are never cached.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = state.get_data_version()
+        encoding = _preferred_encoding()
+        key = (encoding, request.full_path)
+        etag = _make_etag(version, request.full_path, encoding)
+
+        if etag in request.if_none_match:
+            return _not_modified(etag)
+
+        with _cache_lock:
+            cached = _response_cache.get(key)
+            if cached and cached[0] == version:
+                _response_cache.move_to_end(key)
+                _, body, mimetype, body_encoding = cached
+                return _finish(Response(body, mimetype=mimetype), etag, body_encoding)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        if response.is_json and (response.get_json(silent=True) or {}).get("success") is False:
+            return response
+
+        body = response.get_data()
+        body_encoding = None
+        if encoding and len(body) >= COMPRESS_MIN_SIZE:
+            body = _compress(body, encoding)
+            body_encoding = encoding
+            response.set_data(body)
+
+        with _cache_lock:
+            _response_cache[key] = (version, body, response.mimetype, body_encoding)
+            _response_cache.move_to_end(key)
+            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+
+        return _finish(response, etag, body_encoding)
+
+    return wrapper
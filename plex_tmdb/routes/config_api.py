@@ -2,18 +2,59 @@
 
 from __future__ import annotations
 
-import json
-from pathlib import Path
-
+import hashlib
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Tuple
 
 import requests
 from flask import Blueprint, current_app, jsonify, request
+from requests.adapters import HTTPAdapter
 
-CONFIG_PATH = Path(__file__).resolve().parents[2] / "config.json"
+from ..services import config as config_store
+from ..services import plex as plex_connections
 
 config_bp = Blueprint("config_api", __name__, url_prefix="/api")
 
+PROBE_TIMEOUT_SECONDS = 5
+# Results are reused for this long, which covers the dashboard's 30 s status poll.
+CONNECTION_TEST_TTL_SECONDS = 45
+TMDB_API_URL = "https://api.themoviedb.org/3"
+
+
+def _build_probe_session() -> requests.Session:
+    # No retries: a diagnostic should report a failure, not wait through backoff.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_probe_session = _build_probe_session()
+_probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="connection-test")
+_results_lock = threading.Lock()
+_results: Dict[str, Tuple[float, dict]] = {}
+
+
+def _cached_result(kind: str, credentials: Tuple[str, ...], probe: Callable[[], dict], refresh: bool) -> dict:
+    """Run ``probe`` unless a result for the same credentials is still fresh."""
+    digest = hashlib.sha256("\0".join((kind,) + credentials).encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    if not refresh:
+        with _results_lock:
+            cached = _results.get(digest)
+        if cached and now - cached[0] < CONNECTION_TEST_TTL_SECONDS:
+            return dict(cached[1], cached=True)
+
+    result = probe()
+    with _results_lock:
+        for key in [key for key, (stored_at, _) in _results.items() if now - stored_at >= CONNECTION_TEST_TTL_SECONDS]:
+            del _results[key]
+        _results[digest] = (time.monotonic(), result)
+    return dict(result, cached=False)
+
 
 @config_bp.route("/save_config", methods=["POST"])
 def save_config():
@@ -24,8 +65,8 @@ def save_config():
             if not config_data.get(field):
                 return jsonify({"success": False, "message": f"Missing required field: {field}"})
 
-        with CONFIG_PATH.open("w", encoding="utf-8") as handle:
-            json.dump(config_data, handle, indent=2)
+        # The form only posts the fields it shows; keep the rest of the file.
+        config_store.update_config(config_data)
 
         current_app.logger.info("Configuration saved successfully")
         return jsonify({"success": True, "message": "Configuration saved successfully"})
@@ -37,11 +78,7 @@ def save_config():
 @config_bp.route("/load_config")
 def load_config():
     try:
-        if CONFIG_PATH.exists():
-            with CONFIG_PATH.open("r", encoding="utf-8") as handle:
-                config = json.load(handle)
-            return jsonify({"success": True, "config": config})
-        return jsonify({"success": True, "config": {}})
+        return jsonify({"success": True, "config": config_store.load_config()})
     except Exception as exc:  # pylint: disable=broad-except
         current_app.logger.error("Error loading configuration: %s", exc)
         return jsonify({"success": False, "message": "Failed to connect to Plex server."})
@@ -49,6 +86,11 @@ def load_config():
 
 @config_bp.route("/test_connections", methods=["POST"])
 def test_connections():
+    """Test the Plex and TMDB credentials concurrently.
+
+    Results are cached for :data:`CONNECTION_TEST_TTL_SECONDS` per set of
+    credentials; post ``"refresh": true`` to test again regardless.
+    """
     try:
         data = request.get_json() or {}
         plex_url = data.get("plexUrl")
@@ -64,8 +106,18 @@ def test_connections():
                 }
             )
 
-        plex_result = _test_plex(plex_url, plex_token)
-        tmdb_result = _test_tmdb(tmdb_api_key, tmdb_language)
+        refresh = bool(data.get("refresh"))
+        plex_future = _probe_executor.submit(
+            _cached_result, "plex", (plex_url, plex_token), lambda: _test_plex(plex_url, plex_token), refresh
+        )
+        tmdb_result = _cached_result(
+            "tmdb", (tmdb_api_key, tmdb_language), lambda: _test_tmdb(tmdb_api_key, tmdb_language), refresh
+        )
+        try:
+            # The Plex probe may try to reconnect once after a stale connection.
+            plex_result = plex_future.result(timeout=PROBE_TIMEOUT_SECONDS * 3)
+        except FutureTimeout:
+            plex_result = {"success": False, "message": "Connection timed out"}
 
         success = plex_result.get("success") and tmdb_result.get("success")
         message = "Both connections succeeded" if success else "See individual results for details"
@@ -87,14 +139,13 @@ def _test_plex(plex_url: str, plex_token: str) -> dict:
     start_time = time.perf_counter()
 
     try:
-        from plexapi.server import PlexServer
         from plexapi.exceptions import BadRequest, Unauthorized
 
-        plex = PlexServer(plex_url, plex_token)
+        plex = plex_connections.get_server(plex_url, plex_token, timeout=PROBE_TIMEOUT_SECONDS)
         elapsed = int((time.perf_counter() - start_time) * 1000)
 
         libraries = []
-        for library in plex.library.sections():
+        for library in plex_connections.get_sections(plex):
             if getattr(library, "type", None) == "show":
                 libraries.append({"key": library.key, "title": library.title, "type": library.type})
 
@@ -118,41 +169,34 @@ def _test_plex(plex_url: str, plex_token: str) -> dict:
         return {"success": False, "message": f"Connection failed: {exc}"}
 
 
+def _tmdb_get(path: str, params: dict) -> requests.Response:
+    return _probe_session.get(f"{TMDB_API_URL}{path}", params=params, timeout=PROBE_TIMEOUT_SECONDS)
+
+
 def _test_tmdb(api_key: str, language: str) -> dict:
+    base_params = {"api_key": api_key, "language": language}
     start_time = time.perf_counter()
 
     try:
-        session = requests.Session()
-
-        configuration = session.get(
-            "https://api.themoviedb.org/3/configuration",
-            params={"api_key": api_key, "language": language},
-            timeout=10,
-        )
-
+        # The summary lookups are only reported when the configuration call
+        # succeeds, but sending them all at once keeps the check to one round trip.
+        configuration_future = _probe_executor.submit(_tmdb_get, "/configuration", base_params)
+        tv_future = _probe_executor.submit(_tmdb_get, "/search/tv", dict(base_params, query="Breaking Bad"))
+        movie_future = _probe_executor.submit(_tmdb_get, "/search/movie", dict(base_params, query="Inception"))
+        genre_future = _probe_executor.submit(_tmdb_get, "/genre/tv/list", base_params)
+
+        configuration = configuration_future.result()
         elapsed = int((time.perf_counter() - start_time) * 1000)
 
         if configuration.status_code == 200:
-            # Collect some additional data points for the UI summary
-            tv_search = session.get(
-                "https://api.themoviedb.org/3/search/tv",
-                params={"api_key": api_key, "language": language, "query": "Breaking Bad"},
-                timeout=10,
-            )
-            movie_search = session.get(
-                "https://api.themoviedb.org/3/search/movie",
-                params={"api_key": api_key, "language": language, "query": "Inception"},
-                timeout=10,
-            )
-            genre_list = session.get(
-                "https://api.themoviedb.org/3/genre/tv/list",
-                params={"api_key": api_key, "language": language},
-                timeout=10,
-            )
-
-            tv_results = tv_search.json().get("results", []) if tv_search.status_code == 200 else []
-            movie_results = movie_search.json().get("results", []) if movie_search.status_code == 200 else []
-            genres = genre_list.json().get("genres", []) if genre_list.status_code == 200 else []
+            results = []
+            for future, field in ((tv_future, "results"), (movie_future, "results"), (genre_future, "genres")):
+                try:
+                    response = future.result()
+                    results.append(response.json().get(field, []) if response.status_code == 200 else [])
+                except (requests.RequestException, ValueError):
+                    results.append([])
+            tv_results, movie_results, genres = results
 
             return {
                 "success": True,
@@ -6,31 +6,37 @@ from flask import Blueprint, current_app, jsonify, request
 
 from models import DetectionRun, Episode, MissingEpisode, Show, db
 
+from .. import state
+from ..database import read_session
+from ..services import stats
+from .caching import versioned_response
+
 
 database_bp = Blueprint("database_api", __name__, url_prefix="/api")
 
 
 @database_bp.route("/database_stats")
+@versioned_response
 def database_stats():
     try:
-        stats = {
-            "shows_count": Show.query.count(),
-            "episodes_count": Episode.query.count(),
-            "missing_episodes_count": MissingEpisode.query.count(),
-            "detection_runs_count": DetectionRun.query.count(),
+        session = read_session()
+        counters = stats.get_counters(session)
+        payload = {
+            "shows_count": counters["shows_count"],
+            "episodes_count": counters["episodes_count"],
+            "missing_episodes_count": counters["missing_episodes_count"],
+            "detection_runs_count": counters["detection_runs_count"],
             "latest_run": None,
             "shows_by_status": {},
-            "api_calls_saved": 0,
+            "api_calls_saved": counters["api_calls_saved"],
         }
 
-        latest_run = DetectionRun.query.order_by(DetectionRun.started_at.desc()).first()
+        # ids increase with started_at, and ordering by the primary key avoids a scan
+        latest_run = session.query(DetectionRun).order_by(DetectionRun.id.desc()).first()
         if latest_run:
-            stats["latest_run"] = latest_run.to_dict()
-
-        total_saved = db.session.query(db.func.sum(DetectionRun.api_calls_saved)).scalar() or 0
-        stats["api_calls_saved"] = total_saved
+            payload["latest_run"] = latest_run.to_dict()
 
-        return jsonify({"success": True, "stats": stats})
+        return jsonify({"success": True, "stats": payload})
     except Exception as exc:  # pylint: disable=broad-except
         current_app.logger.error("Error getting database stats: %s", exc)
         return jsonify(
@@ -53,7 +59,9 @@ def clear_database():
         Episode.query.delete()
         Show.query.delete()
         DetectionRun.query.delete()
+        stats.reset()
         db.session.commit()
+        state.bump_data_version()
 
         current_app.logger.info("Database cleared successfully")
         return jsonify({"success": True, "message": "Database cleared successfully"})
@@ -2,14 +2,31 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import base64
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
 
 from flask import Blueprint, current_app, jsonify, request
+from plexapi.exceptions import BadRequest, NotFound
+from sqlalchemy import or_, tuple_
 
 from models import DetectionRun, Episode, MissingEpisode, Show, db
+from show_filters import load_filter_index
 
 from .. import state
-from ..tasks.detection import run_missing_episodes_task, run_reprocessing_task
+from ..database import read_session
+from ..services import config as config_store
+from ..services import plex as plex_connections
+from ..services.tmdb import parse_tmdb_date
+from ..tasks.detection import (
+    FILTERS_PATH,
+    check_show_from_cache,
+    run_reprocessing_task,
+    start_detection_run,
+    tmdb_guid,
+)
+from .caching import versioned_response
 
 
 detection_bp = Blueprint("detection_api", __name__, url_prefix="/api")
@@ -21,91 +38,452 @@ def find_missing_episodes():
         return jsonify({"success": False, "message": "A task is already running"})
 
     try:
-        options = request.get_json() or {}
-        detection_run = DetectionRun()
-        db.session.add(detection_run)
-        db.session.commit()
-
-        state.set_current_detection_run(detection_run.id)
-        run_missing_episodes_task(options, detection_run.id)
-
-        return jsonify(
-            {
-                "success": True,
-                "message": "Missing episode detection started",
-                "detection_run_id": detection_run.id,
-            }
-        )
+        detection_run = start_detection_run(request.get_json() or {})
+    except ValueError as exc:
+        db.session.rollback()
+        state.stop_task(f"Error: {exc}")
+        return jsonify({"success": False, "message": str(exc)}), 400
     except Exception as exc:  # pylint: disable=broad-except
         db.session.rollback()
         state.stop_task(f"Error: {exc}")
         current_app.logger.error("Error starting detection: %s", exc)
         return jsonify({"success": False, "message": "Failed to connect to Plex server."})
 
+    return jsonify(
+        {
+            "success": True,
+            "message": "Missing episode detection started",
+            "detection_run_id": detection_run.id,
+        }
+    )
+
+
+MISSING_EPISODES_MAX_LIMIT = 5000
+
+_MISSING_EPISODE_COLUMNS = (
+    MissingEpisode.id,
+    MissingEpisode.detected_at,
+    MissingEpisode.plex_library_id,
+    MissingEpisode.plex_library_name,
+    Show.title,
+    Show.year,
+    Show.tmdb_id,
+    Show.poster_path,
+    Episode.season_number,
+    Episode.episode_number,
+    Episode.title,
+    Episode.air_date,
+    Episode.overview,
+    Episode.tmdb_id,
+    Episode.still_path,
+    Episode.vote_average,
+)
+
+
+class InvalidQuery(ValueError):
+    """Raised when a query string parameter cannot be parsed."""
+
+
+class StaleCursor(Exception):
+    """Raised when a cursor belongs to a detection run that is no longer the latest."""
+
+
+def _sort_keys(sort: str):
+    """Columns that define the order (and keyset) for ``sort``."""
+    if sort == "show":
+        return [Show.title, Episode.season_number, Episode.episode_number, MissingEpisode.id]
+    if sort == "air_date":
+        # NULL air dates would break the row-value comparison, so sort them first
+        return [db.func.coalesce(Episode.air_date, date.min), MissingEpisode.id]
+    if sort == "detected":
+        return [MissingEpisode.id]
+    raise InvalidQuery(f"Unsupported sort: {sort}")
+
+
+def _cursor_values(row, sort: str) -> List[Any]:
+    """Sort key values of a projected row, matching :func:`_sort_keys`."""
+    if sort == "show":
+        return [row[4], row[8], row[9], row[0]]
+    if sort == "air_date":
+        return [row[11] or date.min, row[0]]
+    return [row[0]]
+
+
+def _encode_cursor(run_id: int, values: List[Any]) -> str:
+    encoded = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps({"run": run_id, "after": encoded}).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[int, List[Any]]:
+    """The detection run id and sort values a cursor continues after."""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as exc:
+        raise InvalidQuery("Invalid cursor") from exc
+    if not isinstance(decoded, dict) or not isinstance(decoded.get("run"), int):
+        raise InvalidQuery("Invalid cursor")
+    values = decoded.get("after")
+    if not isinstance(values, list) or len(values) != len(_sort_keys(sort)):
+        raise InvalidQuery("Invalid cursor")
+    if sort == "air_date":
+        values[0] = _parse_date(values[0], "cursor")
+    return decoded["run"], values
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    parsed = parse_tmdb_date(value)
+    if parsed is None:
+        raise InvalidQuery(f"Invalid {name}, expected YYYY-MM-DD")
+    return parsed
+
+
+def _parse_int(value: Optional[str], name: str) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise InvalidQuery(f"Invalid {name}: {value}") from exc
+
+
+def _missing_episodes_query(run_id: int, args) -> Tuple[Any, str, bool]:
+    """Build the filtered projection query for a detection run.
+
+    Returns the (unordered) query, the sort name and whether it is descending.
+    """
+    query = (
+        read_session()
+        .query(*_MISSING_EPISODE_COLUMNS)
+        .join(Episode, MissingEpisode.episode_id == Episode.id)
+        .join(Show, MissingEpisode.show_id == Show.id)
+        .filter(MissingEpisode.detection_run_id == run_id)
+    )
+
+    library = args.get("library")
+    if library and library != "all":
+        query = query.filter(MissingEpisode.plex_library_id == str(library))
+
+    show = args.get("show")
+    if show:
+        title_matches = Show.title.ilike(f"%{show}%")
+        # Titles such as "24" or "1883" are numbers too.
+        query = query.filter(or_(Show.tmdb_id == int(show), title_matches) if show.isdigit() else title_matches)
+
+    season = _parse_int(args.get("season"), "season")
+    if season is not None:
+        query = query.filter(Episode.season_number == season)
+
+    air_date_from = _parse_date(args.get("air_date_from"), "air_date_from")
+    if air_date_from:
+        query = query.filter(Episode.air_date >= air_date_from)
+    air_date_to = _parse_date(args.get("air_date_to"), "air_date_to")
+    if air_date_to:
+        query = query.filter(Episode.air_date <= air_date_to)
+
+    sort = args.get("sort", "show")
+    _sort_keys(sort)
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise InvalidQuery(f"Unsupported order: {order}")
+
+    return query, sort, order == "desc"
+
+
+def _missing_episode_row_to_dict(row) -> Dict[str, Any]:
+    (
+        missing_id,
+        detected_at,
+        plex_library_id,
+        plex_library_name,
+        show_title,
+        show_year,
+        tmdb_show_id,
+        show_poster_path,
+        season_number,
+        episode_number,
+        episode_title,
+        air_date,
+        overview,
+        tmdb_episode_id,
+        still_path,
+        vote_average,
+    ) = row
+    return {
+        "id": missing_id,
+        "show_title": show_title,
+        "show_year": show_year,
+        "season_number": season_number,
+        "episode_number": episode_number,
+        "episode_title": episode_title,
+        "air_date": air_date.isoformat() if air_date else None,
+        "overview": overview or "",
+        "tmdb_show_id": tmdb_show_id,
+        "tmdb_episode_id": tmdb_episode_id,
+        "still_path": still_path,
+        "vote_average": vote_average or 0,
+        "show_poster_path": show_poster_path,
+        "plex_library_id": plex_library_id,
+        "plex_library_name": plex_library_name,
+        "detected_at": detected_at.isoformat() if detected_at else None,
+    }
+
+
+# Per-episode fields of the grouped format, sent as one array per field.
+GROUPED_EPISODE_FIELDS = (
+    "id",
+    "season_number",
+    "episode_number",
+    "episode_title",
+    "air_date",
+    "overview",
+    "tmdb_episode_id",
+    "still_path",
+    "vote_average",
+    "plex_library_id",
+    "plex_library_name",
+    "detected_at",
+)
+
+
+def _group_missing_episode_rows(rows) -> List[Dict[str, Any]]:
+    """Nest rows under their show, with the episodes stored column-wise.
+
+    Shows keep the order in which they first appear in ``rows`` and each
+    show's episodes keep their relative order.
+    """
+    shows: Dict[Tuple[Any, Any, Any], Dict[str, Any]] = {}
+    for row in rows:
+        episode = _missing_episode_row_to_dict(row)
+        key = (episode["tmdb_show_id"], episode["show_title"], episode["show_year"])
+        group = shows.get(key)
+        if group is None:
+            group = shows[key] = {
+                "title": episode["show_title"],
+                "year": episode["show_year"],
+                "tmdb_id": episode["tmdb_show_id"],
+                "poster_path": episode["show_poster_path"],
+                "episodes": {field: [] for field in GROUPED_EPISODE_FIELDS},
+            }
+        columns = group["episodes"]
+        for field in GROUPED_EPISODE_FIELDS:
+            columns[field].append(episode[field])
+    return list(shows.values())
+
 
 @detection_bp.route("/get_missing_episodes")
+@versioned_response
 def get_missing_episodes():
+    """Missing episodes of the latest completed detection run.
+
+    Optional query parameters: ``library``, ``show`` (title fragment; a
+    number also matches the TMDB ID), ``season``, ``air_date_from``/
+    ``air_date_to``, ``sort`` (``show``, ``air_date`` or ``detected``),
+    ``order`` and ``limit``. When a limit is given the response carries a
+    ``next_cursor`` to pass back as ``cursor`` for the next page. A cursor is
+    bound to its detection run: once a newer run has completed it is answered
+    with 409 and paging has to start over. ``total_missing`` is the filtered
+    total on every page.
+
+    With ``format=grouped`` the episodes are returned under ``shows``: each
+    show is listed once and its episodes are given as parallel arrays named
+    in :data:`GROUPED_EPISODE_FIELDS` instead of one object per episode.
+    """
     try:
         latest_run = (
-            DetectionRun.query.filter_by(status="completed")
+            read_session()
+            .query(DetectionRun)
+            .filter_by(status="completed")
             .order_by(DetectionRun.completed_at.desc())
             .first()
         )
 
+        args = request.args
+        response_format = args.get("format", "flat")
+        if response_format not in ("flat", "grouped"):
+            raise InvalidQuery(f"Unsupported format: {response_format}")
+        results_key = "shows" if response_format == "grouped" else "missing_episodes"
+
         if not latest_run:
             return jsonify(
                 {
                     "success": True,
-                    "missing_episodes": [],
+                    results_key: [],
                     "total_missing": 0,
                     "detection_run": None,
+                    "next_cursor": None,
                 }
             )
 
-        missing_episodes = MissingEpisode.query.filter_by(
-            detection_run_id=latest_run.id
-        ).all()
+        query, sort, descending = _missing_episodes_query(latest_run.id, args)
+        keys = _sort_keys(sort)
 
-        episodes_data: List[Dict[str, Any]] = []
-        for missing_ep in missing_episodes:
-            if not missing_ep.episode or not missing_ep.show:
-                continue
+        cursor = args.get("cursor")
+        if cursor:
+            cursor_run_id, cursor_values = _decode_cursor(cursor, sort)
+            if cursor_run_id != latest_run.id:
+                raise StaleCursor()
+        total_missing = query.order_by(None).count()
+        if cursor:
+            boundary = tuple_(*keys)
+            values = tuple_(*cursor_values)
+            query = query.filter(boundary < values if descending else boundary > values)
 
-            episode = missing_ep.episode
-            show = missing_ep.show
-            episodes_data.append(
-                {
-                    "show_title": show.title,
-                    "show_year": show.year,
-                    "season_number": episode.season_number,
-                    "episode_number": episode.episode_number,
-                    "episode_title": episode.title,
-                    "air_date": episode.air_date.isoformat() if episode.air_date else None,
-                    "overview": episode.overview or "",
-                    "tmdb_show_id": show.tmdb_id,
-                    "tmdb_episode_id": episode.tmdb_id,
-                    "still_path": episode.still_path,
-                    "vote_average": episode.vote_average or 0,
-                    "show_poster_path": show.poster_path,
-                    "detected_at": missing_ep.detected_at.isoformat()
-                    if missing_ep.detected_at
-                    else None,
-                }
-            )
+        query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+
+        limit = _parse_int(args.get("limit"), "limit")
+        if limit is not None:
+            limit = max(1, min(limit, MISSING_EPISODES_MAX_LIMIT))
+            rows = query.limit(limit + 1).all()
+        else:
+            rows = query.all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(latest_run.id, _cursor_values(rows[-1], sort))
+
+        if response_format == "grouped":
+            episodes_data = _group_missing_episode_rows(rows)
+        else:
+            episodes_data = [_missing_episode_row_to_dict(row) for row in rows]
 
         return jsonify(
             {
                 "success": True,
-                "missing_episodes": episodes_data,
-                "total_missing": len(episodes_data),
+                results_key: episodes_data,
+                "total_missing": total_missing,
                 "detection_run": latest_run.to_dict(),
+                "next_cursor": next_cursor,
             }
         )
+    except InvalidQuery as exc:
+        return jsonify({"success": False, "message": str(exc)}), 400
+    except StaleCursor:
+        return jsonify(
+            {
+                "success": False,
+                "message": "A newer detection run has completed; start again from the first page",
+            }
+        ), 409
     except Exception as exc:  # pylint: disable=broad-except
         current_app.logger.error("Error getting missing episodes: %s", exc)
         return jsonify({"success": False, "message": "Failed to connect to Plex server."})
 
 
+def _plex_shows_for(show: Show, plex) -> List[Any]:
+    """Plex shows matching a cached show, in every TV library.
+
+    ``show.title`` is the TMDB name and may differ from the Plex one, so each
+    TV library is asked for the show's ``tmdb://`` guid. A title search adds
+    copies matched by legacy agents: those whose own guid names the TMDB id
+    and, for shows without a TMDB guid, those with the same title and year.
+    """
+    matches: Dict[Any, Any] = {}
+    for section in plex_connections.get_sections(plex):
+        if getattr(section, "type", None) != "show":
+            continue
+        try:
+            plex_show = section.getGuid(f"tmdb://{show.tmdb_id}")
+        except (BadRequest, NotFound):
+            continue
+        matches.setdefault(plex_show.ratingKey, plex_show)
+
+    for plex_show in plex.library.search(title=show.title, libtype="show"):
+        tmdb_id = tmdb_guid(plex_show)
+        if tmdb_id == show.tmdb_id or (
+            tmdb_id is None
+            and plex_show.title == show.title
+            and (show.year is None or getattr(plex_show, "year", None) in (None, show.year))
+        ):
+            matches.setdefault(plex_show.ratingKey, plex_show)
+    return list(matches.values())
+
+
+@detection_bp.route("/shows/<int:identifier>/missing")
+def check_show(identifier: int):
+    """Missing episodes of one show, computed now from cached TMDB data.
+
+    ``identifier`` is a TMDB show id if that show is cached, otherwise a Plex
+    ratingKey; pass ``by=tmdb`` or ``by=plex`` to say which. Only the show's
+    Plex episodes are requested and nothing is written, so integrations can
+    poll single shows cheaply. Shows without cached TMDB data need a
+    detection run first; ``stale`` tells whether the cached data is due for
+    a refresh.
+    """
+    by = request.args.get("by")
+    if by not in (None, "", "tmdb", "plex"):
+        return jsonify({"success": False, "message": "by must be 'tmdb' or 'plex'"}), 400
+    if not config_store.config_exists():
+        return jsonify({"success": False, "message": "Configuration file not found"}), 400
+
+    config = config_store.load_config()
+    session = read_session()
+    try:
+        plex = plex_connections.get_configured_server(config)
+        show = session.query(Show).filter_by(tmdb_id=identifier).first() if by != "plex" else None
+        if show is not None:
+            plex_shows = _plex_shows_for(show, plex)
+        elif by != "tmdb":
+            try:
+                plex_show = plex.fetchItem(identifier)
+            except (BadRequest, NotFound):
+                plex_show = None
+            if plex_show is None or getattr(plex_show, "type", None) != "show":
+                return jsonify({"success": False, "message": f"No Plex show with ratingKey {identifier}"}), 404
+            plex_shows = [plex_show]
+            tmdb_id = tmdb_guid(plex_show)
+            show = session.query(Show).filter_by(tmdb_id=tmdb_id).first() if tmdb_id is not None else None
+            if show is None:
+                show = (
+                    session.query(Show)
+                    .filter_by(title=plex_show.title, year=getattr(plex_show, "year", None))
+                    .first()
+                )
+        if show is None:
+            return jsonify(
+                {"success": False, "message": "No cached TMDB data for this show; run detection first"}
+            ), 404
+        if not plex_shows:
+            return jsonify({"success": False, "message": f"'{show.title}' was not found in Plex"}), 404
+
+        # Filters name shows as Plex does, like in a detection run.
+        plex_title, plex_year = plex_shows[0].title, getattr(plex_shows[0], "year", None)
+        show_filter = load_filter_index(config.get("filtersFile") or FILTERS_PATH).lookup_show(plex_title, plex_year)
+        libraries = []
+        for plex_show in plex_shows:
+            missing = [] if show_filter.hide_show else check_show_from_cache(plex_show, show, show_filter)
+            libraries.append(
+                {
+                    "plex_rating_key": plex_show.ratingKey,
+                    "plex_library_id": str(getattr(plex_show, "librarySectionID", "") or ""),
+                    "plex_library_name": getattr(plex_show, "librarySectionTitle", None),
+                    "missing_episodes": missing,
+                }
+            )
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.error("Error checking show %s: %s", identifier, exc)
+        return jsonify({"success": False, "message": "Failed to connect to Plex server."})
+
+    return jsonify(
+        {
+            "success": True,
+            "show": {
+                "title": show.title,
+                "year": show.year,
+                "tmdb_id": show.tmdb_id,
+                "status": show.status,
+                "last_updated": show.last_updated.isoformat() if show.last_updated else None,
+                "stale": show.needs_update(max_age_days=7),
+            },
+            "hidden": show_filter.hide_show,
+            "libraries": libraries,
+            "total_missing": sum(len(library["missing_episodes"]) for library in libraries),
+        }
+    )
+
+
 @detection_bp.route("/reprocess_show", methods=["POST"])
 def reprocess_show():
     try:
@@ -127,6 +505,7 @@ def reprocess_show():
 
         existing_show.last_updated = None
         db.session.commit()
+        state.bump_data_version()
 
         current_app.logger.info("Reprocessing requested for show: %s", show_title)
         return jsonify(
@@ -2,20 +2,30 @@
 
 from __future__ import annotations
 
-from flask import Blueprint, current_app, jsonify
-from sqlalchemy import or_
+from typing import Dict, List, Tuple
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import case, or_, select
 
 from models import Episode, MissingEpisode, Show, db
 
+from .. import state
+from ..database import read_session
+from ..services import stats
+from ..tasks.maintenance import delete_orphaned_missing_episodes, run_orphan_cleanup_task
+from .caching import versioned_response
+
 
 maintenance_bp = Blueprint("maintenance_api", __name__, url_prefix="/api")
 
 
 @maintenance_bp.route("/shows_without_episodes")
+@versioned_response
 def shows_without_episodes():
     try:
         shows = (
-            db.session.query(Show)
+            read_session()
+            .query(Show)
             .outerjoin(Episode)
             .group_by(Show.id)
             .having(db.func.count(Episode.id) == 0)
@@ -39,40 +49,62 @@ def shows_without_episodes():
         return jsonify({"success": False, "message": "Failed to connect to Plex server."})
 
 
+def _count_where(condition):
+    return db.func.sum(case((condition, 1), else_=0))
+
+
 @maintenance_bp.route("/shows_with_incomplete_episodes")
+@versioned_response
 def shows_with_incomplete_episodes():
-    try:
-        shows_with_episodes = db.session.query(Show).join(Episode).distinct().all()
-        incomplete_data = []
+    """Shows whose episodes lack a rating, overview or title.
 
-        for show in shows_with_episodes:
-            incomplete_episodes = show.episodes.filter(
-                or_(
-                    Episode.vote_average.is_(None),
-                    Episode.vote_average == 0,
-                    Episode.overview.is_(None),
-                    Episode.overview == "",
-                    Episode.title.is_(None),
-                    Episode.title == "",
-                )
-            ).count()
+    Everything is computed by one grouped query. Pass ``limit`` (and
+    optionally ``offset``) to page through the results.
+    """
+    try:
+        missing_rating = or_(Episode.vote_average.is_(None), Episode.vote_average == 0)
+        missing_overview = or_(Episode.overview.is_(None), Episode.overview == "")
+        missing_title = or_(Episode.title.is_(None), Episode.title == "")
+        incomplete = _count_where(or_(missing_rating, missing_overview, missing_title))
+
+        query = (
+            read_session().query(
+                Show.title,
+                Show.year,
+                Show.tmdb_id,
+                Show.last_updated,
+                db.func.count(Episode.id),
+                incomplete,
+                _count_where(missing_rating),
+                _count_where(missing_overview),
+                _count_where(missing_title),
+            )
+            .join(Episode, Episode.show_id == Show.id)
+            .group_by(Show.id)
+            .having(incomplete > 0)
+        )
 
-            if incomplete_episodes == 0:
-                continue
+        limit = request.args.get("limit", type=int)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+        total_count = query.count() if limit is not None else None
 
-            total_episodes = show.episodes.count()
+        query = query.order_by(incomplete.desc(), Show.id)
+        if limit is not None:
+            query = query.limit(max(limit, 1)).offset(offset)
 
+        incomplete_data = []
+        for (
+            title,
+            year,
+            tmdb_id,
+            last_updated,
+            total_episodes,
+            incomplete_episodes,
+            episodes_missing_rating,
+            episodes_missing_overview,
+            episodes_missing_title,
+        ) in query.all():
             missing_data_types = []
-            episodes_missing_rating = show.episodes.filter(
-                or_(Episode.vote_average.is_(None), Episode.vote_average == 0)
-            ).count()
-            episodes_missing_overview = show.episodes.filter(
-                or_(Episode.overview.is_(None), Episode.overview == "")
-            ).count()
-            episodes_missing_title = show.episodes.filter(
-                or_(Episode.title.is_(None), Episode.title == "")
-            ).count()
-
             if episodes_missing_rating:
                 missing_data_types.append(f"ratings ({episodes_missing_rating})")
             if episodes_missing_overview:
@@ -82,86 +114,181 @@ def shows_with_incomplete_episodes():
 
             incomplete_data.append(
                 {
-                    "title": show.title,
-                    "year": show.year,
-                    "tmdb_id": show.tmdb_id,
-                    "last_updated": show.last_updated.isoformat() if show.last_updated else None,
+                    "title": title,
+                    "year": year,
+                    "tmdb_id": tmdb_id,
+                    "last_updated": last_updated.isoformat() if last_updated else None,
                     "episode_count": total_episodes,
                     "incomplete_episodes": incomplete_episodes,
                     "missing_data_types": ", ".join(missing_data_types),
                 }
             )
 
-        incomplete_data.sort(key=lambda item: item["incomplete_episodes"], reverse=True)
-        return jsonify({"success": True, "shows": incomplete_data, "total_count": len(incomplete_data)})
+        if total_count is None:
+            total_count = len(incomplete_data)
+        return jsonify({"success": True, "shows": incomplete_data, "total_count": total_count})
     except Exception as exc:  # pylint: disable=broad-except
         current_app.logger.error("Error getting shows with incomplete episodes: %s", exc)
         return jsonify({"success": False, "message": "Failed to connect to Plex server."})
 
 
+MERGE_CHUNK_SIZE = 200
+
+
+def _duplicate_groups() -> List[Tuple[int, int, List[int]]]:
+    """Return (tmdb_id, primary show id, duplicate show ids) for each duplicated TMDB ID.
+
+    The earliest created show of a group is kept as the primary.
+    """
+    duplicate_tmdb_ids = (
+        db.session.query(Show.tmdb_id)
+        .group_by(Show.tmdb_id)
+        .having(db.func.count(Show.id) > 1)
+    )
+    rows = (
+        db.session.query(Show.tmdb_id, Show.id)
+        .filter(Show.tmdb_id.in_(duplicate_tmdb_ids))
+        .order_by(Show.tmdb_id, Show.created_at, Show.id)
+        .all()
+    )
+
+    groups: Dict[int, List[int]] = {}
+    for tmdb_id, show_id in rows:
+        groups.setdefault(tmdb_id, []).append(show_id)
+    return [(tmdb_id, ids[0], ids[1:]) for tmdb_id, ids in groups.items() if len(ids) > 1]
+
+
+def _merge_duplicate_group(primary_id: int, duplicate_ids: List[int], dry_run: bool) -> Dict[str, int]:
+    """Fold ``duplicate_ids`` into ``primary_id`` with set-based statements.
+
+    Duplicate episodes the primary already has (same TMDB episode ID) are
+    deleted; the rest, and all missing episode records, are moved to the
+    primary. With ``dry_run`` only the affected row counts are returned.
+    """
+    episodes = Episode.__table__
+    missing = MissingEpisode.__table__
+    shows = Show.__table__
+    primary_episodes = episodes.alias("primary_episodes")
+
+    in_duplicates = episodes.c.show_id.in_(duplicate_ids)
+    shadowed = (
+        select(primary_episodes.c.id)
+        .where(
+            primary_episodes.c.show_id == primary_id,
+            primary_episodes.c.tmdb_id == episodes.c.tmdb_id,
+        )
+        .exists()
+    )
+
+    if dry_run:
+        def count(table, *conditions) -> int:
+            return db.session.execute(
+                select(db.func.count()).select_from(table).where(*conditions)
+            ).scalar()
+
+        return {
+            "shows_merged": len(duplicate_ids),
+            "episodes_deleted": count(episodes, in_duplicates, shadowed),
+            "episodes_moved": count(episodes, in_duplicates, ~shadowed),
+            "missing_reassigned": count(missing, missing.c.show_id.in_(duplicate_ids)),
+        }
+
+    episodes_deleted = db.session.execute(
+        episodes.delete().where(in_duplicates, shadowed)
+    ).rowcount
+    episodes_moved = db.session.execute(
+        episodes.update().where(in_duplicates).values(show_id=primary_id)
+    ).rowcount
+    missing_reassigned = db.session.execute(
+        missing.update().where(missing.c.show_id.in_(duplicate_ids)).values(show_id=primary_id)
+    ).rowcount
+
+    # Fill gaps in the primary's artwork and overview from the duplicates, oldest first.
+    group_rows = {
+        row.id: row
+        for row in db.session.execute(
+            select(shows.c.id, shows.c.poster_path, shows.c.overview).where(
+                shows.c.id.in_([primary_id] + duplicate_ids)
+            )
+        )
+    }
+    poster_path = group_rows[primary_id].poster_path
+    overview = group_rows[primary_id].overview
+    for duplicate_id in duplicate_ids:
+        poster_path = poster_path or group_rows[duplicate_id].poster_path
+        overview = overview or group_rows[duplicate_id].overview
+    if (poster_path, overview) != (group_rows[primary_id].poster_path, group_rows[primary_id].overview):
+        db.session.execute(
+            shows.update()
+            .where(shows.c.id == primary_id)
+            .values(poster_path=poster_path, overview=overview)
+        )
+
+    shows_merged = db.session.execute(shows.delete().where(shows.c.id.in_(duplicate_ids))).rowcount
+    stats.adjust(shows_count=-shows_merged, episodes_count=-episodes_deleted)
+
+    return {
+        "shows_merged": shows_merged,
+        "episodes_deleted": episodes_deleted,
+        "episodes_moved": episodes_moved,
+        "missing_reassigned": missing_reassigned,
+    }
+
+
 @maintenance_bp.route("/cleanup_duplicate_shows", methods=["POST"])
 def cleanup_duplicate_shows():
+    """Merge shows that share a TMDB ID into the oldest record.
+
+    Post ``{"dry_run": true}`` to get the counts of what would change
+    without modifying anything.
+    """
     try:
-        duplicate_tmdb_ids = (
-            db.session.query(Show.tmdb_id)
-            .group_by(Show.tmdb_id)
-            .having(db.func.count(Show.id) > 1)
-            .all()
-        )
+        data = request.get_json(silent=True) or {}
+        dry_run = bool(data.get("dry_run"))
+
+        groups = _duplicate_groups()
+        totals = {"shows_merged": 0, "episodes_deleted": 0, "episodes_moved": 0, "missing_reassigned": 0}
+
+        # Every chunk runs inside the same transaction, which is committed once at the end.
+        for start in range(0, len(groups), MERGE_CHUNK_SIZE):
+            chunk = groups[start : start + MERGE_CHUNK_SIZE]
+            for tmdb_id, primary_id, duplicate_ids in chunk:
+                counts = _merge_duplicate_group(primary_id, duplicate_ids, dry_run)
+                for key, value in counts.items():
+                    totals[key] += value
+                if not dry_run:
+                    current_app.logger.info(
+                        "Merged %s duplicate show(s) into show %s (TMDB ID: %s)",
+                        len(duplicate_ids),
+                        primary_id,
+                        tmdb_id,
+                    )
+            current_app.logger.info(
+                "Processed %s of %s duplicate show groups",
+                min(start + MERGE_CHUNK_SIZE, len(groups)),
+                len(groups),
+            )
 
-        cleaned_count = 0
-        for (tmdb_id,) in duplicate_tmdb_ids:
-            shows = Show.query.filter_by(tmdb_id=tmdb_id).order_by(Show.created_at).all()
-            if len(shows) <= 1:
-                continue
-
-            primary_show = shows[0]
-            for duplicate_show in shows[1:]:
-                episodes = Episode.query.filter_by(show_id=duplicate_show.id).all()
-                for episode in episodes:
-                    existing_episode = Episode.query.filter_by(
-                        show_id=primary_show.id, tmdb_id=episode.tmdb_id
-                    ).first()
-                    if not existing_episode:
-                        episode.show_id = primary_show.id
-                    else:
-                        db.session.delete(episode)
-
-                missing_episodes = MissingEpisode.query.filter_by(show_id=duplicate_show.id).all()
-                for missing_ep in missing_episodes:
-                    missing_ep.show_id = primary_show.id
-
-                if not primary_show.poster_path and duplicate_show.poster_path:
-                    primary_show.poster_path = duplicate_show.poster_path
-                if not primary_show.overview and duplicate_show.overview:
-                    primary_show.overview = duplicate_show.overview
-
-                db.session.delete(duplicate_show)
-                cleaned_count += 1
-                current_app.logger.info(
-                    "Merged duplicate show '%s' into '%s' (TMDB ID: %s)",
-                    duplicate_show.title,
-                    primary_show.title,
-                    tmdb_id,
-                )
+        if dry_run:
+            db.session.rollback()
+            return jsonify(
+                {
+                    "success": True,
+                    "dry_run": True,
+                    "message": (
+                        f"Would merge {totals['shows_merged']} duplicate shows "
+                        f"in {len(groups)} groups"
+                    ),
+                    "duplicate_groups": len(groups),
+                    **totals,
+                }
+            )
 
+        cleaned_count = totals["shows_merged"]
         db.session.commit()
+        state.bump_data_version()
 
-        orphaned_missing = (
-            db.session.query(MissingEpisode)
-            .outerjoin(Episode)
-            .outerjoin(Show)
-            .filter(or_(Episode.id.is_(None), Show.id.is_(None)))
-            .all()
-        )
-
-        orphaned_count = len(orphaned_missing)
-        for orphan in orphaned_missing:
-            db.session.delete(orphan)
-
-        if orphaned_count:
-            db.session.commit()
-            current_app.logger.info("Cleaned up %s orphaned missing episode records", orphaned_count)
+        orphaned_count = delete_orphaned_missing_episodes()
 
         message = f"Cleaned up {cleaned_count} duplicate shows"
         if orphaned_count:
@@ -173,6 +300,8 @@ def cleanup_duplicate_shows():
                 "message": message,
                 "cleaned_count": cleaned_count,
                 "orphaned_count": orphaned_count,
+                "duplicate_groups": len(groups),
+                **totals,
             }
         )
     except Exception as exc:  # pylint: disable=broad-except
@@ -183,23 +312,20 @@ def cleanup_duplicate_shows():
 
 @maintenance_bp.route("/cleanup_orphaned_records", methods=["POST"])
 def cleanup_orphaned_records():
-    try:
-        orphaned_records = (
-            db.session.query(MissingEpisode)
-            .outerjoin(Episode)
-            .outerjoin(Show)
-            .filter(or_(Episode.id.is_(None), Show.id.is_(None)))
-            .all()
-        )
+    """Delete orphaned missing episode records in bounded chunks.
 
-        cleaned_count = len(orphaned_records)
-        for record in orphaned_records:
-            db.session.delete(record)
-            current_app.logger.info(
-                "Deleted orphaned missing episode record ID: %s", record.id
-            )
-
-        db.session.commit()
+    Post ``{"background": true}`` to run the cleanup as a background task
+    tracked through ``/api/task_status``.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get("background"):
+            if not state.start_task("Starting orphaned record cleanup..."):
+                return jsonify({"success": False, "message": "A task is already running"})
+            run_orphan_cleanup_task()
+            return jsonify({"success": True, "message": "Orphaned record cleanup started"})
+
+        cleaned_count = delete_orphaned_missing_episodes()
 
         return jsonify(
             {
@@ -2,24 +2,21 @@
 
 from __future__ import annotations
 
-import json
-from pathlib import Path
 import time
 
 from flask import Blueprint, current_app, jsonify, request
 from plexapi.exceptions import BadRequest, NotFound, Unauthorized
-from plexapi.server import PlexServer
 
-CONFIG_PATH = Path(__file__).resolve().parents[2] / "config.json"
+from ..services import config as config_store
+from ..services import plex as plex_connections
 
 plex_bp = Blueprint("plex_api", __name__, url_prefix="/api")
 
 
 def _load_config():
-    if not CONFIG_PATH.exists():
+    if not config_store.config_exists():
         return None
-    with CONFIG_PATH.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return config_store.load_config()
 
 @plex_bp.route("/test_plex_connection", methods=["POST"])
 def test_plex_connection():
@@ -32,11 +29,11 @@ def test_plex_connection():
             return jsonify({"success": False, "message": "Plex URL and token are required"})
 
         start_time = time.perf_counter()
-        plex = PlexServer(plex_url, plex_token)
+        plex = plex_connections.get_server(plex_url, plex_token)
         connection_time = int((time.perf_counter() - start_time) * 1000)
 
         libraries = []
-        for library in plex.library.sections():
+        for library in plex_connections.get_sections(plex):
             if getattr(library, "type", None) == "show":
                 libraries.append(
                     {
@@ -101,10 +98,10 @@ def get_plex_libraries():
                 }
             )
 
-        plex = PlexServer(plex_url, plex_token)
+        plex = plex_connections.get_configured_server(config)
 
         libraries = []
-        for library in plex.library.sections():
+        for library in plex_connections.get_sections(plex):
             if library.type == "show":
                 libraries.append(
                     {
@@ -190,11 +187,11 @@ def debug_plex_libraries():
             current_app.logger.info("Debug response (incomplete config): %s", response)
             return jsonify(response)
 
-        plex = PlexServer(plex_url, plex_token)
+        plex = plex_connections.get_configured_server(config)
         current_app.logger.info("Connected to Plex: %s", plex.friendlyName)
 
         libraries = []
-        for library in plex.library.sections():
+        for library in plex_connections.get_sections(plex):
             if library.type == "show":
                 libraries.append({"key": library.key, "title": library.title, "type": library.type})
 
@@ -2,22 +2,120 @@
 
 from __future__ import annotations
 
-from flask import Blueprint, jsonify
+import json
+import time
 
-from .. import state
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from models import Job
+
+from .. import scheduler, state
+from ..database import read_session
+from ..services import jobs
+from ..tasks.detection import finish_detection_run
 
 
 task_bp = Blueprint("task_api", __name__, url_prefix="/api")
 
+# Status changes are coalesced so a busy task sends at most this many updates per second.
+STREAM_MAX_UPDATES_PER_SECOND = 4
+STREAM_KEEPALIVE_SECONDS = 15
+# A stream ends after this long and the page reconnects, so open tabs do not
+# hold a worker thread for the whole of a long run.
+STREAM_MAX_SECONDS = 300
+JOBS_DEFAULT_LIMIT = 50
+
 
 @task_bp.route("/task_status")
 def get_task_status():
     return jsonify(state.get_task_status())
 
 
+@task_bp.route("/task_status/stream")
+def stream_task_status():
+    """Push task status changes as Server-Sent Events.
+
+    Each update is sent as a ``status`` event, preceded by any ``show`` events
+    published since the previous update. The stream ends after the first status
+    that reports the task as no longer running, or with a ``reconnect`` event
+    after :data:`STREAM_MAX_SECONDS`; its ``after`` value is passed back as
+    ``after`` to continue with the next ``show`` event.
+    """
+    after = request.args.get("after", type=int)
+
+    def generate():
+        min_interval = 1.0 / STREAM_MAX_UPDATES_PER_SECOND
+        version = -1
+        last_event = state.get_last_event_seq() if after is None else after
+        last_sent = 0.0
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield f"event: reconnect\ndata: {json.dumps({'after': last_event})}\n\n"
+                break
+            new_version, status, events = state.wait_for_task_update(
+                version, last_event, timeout=min(STREAM_KEEPALIVE_SECONDS, remaining)
+            )
+            if new_version == version:
+                yield ": keepalive\n\n"
+                continue
+
+            delay = min_interval - (time.monotonic() - last_sent)
+            if delay > 0:
+                # Let further changes pile up, then send only the latest status.
+                time.sleep(delay)
+                new_version, status, events = state.get_task_update(last_event)
+
+            for seq, event in events:
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                last_event = seq
+
+            yield f"event: status\ndata: {json.dumps(status)}\n\n"
+            version = new_version
+            last_sent = time.monotonic()
+
+            if not status.get("running"):
+                break
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @task_bp.route("/stop_task", methods=["POST"])
 def stop_task():
     if state.is_task_running():
         state.stop_task("Task stopped by user")
+        # Running jobs notice the stopped task themselves; queued ones never start.
+        jobs.cancel_queued()
+        detection_run_id = state.get_current_detection_run()
+        if detection_run_id is not None:
+            finish_detection_run(detection_run_id)
         return jsonify({"success": True, "message": "Task stopped successfully"})
     return jsonify({"success": False, "message": "No task is currently running"})
+
+
+@task_bp.route("/jobs")
+def list_jobs():
+    """Recent jobs in the worker queue, newest first; filter with ``status``."""
+    try:
+        limit = max(1, min(int(request.args.get("limit", JOBS_DEFAULT_LIMIT)), 500))
+    except ValueError:
+        limit = JOBS_DEFAULT_LIMIT
+
+    query = read_session().query(Job)
+    status = request.args.get("status")
+    if status:
+        query = query.filter(Job.status == status)
+    rows = query.order_by(Job.id.desc()).limit(limit).all()
+    return jsonify({"success": True, "jobs": [job.to_dict() for job in rows]})
+
+
+@task_bp.route("/schedule")
+def get_schedule():
+    """Scheduled detection settings, the next run and how many shows are due."""
+    return jsonify({"success": True, "schedule": scheduler.status()})
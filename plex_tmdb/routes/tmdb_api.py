@@ -2,16 +2,13 @@
 
 from __future__ import annotations
 
-import json
-from pathlib import Path
-
 import requests
 from flask import Blueprint, current_app, jsonify, request
 
+from ..services import config as config_store
 from ..services.tmdb import search_tmdb_show
 
 TMDB_SESSION = requests.Session()
-CONFIG_PATH = Path(__file__).resolve().parents[2] / "config.json"
 
 
 tmdb_bp = Blueprint("tmdb_api", __name__, url_prefix="/api")
@@ -102,11 +99,10 @@ def test_improved_tmdb_search():
         if not title:
             return jsonify({"success": False, "message": "Title is required"}), 400
 
-        if not CONFIG_PATH.exists():
+        if not config_store.config_exists():
             return jsonify({"success": False, "message": "Configuration not found"}), 404
 
-        with CONFIG_PATH.open("r", encoding="utf-8") as handle:
-            config = json.load(handle)
+        config = config_store.load_config()
 
         api_key = config.get("tmdbApiKey")
         language = config.get("tmdbLanguage", "en-US")
@@ -0,0 +1,231 @@
+"""Recurring missing episode detection, configured in ``config.json``.
+
+The ``schedule`` section turns it on::
+
+    "schedule": {
+        "enabled": true,
+        "intervalMinutes": 360,
+        "jitterMinutes": 15,
+        "quietHours": ["23:00-07:00"],
+        "maxDuration": 1800,
+        "maxApiCalls": 2000
+    }
+
+Runs are incremental: shows with fresh cached TMDB data are checked without
+querying TMDB, and ``maxDuration``/``maxApiCalls`` bound each run. The
+interval adapts to the number of shows due for a refresh, shrinking down to
+``minIntervalMinutes`` (a quarter of the interval by default) when more than
+``dueShowsTarget`` are due and growing up to ``maxIntervalMinutes`` (four
+times the interval) when fewer are. A run
+that comes due while another task is running is skipped, and runs due in
+quiet hours (local time) move to the end of them.
+
+The next run time lives in the shared task state, so any number of
+processes may run the scheduler and each run still starts only once.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy import func, or_, select
+
+from models import Show, db
+
+from . import state
+from .database import read_session
+from .services import config as config_store
+from .tasks import detection
+
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 30.0
+# Shows whose cached TMDB data is older than this are due for a refresh.
+REFRESH_AGE_DAYS = 7
+MIN_DELAY_SECONDS = 60.0
+
+
+class ScheduleSettings(NamedTuple):
+    enabled: bool = False
+    interval_minutes: float = 360.0
+    min_interval_minutes: float = 60.0
+    max_interval_minutes: float = 1440.0
+    jitter_minutes: float = 15.0
+    due_shows_target: int = 50
+    quiet_hours: Tuple[Tuple[int, int], ...] = ()  # (start, end) in minutes after midnight
+    options: Dict[str, Any] = {}
+
+
+def _number(section: Dict[str, Any], key: str, default: float) -> float:
+    try:
+        value = float(section.get(key, default))
+    except (TypeError, ValueError):
+        logger.warning("Ignoring invalid schedule.%s: %r", key, section.get(key))
+        return default
+    return value if value >= 0 else default
+
+
+def _parse_quiet_hours(value: Any) -> Tuple[Tuple[int, int], ...]:
+    windows: List[Tuple[int, int]] = []
+    for window in [value] if isinstance(value, str) else value or []:
+        try:
+            start, end = (
+                int(hours) * 60 + int(minutes or 0)
+                for hours, _, minutes in (part.strip().partition(":") for part in str(window).split("-"))
+            )
+        except ValueError:
+            logger.warning("Ignoring invalid quiet hours %r; expected e.g. \"23:00-07:00\"", window)
+            continue
+        windows.append((start % 1440, end % 1440))
+    return tuple(windows)
+
+
+def load_settings(config: Optional[Dict[str, Any]] = None) -> ScheduleSettings:
+    config = config_store.load_config() if config is None else config
+    section = config.get("schedule") or {}
+    if not isinstance(section, dict):
+        return ScheduleSettings()
+
+    interval = _number(section, "intervalMinutes", 360.0) or 360.0
+    options: Dict[str, Any] = {"library": section.get("library", "all")}
+    for key, option in (("maxDuration", "max_duration"), ("maxApiCalls", "max_api_calls"), ("shards", "shards")):
+        if section.get(key) not in (None, ""):
+            options[option] = section[key]
+
+    return ScheduleSettings(
+        enabled=bool(section.get("enabled")) and config_store.config_exists(),
+        interval_minutes=interval,
+        min_interval_minutes=min(_number(section, "minIntervalMinutes", interval / 4), interval),
+        max_interval_minutes=max(_number(section, "maxIntervalMinutes", interval * 4), interval),
+        jitter_minutes=_number(section, "jitterMinutes", 15.0),
+        due_shows_target=int(_number(section, "dueShowsTarget", 50)) or 50,
+        quiet_hours=_parse_quiet_hours(section.get("quietHours")),
+        options=options,
+    )
+
+
+def count_due_shows() -> int:
+    """Number of shows whose cached TMDB data is due for a refresh."""
+    cutoff = datetime.utcnow() - timedelta(days=REFRESH_AGE_DAYS)
+    session = read_session()
+    return session.execute(
+        select(func.count(Show.id)).where(or_(Show.last_updated.is_(None), Show.last_updated < cutoff))
+    ).scalar() or 0
+
+
+def next_delay(settings: ScheduleSettings, due_shows: int) -> float:
+    """Seconds until the next run: the interval scaled by how many shows are due, with jitter."""
+    minutes = settings.interval_minutes * settings.due_shows_target / max(due_shows, 1)
+    minutes = max(settings.min_interval_minutes, min(minutes, settings.max_interval_minutes))
+    minutes += random.uniform(-settings.jitter_minutes, settings.jitter_minutes)
+    return max(minutes * 60, MIN_DELAY_SECONDS)
+
+
+def quiet_until(settings: ScheduleSettings, now: datetime) -> Optional[datetime]:
+    """End of the quiet hours ``now`` (local time) falls in, or None."""
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minute = now.hour * 60 + now.minute
+    for start, end in settings.quiet_hours:
+        if start <= end:
+            if start <= minute < end:
+                return midnight + timedelta(minutes=end)
+        elif minute >= start:
+            return midnight + timedelta(days=1, minutes=end)
+        elif minute < end:
+            return midnight + timedelta(minutes=end)
+    return None
+
+
+def _start_scheduled_detection(settings: ScheduleSettings, due_shows: int) -> None:
+    if not state.start_task("Starting scheduled missing episode detection..."):
+        logger.info("Skipping scheduled detection: a task is already running")
+        return
+    try:
+        detection_run = detection.start_detection_run(dict(settings.options), trigger="scheduled")
+    except Exception as exc:  # pylint: disable=broad-except
+        db.session.rollback()
+        state.stop_task(f"Error: {exc}")
+        logger.error("Could not start scheduled detection: %s", exc)
+        return
+    logger.info("Started scheduled detection run %s (%s shows due)", detection_run.id, due_shows)
+
+
+def tick(now: Optional[float] = None) -> None:
+    """Start a detection run if one is due; called periodically by every scheduler."""
+    settings = load_settings()
+    if not settings.enabled:
+        return
+
+    now = time.time() if now is None else now
+    next_run = state.get_next_scheduled_run()
+    if next_run is None:
+        state.claim_scheduled_run(None, now + next_delay(settings, count_due_shows()))
+        return
+    if now < next_run:
+        return
+
+    quiet_end = quiet_until(settings, datetime.fromtimestamp(now))
+    if quiet_end is not None:
+        # Spread the postponed run a little so it does not start on the minute.
+        postponed = quiet_end.timestamp() + random.uniform(0, settings.jitter_minutes * 60)
+        if state.claim_scheduled_run(next_run, postponed):
+            logger.info("Scheduled detection postponed until the quiet hours end at %s", quiet_end)
+        return
+
+    due_shows = count_due_shows()
+    if not state.claim_scheduled_run(next_run, now + next_delay(settings, due_shows)):
+        return
+    _start_scheduled_detection(settings, due_shows)
+
+
+def status() -> Dict[str, Any]:
+    settings = load_settings()
+    next_run = state.get_next_scheduled_run()
+    return {
+        "enabled": settings.enabled,
+        "next_run": datetime.fromtimestamp(next_run).isoformat() if settings.enabled and next_run else None,
+        "due_shows": count_due_shows(),
+        "interval_minutes": settings.interval_minutes,
+        "min_interval_minutes": settings.min_interval_minutes,
+        "max_interval_minutes": settings.max_interval_minutes,
+        "jitter_minutes": settings.jitter_minutes,
+        "quiet_hours": [
+            f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}" for start, end in settings.quiet_hours
+        ],
+        "options": settings.options,
+    }
+
+
+@config_store.subscribe
+def _schedule_changed(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    # Plan the next run afresh so a shorter interval takes effect right away.
+    # ``old`` is empty when the configuration is first loaded.
+    if old and old.get("schedule") != new.get("schedule"):
+        state.set_next_scheduled_run(None)
+
+
+def _scheduler_loop(app: Flask, stop: threading.Event) -> None:
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                tick()
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Scheduler check failed")
+        stop.wait(POLL_INTERVAL_SECONDS)
+
+
+def start(app: Flask, stop: Optional[threading.Event] = None) -> threading.Thread:
+    """Run the scheduler in a daemon thread until ``stop`` is set."""
+    thread = threading.Thread(
+        target=_scheduler_loop, args=(app, stop or threading.Event()), name="plex-tmdb-scheduler", daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,166 @@
+"""Shared, cached access to ``config.json``.
+
+The parsed configuration is kept in memory and only re-read when the file's
+mtime changes. The mtime itself is checked at most every
+:data:`CHECK_INTERVAL_SECONDS`, so request handlers and tasks calling
+:func:`load_config` normally do no file I/O at all. :func:`save_config`
+writes through a temporary file and an atomic rename, so readers never see
+a partially written file, and notifies subscribers straight away;
+:func:`update_config` does the same for a partial update.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = Path(__file__).resolve().parents[2] / "config.json"
+CHECK_INTERVAL_SECONDS = 2.0
+
+Subscriber = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+_lock = threading.RLock()
+_config: Dict[str, Any] = {}
+_exists = False
+_mtime: Optional[float] = None
+_checked_at = 0.0
+_subscribers: List[Subscriber] = []
+
+
+def _notify(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    if old == new:
+        return
+    for callback in list(_subscribers):
+        try:
+            callback(dict(old), dict(new))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Config subscriber %r failed", callback)
+
+
+def _refresh(force: bool = False) -> None:
+    global _config, _exists, _mtime, _checked_at
+
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _checked_at < CHECK_INTERVAL_SECONDS:
+            return
+        _checked_at = now
+
+        try:
+            mtime = os.stat(CONFIG_PATH).st_mtime
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime == _mtime and not force:
+            return
+
+        old = _config
+        if mtime is None:
+            new: Dict[str, Any] = {}
+        else:
+            try:
+                with CONFIG_PATH.open("r", encoding="utf-8") as handle:
+                    new = json.load(handle)
+            except (OSError, ValueError) as exc:
+                # keep serving the last good configuration until the file is fixed
+                logger.error("Could not read %s: %s", CONFIG_PATH, exc)
+                return
+
+        _config, _exists, _mtime = new, mtime is not None, mtime
+        if _exists:
+            logger.info("Loaded configuration from %s", CONFIG_PATH)
+
+    _notify(old, new)
+
+
+def load_config() -> Dict[str, Any]:
+    """Return a copy of the current configuration (empty if there is none)."""
+    _refresh()
+    with _lock:
+        return dict(_config)
+
+
+def config_exists() -> bool:
+    """Whether a configuration file has been saved."""
+    _refresh()
+    with _lock:
+        return _exists
+
+
+def _file_mode(path: Path) -> int:
+    """Permission bits of ``path``, or 0644 for a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o644
+
+
+def save_config(config: Dict[str, Any]) -> None:
+    """Atomically replace ``config.json`` and update the cached configuration."""
+    global _config, _exists, _mtime, _checked_at
+
+    with _lock:
+        handle = tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=CONFIG_PATH.parent,
+            prefix=f".{CONFIG_PATH.name}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        try:
+            with handle:
+                json.dump(config, handle, indent=2)
+                handle.flush()
+                os.fsync(handle.fileno())
+            # NamedTemporaryFile creates the file 0600; keep config.json's own mode.
+            os.chmod(handle.name, _file_mode(CONFIG_PATH))
+            os.replace(handle.name, CONFIG_PATH)
+        except BaseException:
+            try:
+                os.unlink(handle.name)
+            except OSError:
+                pass
+            raise
+
+        old = _config
+        _config = dict(config)
+        _exists = True
+        _mtime = os.stat(CONFIG_PATH).st_mtime
+        _checked_at = time.monotonic()
+        new = _config
+
+    _notify(old, new)
+
+
+def update_config(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Save ``changes`` on top of the stored configuration and return the result.
+
+    Keys not in ``changes`` keep their saved values, so settings that a form
+    does not show (``schedule``, ``detectionShards``, ...) survive a save.
+    """
+    with _lock:
+        _refresh(force=True)
+        config = dict(_config, **changes)
+        save_config(config)
+    return config
+
+
+def subscribe(callback: Subscriber) -> Subscriber:
+    """Call ``callback(old, new)`` whenever the configuration changes.
+
+    Returns the callback, so it can be used as a decorator.
+    """
+    with _lock:
+        _subscribers.append(callback)
+    return callback
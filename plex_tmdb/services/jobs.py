@@ -0,0 +1,209 @@
+"""Database-backed job queue with leases.
+
+The web app only enqueues jobs; workers (``plex-tmdb worker`` processes, or
+the thread started by ``plex-tmdb serve``) claim them. A claim is a single
+``UPDATE`` that hands the oldest available job to one worker together with a
+lease. The worker renews the lease with heartbeats while it runs the job; if
+it dies, the lease expires and another worker picks the job up again, up to
+:data:`MAX_ATTEMPTS` times.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+
+from models import Job, db
+
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# Below this much progress an estimate of the time left is mostly noise.
+ETA_MIN_PROGRESS = 0.02
+
+
+def enqueue(kind: str, payload: Dict[str, Any], detection_run_id: Optional[int] = None) -> Job:
+    """Add a job to the queue and commit it."""
+    job = Job(kind=kind, status="queued", detection_run_id=detection_run_id)
+    job.set_payload(payload)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _expired(now: datetime):
+    return and_(Job.status == "running", Job.lease_expires_at < now)
+
+
+def reap_expired() -> List[int]:
+    """Fail abandoned jobs that ran out of attempts; returns their detection run ids."""
+    now = datetime.utcnow()
+    stuck = and_(_expired(now), Job.attempts >= MAX_ATTEMPTS)
+    run_ids = [
+        run_id
+        for (run_id,) in db.session.execute(select(Job.detection_run_id).where(stuck).distinct())
+        if run_id is not None
+    ]
+    reaped = db.session.execute(
+        Job.__table__.update()
+        .where(stuck)
+        .values(
+            status="failed",
+            error_message=f"Worker lease expired {MAX_ATTEMPTS} times",
+            finished_at=now,
+            lease_owner=None,
+        )
+    ).rowcount
+    db.session.commit()
+    if reaped:
+        logger.warning("Gave up on %s job(s) whose workers stopped responding", reaped)
+    return run_ids
+
+
+def claim(owner: str, kinds: Optional[Sequence[str]] = None, lease_seconds: float = LEASE_SECONDS) -> Optional[Job]:
+    """Atomically take the oldest queued (or abandoned) job for ``owner``.
+
+    ``owner`` must be unique per worker thread. Returns None when nothing is
+    available. Abandoned jobs are only retried while they have attempts left;
+    :func:`reap_expired` fails the others.
+    """
+    now = datetime.utcnow()
+    available = or_(Job.status == "queued", and_(_expired(now), Job.attempts < MAX_ATTEMPTS))
+    if kinds:
+        available = and_(available, Job.kind.in_(list(kinds)))
+    candidate = (
+        select(Job.id).where(available).order_by(Job.id).limit(1).correlate(None).scalar_subquery()
+    )
+
+    claimed = db.session.execute(
+        Job.__table__.update()
+        # Re-checking the condition keeps two workers from taking the same job.
+        .where(and_(Job.id == candidate, available))
+        .values(
+            status="running",
+            lease_owner=owner,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+            started_at=func.coalesce(Job.started_at, now),
+            attempts=Job.attempts + 1,
+        )
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+    return Job.query.filter_by(lease_owner=owner, status="running").order_by(Job.id.desc()).first()
+
+
+def heartbeat(job_id: int, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+    """Extend the lease on ``job_id``; False if ``owner`` no longer holds it."""
+    now = datetime.utcnow()
+    renewed = db.session.execute(
+        Job.__table__.update()
+        .where(and_(Job.id == job_id, Job.lease_owner == owner, Job.status == "running"))
+        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds))
+    ).rowcount
+    db.session.commit()
+    return bool(renewed)
+
+
+def set_progress(job_id: int, fraction: float, cost_estimate: Optional[float] = None) -> None:
+    """Record how far a job is (0..1), optionally with its estimated total cost in seconds."""
+    values: Dict[str, Any] = {"progress": max(0.0, min(fraction, 1.0))}
+    if cost_estimate is not None:
+        values["cost_estimate"] = cost_estimate
+    db.session.execute(Job.__table__.update().where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+
+def finish(
+    job_id: int,
+    owner: str,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """Record the outcome of a job; False if the lease was lost in the meantime."""
+    values: Dict[str, Any] = {
+        "status": status,
+        "finished_at": datetime.utcnow(),
+        "lease_expires_at": None,
+        "error_message": error,
+    }
+    if status == "completed":
+        values["progress"] = 1.0
+    if result is not None:
+        values["result"] = json.dumps(result)
+    finished = db.session.execute(
+        Job.__table__.update()
+        .where(and_(Job.id == job_id, Job.lease_owner == owner, Job.status == "running"))
+        .values(**values)
+    ).rowcount
+    db.session.commit()
+    if not finished:
+        logger.warning("Job %s was taken over by another worker; discarding its result", job_id)
+    return bool(finished)
+
+
+def cancel_queued(detection_run_id: Optional[int] = None) -> int:
+    """Cancel jobs that have not started yet, optionally only those of one run."""
+    condition = Job.status == "queued"
+    if detection_run_id is not None:
+        condition = and_(condition, Job.detection_run_id == detection_run_id)
+    cancelled = db.session.execute(
+        Job.__table__.update().where(condition).values(status="cancelled", finished_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    return cancelled
+
+
+def run_jobs(detection_run_id: int, kinds: Iterable[str] = ()) -> List[Job]:
+    query = Job.query.filter_by(detection_run_id=detection_run_id)
+    kinds = list(kinds)
+    if kinds:
+        query = query.filter(Job.kind.in_(kinds))
+    return query.order_by(Job.id).all()
+
+
+def run_progress(detection_run_id: int, kind: str) -> Tuple[float, Optional[float]]:
+    """Progress (0..1) and estimated seconds left for the ``kind`` jobs of a run.
+
+    Progress is weighted by each job's cost estimate; jobs that have not
+    estimated their cost yet count as an average one. The time left is
+    extrapolated from the time spent since the first of them started, so it
+    reflects however many workers are actually taking part.
+    """
+    rows = db.session.execute(
+        select(Job.progress, Job.cost_estimate, Job.started_at).where(
+            and_(Job.detection_run_id == detection_run_id, Job.kind == kind)
+        )
+    ).all()
+    if not rows:
+        return 0.0, None
+
+    known = [cost for _, cost, _ in rows if cost]
+    default_cost = sum(known) / len(known) if known else 1.0
+    total = sum(cost or default_cost for _, cost, _ in rows)
+    done = sum((progress or 0.0) * (cost or default_cost) for progress, cost, _ in rows)
+    fraction = done / total if total else 0.0
+
+    started = [started_at for _, _, started_at in rows if started_at]
+    if fraction < ETA_MIN_PROGRESS or not started:
+        return fraction, None
+    elapsed = (datetime.utcnow() - min(started)).total_seconds()
+    return fraction, elapsed * (1.0 - fraction) / fraction
+
+
+def unfinished_count(detection_run_id: int) -> int:
+    return db.session.execute(
+        select(func.count(Job.id)).where(
+            and_(Job.detection_run_id == detection_run_id, Job.status.notin_(FINISHED_STATUSES))
+        )
+    ).scalar() or 0
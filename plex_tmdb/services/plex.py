@@ -0,0 +1,379 @@
+"""Reusable Plex server connections.
+
+Connecting with :class:`~plexapi.server.PlexServer` performs a full request
+to the server root, so constructing one per request makes every library
+dropdown refresh pay for a connection setup. This module keeps one
+``PlexServer`` per ``(url, token)`` on a keep-alive session, re-validates it
+with a cheap ``/identity`` request once :data:`HEALTH_TTL_SECONDS` have
+passed, and briefly caches the library section listing. Every request is
+bounded by a timeout so an unreachable server cannot hang a worker.
+
+A server is often reachable through several addresses (a ``plex.direct``
+name, a LAN IP, a relay). Extra addresses listed under ``plexUrls`` in
+config.json are probed concurrently; requests are sent to the fastest one,
+LAN addresses first, and are moved to another address when the active one
+fails or becomes much slower than it was when probed. While requests are
+flowing the active address is re-timed with an ``/identity`` request every
+:data:`CHECK_INTERVAL_SECONDS`, so a connection that slows down during a
+long run is noticed even though the run's own requests are not timed.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import requests
+from plexapi.server import PlexServer
+from requests.adapters import HTTPAdapter
+
+from . import config as config_store
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds; overridable with "plexTimeout" in config.json.
+DEFAULT_TIMEOUT = 10
+HEALTH_TTL_SECONDS = 60
+SECTIONS_TTL_SECONDS = 30
+POOL_SIZE = 10
+
+# Expected body size used to weigh throughput against latency when ranking.
+PROBE_REFERENCE_BYTES = 256 * 1024
+# The active address counts as degraded once its smoothed request time exceeds
+# both DEGRADED_FACTOR times and DEGRADED_MIN_SECONDS more than its probe.
+# Only requests for these paths are timed: their responses are as small as the
+# probe's, whereas library listings take longer simply for being large.
+TIMED_PATHS = ("/identity",)
+DEGRADED_FACTOR = 5.0
+DEGRADED_MIN_SECONDS = 1.0
+REPROBE_INTERVAL_SECONDS = 60
+CHECK_INTERVAL_SECONDS = 30
+
+
+class ProbeResult(NamedTuple):
+    url: str
+    latency: float
+    throughput: float
+    lan: bool
+
+    @property
+    def score(self) -> float:
+        """Estimated seconds to fetch a typical response; lower is better."""
+        return self.latency + PROBE_REFERENCE_BYTES / max(self.throughput, 1.0)
+
+
+def normalize_url(url: str) -> str:
+    return url.strip().rstrip("/")
+
+
+def is_lan_url(url: str) -> bool:
+    """Whether ``url`` points at a private, loopback or link-local address.
+
+    ``plex.direct`` names embed the address in the first label
+    (``192-168-1-10.<hash>.plex.direct``) and are judged by that address.
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if host.endswith(".plex.direct"):
+        host = host.split(".", 1)[0].replace("-", ".")
+    if host == "localhost" or host.endswith(".local"):
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return address.is_private or address.is_loopback or address.is_link_local
+
+
+def candidate_urls(config: Dict[str, Any]) -> List[str]:
+    """``plexUrl`` followed by any ``plexUrls`` alternates, without duplicates."""
+    alternates = config.get("plexUrls") or []
+    if isinstance(alternates, str):
+        alternates = alternates.replace(",", "\n").splitlines()
+
+    urls: List[str] = []
+    for url in [config.get("plexUrl") or ""] + list(alternates):
+        url = normalize_url(url or "")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def probe(url: str, token: str, timeout: float) -> Optional[ProbeResult]:
+    """Measure handshake latency and throughput of one address.
+
+    Latency is the best of two ``/identity`` round trips on a fresh
+    connection; throughput comes from fetching the library section listing.
+    Returns None when the address is unreachable or rejects the token.
+    """
+    headers = {"X-Plex-Token": token, "Accept": "application/json"}
+    try:
+        with requests.Session() as session:
+            latencies = []
+            for _ in range(2):
+                start = time.perf_counter()
+                response = session.get(f"{url}/identity", headers=headers, timeout=timeout)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            latency = min(latencies)
+
+            start = time.perf_counter()
+            response = session.get(f"{url}/library/sections", headers=headers, timeout=timeout)
+            response.raise_for_status()
+            transfer = max(time.perf_counter() - start - latency, 1e-3)
+    except requests.RequestException as exc:
+        logger.info("Plex address %s is unavailable: %s", url, exc)
+        return None
+
+    return ProbeResult(url, latency, len(response.content) / transfer, is_lan_url(url))
+
+
+def probe_all(urls: Sequence[str], token: str, timeout: float) -> List[ProbeResult]:
+    """Probe ``urls`` concurrently; reachable ones are returned best first."""
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="plex-probe") as executor:
+        results = [result for result in executor.map(lambda url: probe(url, token, timeout), urls) if result]
+    # LAN addresses win whenever one is reachable, then the best estimated time.
+    results.sort(key=lambda result: (not result.lan, result.score))
+    return results
+
+
+class _EndpointSession(requests.Session):
+    """Session that sends requests for ``base_url`` to the best candidate address.
+
+    plexapi builds every URL from the server's base URL, so rewriting the
+    prefix here moves an existing ``PlexServer`` and all objects fetched from
+    it to another address without reconnecting.
+    """
+
+    def __init__(self, base_url: str, candidates: Sequence[str], token: str, timeout: float) -> None:
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.base_url = base_url
+        self.candidates = list(candidates)
+        self.token = token
+        self.timeout = timeout
+        self.active = base_url
+        self._baseline: Optional[float] = None
+        self._average: Optional[float] = None
+        self._reprobe_after = 0.0
+        self._check_after = time.monotonic() + CHECK_INTERVAL_SECONDS
+        self._switch_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    def select_endpoint(self, exclude: Iterable[str] = ()) -> bool:
+        """Probe the candidates and make the best one active.
+
+        Returns False when none of the candidates outside ``exclude`` respond.
+        """
+        excluded = set(exclude)
+        results = probe_all([url for url in self.candidates if url not in excluded], self.token, self.timeout)
+        self._reprobe_after = time.monotonic() + REPROBE_INTERVAL_SECONDS
+        if not results:
+            return False
+
+        best = results[0]
+        if best.url != self.active:
+            logger.info(
+                "Using Plex address %s (%.0f ms, %.0f KiB/s%s)",
+                best.url,
+                best.latency * 1000,
+                best.throughput / 1024,
+                ", LAN" if best.lan else "",
+            )
+        self.active = best.url
+        self._baseline = best.latency
+        self._average = None
+        return True
+
+    def _record(self, elapsed: float) -> None:
+        self._average = elapsed if self._average is None else 0.8 * self._average + 0.2 * elapsed
+        baseline = self._baseline
+        if baseline is None or time.monotonic() < self._reprobe_after:
+            return
+        if self._average > max(baseline * DEGRADED_FACTOR, baseline + DEGRADED_MIN_SECONDS):
+            if self._switch_lock.acquire(blocking=False):
+                try:
+                    logger.info("Plex address %s has slowed down, probing alternatives", self.active)
+                    self.select_endpoint()
+                finally:
+                    self._switch_lock.release()
+
+    def _fail_over(self, active: str, exc: Exception) -> bool:
+        """Move away from ``active`` unless another thread already has."""
+        with self._switch_lock:
+            if self.active != active:
+                return True
+            logger.warning("Plex address %s failed (%s), failing over", active, exc)
+            return self.select_endpoint(exclude=[active])
+
+    def _check_active(self) -> None:
+        """Time an ``/identity`` request to the active address."""
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._check_after = time.monotonic() + CHECK_INTERVAL_SECONDS
+            active = self.active
+            headers = {"X-Plex-Token": self.token, "Accept": "application/json"}
+            start = time.monotonic()
+            try:
+                super().request("GET", f"{active}/identity", headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self._fail_over(active, exc)
+                return
+            self._record(time.monotonic() - start)
+        finally:
+            self._check_lock.release()
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        if len(self.candidates) < 2 or not url.startswith(self.base_url):
+            return super().request(method, url, *args, **kwargs)
+
+        active = self.active
+        path = urlparse(url[len(self.base_url):]).path
+        start = time.monotonic()
+        try:
+            response = super().request(method, active + url[len(self.base_url):], *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            if not self._fail_over(active, exc):
+                raise
+            return super().request(method, self.active + url[len(self.base_url):], *args, **kwargs)
+
+        if path in TIMED_PATHS:
+            self._record(time.monotonic() - start)
+        elif time.monotonic() >= self._check_after:
+            self._check_active()
+        return response
+
+
+class _Connection:
+    __slots__ = ("server", "checked_at", "sections", "sections_at")
+
+    def __init__(self, server: PlexServer) -> None:
+        self.server = server
+        self.checked_at = time.monotonic()
+        self.sections: Optional[List[Any]] = None
+        self.sections_at = 0.0
+
+
+_lock = threading.Lock()
+_connections: Dict[Tuple[str, str], _Connection] = {}
+# One lock per key so concurrent callers share a single handshake.
+_connect_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def configured_timeout() -> float:
+    """The Plex request timeout from config.json, or :data:`DEFAULT_TIMEOUT`."""
+    try:
+        return float(config_store.load_config().get("plexTimeout") or DEFAULT_TIMEOUT)
+    except (TypeError, ValueError):
+        return DEFAULT_TIMEOUT
+
+
+def _key(url: str, token: str) -> Tuple[str, str]:
+    return normalize_url(url), token
+
+
+def _is_healthy(connection: _Connection, timeout: float) -> bool:
+    try:
+        connection.server.query("/identity", timeout=timeout)
+        return True
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.info("Dropping cached Plex connection to %s: %s", connection.server._baseurl, exc)
+        return False
+
+
+def get_server(
+    url: str,
+    token: str,
+    timeout: Optional[float] = None,
+    alternates: Sequence[str] = (),
+) -> PlexServer:
+    """Return a connected ``PlexServer`` for ``url`` and ``token``.
+
+    A cached connection is reused while it is healthy; otherwise a new one is
+    made. With ``alternates`` the requests go to whichever of ``url`` and the
+    alternates is fastest. Connection errors (including ``Unauthorized``)
+    propagate.
+    """
+    timeout = timeout or configured_timeout()
+    key = _key(url, token)
+
+    with _lock:
+        connect_lock = _connect_locks.setdefault(key, threading.Lock())
+
+    with connect_lock:
+        with _lock:
+            connection = _connections.get(key)
+
+        if connection is not None:
+            if time.monotonic() - connection.checked_at < HEALTH_TTL_SECONDS:
+                return connection.server
+            if _is_healthy(connection, timeout):
+                connection.checked_at = time.monotonic()
+                return connection.server
+            with _lock:
+                _connections.pop(key, None)
+
+        candidates = [key[0]] + [normalize_url(alt) for alt in alternates if normalize_url(alt) != key[0]]
+        session = _EndpointSession(key[0], candidates, token, timeout)
+        if len(candidates) > 1 and not session.select_endpoint():
+            session.active = key[0]
+        server = PlexServer(key[0], token, session=session, timeout=timeout)
+        with _lock:
+            _connections[key] = _Connection(server)
+        logger.info("Connected to Plex server %s", server.friendlyName)
+        return server
+
+
+def get_configured_server(config: Optional[Dict[str, Any]] = None) -> PlexServer:
+    """``PlexServer`` for the configured ``plexUrl``, ``plexUrls`` and ``plexToken``."""
+    config = config if config is not None else config_store.load_config()
+    urls = candidate_urls(config)
+    return get_server(urls[0] if urls else "", config.get("plexToken") or "", alternates=urls[1:])
+
+
+def get_sections(server: PlexServer) -> List[Any]:
+    """Library sections of ``server``, cached for :data:`SECTIONS_TTL_SECONDS`.
+
+    Only servers handed out by this module are cached; others are queried.
+    """
+    with _lock:
+        connection = next((conn for conn in _connections.values() if conn.server is server), None)
+        if (
+            connection is not None
+            and connection.sections is not None
+            and time.monotonic() - connection.sections_at < SECTIONS_TTL_SECONDS
+        ):
+            return list(connection.sections)
+
+    sections = server.library.sections()
+    if connection is not None:
+        with _lock:
+            connection.sections = sections
+            connection.sections_at = time.monotonic()
+    return list(sections)
+
+
+def invalidate(url: Optional[str] = None, token: Optional[str] = None) -> None:
+    """Forget cached connections, either all of them or one ``(url, token)``."""
+    with _lock:
+        if url is None:
+            _connections.clear()
+        else:
+            _connections.pop(_key(url, token or ""), None)
+
+
+@config_store.subscribe
+def _on_config_change(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    fields = ("plexUrl", "plexUrls", "plexToken", "plexTimeout")
+    if any(old.get(field) != new.get(field) for field in fields):
+        invalidate()
@@ -0,0 +1,151 @@
+"""Incrementally maintained row counters for the database statistics page.
+
+Counting rows on every stats request gets slow once ``missing_episodes``
+holds millions of rows, so the totals are kept in the ``stat_counters``
+table instead. A ``before_flush`` hook adjusts them in the same transaction
+as the ORM inserts and deletes that change them. Bulk ``Query.delete()``
+calls bypass the hook and report their row counts through :func:`adjust`.
+A background thread periodically recounts everything to correct any drift.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import event, inspect
+
+from models import DetectionRun, Episode, MissingEpisode, Show, StatCounter, db
+
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = 15 * 60
+
+_COUNTED_MODELS = {
+    Show: "shows_count",
+    Episode: "episodes_count",
+    MissingEpisode: "missing_episodes_count",
+    DetectionRun: "detection_runs_count",
+}
+COUNTER_NAMES = tuple(_COUNTED_MODELS.values()) + ("api_calls_saved",)
+
+_listener_installed = False
+
+
+def _api_calls_saved_delta(run: DetectionRun) -> int:
+    history = inspect(run).attrs.api_calls_saved.history
+    if not history.has_changes():
+        return 0
+    new = history.added[0] if history.added else 0
+    old = history.deleted[0] if history.deleted else 0
+    return (new or 0) - (old or 0)
+
+
+def _track_flush(session, flush_context, instances) -> None:  # pylint: disable=unused-argument
+    deltas: Dict[str, int] = defaultdict(int)
+
+    for obj in session.new:
+        name = _COUNTED_MODELS.get(type(obj))
+        if name:
+            deltas[name] += 1
+        if isinstance(obj, DetectionRun):
+            deltas["api_calls_saved"] += obj.api_calls_saved or 0
+
+    for obj in session.deleted:
+        name = _COUNTED_MODELS.get(type(obj))
+        if name:
+            deltas[name] -= 1
+        if isinstance(obj, DetectionRun):
+            # Loads the stored value if a commit expired it.
+            history = inspect(obj).attrs.api_calls_saved.history
+            committed = history.deleted[0] if history.deleted else obj.api_calls_saved
+            deltas["api_calls_saved"] -= committed or 0
+
+    for obj in session.dirty:
+        if isinstance(obj, DetectionRun) and obj not in session.deleted:
+            deltas["api_calls_saved"] += _api_calls_saved_delta(obj)
+
+    _apply(session.connection(), deltas)
+
+
+def _apply(connection, deltas: Dict[str, int]) -> None:
+    table = StatCounter.__table__
+    for name, delta in deltas.items():
+        if delta:
+            connection.execute(
+                table.update().where(table.c.name == name).values(value=table.c.value + delta)
+            )
+
+
+def adjust(**deltas: int) -> None:
+    """Apply counter changes for bulk statements in the current transaction."""
+    _apply(db.session.connection(), deltas)
+
+
+def reset() -> None:
+    """Zero every counter in the current transaction (after clearing the database)."""
+    db.session.execute(StatCounter.__table__.update().values(value=0))
+
+
+def get_counters(session=None) -> Dict[str, int]:
+    rows = (session or db.session).query(StatCounter.name, StatCounter.value).all()
+    counters = {name: 0 for name in COUNTER_NAMES}
+    counters.update({name: int(value or 0) for name, value in rows})
+    return counters
+
+
+def reconcile() -> Dict[str, int]:
+    """Recount every table and overwrite the stored counters."""
+    actual = {name: db.session.query(model).count() for model, name in _COUNTED_MODELS.items()}
+    actual["api_calls_saved"] = int(
+        db.session.query(db.func.sum(DetectionRun.api_calls_saved)).scalar() or 0
+    )
+
+    now = datetime.utcnow()
+    for name, value in actual.items():
+        db.session.merge(StatCounter(name=name, value=value, reconciled_at=now))
+    db.session.commit()
+    return actual
+
+
+def _reconcile_loop(app, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                before = get_counters()
+                after = reconcile()
+                drift = {name: after[name] - before[name] for name in after if after[name] != before[name]}
+                if drift:
+                    logger.info("Reconciled database stats counters, drift: %s", drift)
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Failed to reconcile database stats counters")
+
+
+def init_app(app) -> None:
+    """Install the flush hook, seed missing counters and start the reconcile thread."""
+    global _listener_installed
+    if not _listener_installed:
+        event.listen(db.session, "before_flush", _track_flush)
+        _listener_installed = True
+
+    with app.app_context():
+        if db.session.query(StatCounter).count() < len(COUNTER_NAMES):
+            reconcile()
+
+    interval = app.config.get("STATS_RECONCILE_INTERVAL", RECONCILE_INTERVAL_SECONDS)
+    # Detection pool processes create the app as well but never write.
+    if interval and multiprocessing.current_process().name == "MainProcess":
+        threading.Thread(
+            target=_reconcile_loop,
+            args=(app, interval),
+            name="stats-reconcile",
+            daemon=True,
+        ).start()
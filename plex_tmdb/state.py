@@ -1,25 +1,161 @@
-"""Shared mutable state for background tasks."""
+"""Task state shared by every process serving the app.
+
+Task status, progress events, the current detection run and the data
+version live in a small SQLite file (``task_state.sqlite3`` in the instance
+folder) instead of module globals, so several WSGI worker processes, or a
+separate worker process, all see the same task. Each thread keeps its own
+connection. Waiting for updates is woken immediately by changes made in this
+process and polls the store for changes made by other processes.
+"""
 
 from __future__ import annotations
 
-from threading import Lock
-from typing import Any, Dict, List, Optional
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
 
+# A running task whose owner has not reported for this long is treated as dead.
+STALE_TASK_SECONDS = 300
+EVENT_HISTORY = 500
+# How often waiters look for changes made by other processes; the interval
+# doubles up to MAX_POLL_INTERVAL_SECONDS while nothing changes.
+POLL_INTERVAL_SECONDS = 0.25
+MAX_POLL_INTERVAL_SECONDS = 2.0
 
-_state_lock = Lock()
-_task_status: Dict[str, Any] = {
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_status (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    owner TEXT,
+    heartbeat REAL
+);
+CREATE TABLE IF NOT EXISTS task_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shared_values (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_IDLE_STATUS: Dict[str, Any] = {
     "running": False,
     "progress": 0,
     "message": "Ready to start...",
     "results": {},
 }
-_missing_episodes_cache: List[Dict[str, Any]] = []
-_current_detection_run_id: Optional[int] = None
+
+Snapshot = Tuple[int, Dict[str, Any], List[Tuple[int, Dict[str, Any]]]]
+
+_path = Path(__file__).resolve().parent.parent / "instance" / "task_state.sqlite3"
+_generation = 0
+_local = threading.local()
+# Wakes waiters in this process as soon as the state changes.
+_changed = threading.Condition()
+
+
+def configure(path: Union[str, os.PathLike]) -> None:
+    """Use the store at ``path``; every process of one deployment must share it."""
+    global _path, _generation
+    _path = Path(path)
+    _generation += 1
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.key == (_generation, os.getpid()):
+        return conn
+
+    _path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(_path), timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(_SCHEMA)
+    conn.execute(
+        "INSERT OR IGNORE INTO task_status (id, data, version) VALUES (1, ?, 0)",
+        (json.dumps(_IDLE_STATUS),),
+    )
+    # The boot stamp keeps data versions from a previous store from ever matching.
+    conn.execute(
+        "INSERT OR IGNORE INTO shared_values (name, value) VALUES ('data_boot', ?), ('data_version', '0')",
+        (str(int(time.time())),),
+    )
+    _local.conn = conn
+    _local.key = (_generation, os.getpid())
+    return conn
+
+
+@contextmanager
+def _transaction(write: bool) -> Iterator[sqlite3.Connection]:
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    if write:
+        with _changed:
+            _changed.notify_all()
+
+
+def _read_status(conn: sqlite3.Connection) -> Tuple[int, Dict[str, Any], Optional[str], Optional[float]]:
+    data, version, owner, heartbeat = conn.execute(
+        "SELECT data, version, owner, heartbeat FROM task_status WHERE id = 1"
+    ).fetchone()
+    return version, json.loads(data), owner, heartbeat
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale(status: Dict[str, Any], owner: Optional[str], heartbeat: Optional[float]) -> bool:
+    if not status.get("running"):
+        return False
+    if heartbeat is None or time.time() - heartbeat > STALE_TASK_SECONDS:
+        return True
+    host, _, pid = (owner or "").rpartition(":")
+    return host == socket.gethostname() and pid.isdigit() and not _pid_alive(int(pid))
+
+
+def _effective_status(status: Dict[str, Any], owner: Optional[str], heartbeat: Optional[float]) -> Dict[str, Any]:
+    if _is_stale(status, owner, heartbeat):
+        return dict(status, running=False, message="Task was interrupted")
+    return status
+
+
+def _write_status(conn: sqlite3.Connection, status: Dict[str, Any], version: int, owner: Optional[str]) -> None:
+    conn.execute(
+        "UPDATE task_status SET data = ?, version = ?, owner = ?, heartbeat = ? WHERE id = 1",
+        (json.dumps(status), version + 1, owner, time.time()),
+    )
 
 
 def is_task_running() -> bool:
-    with _state_lock:
-        return bool(_task_status.get("running", False))
+    with _transaction(write=False) as conn:
+        _, status, owner, heartbeat = _read_status(conn)
+    return bool(_effective_status(status, owner, heartbeat).get("running", False))
 
 
 def start_task(message: str) -> bool:
@@ -27,54 +163,164 @@ def start_task(message: str) -> bool:
 
     Returns True when the task was started, False if another task is already running.
     """
-    with _state_lock:
-        if _task_status.get("running"):
+    with _transaction(write=True) as conn:
+        version, status, owner, heartbeat = _read_status(conn)
+        if _effective_status(status, owner, heartbeat).get("running"):
             return False
-        _task_status.update({
+        status.update({
             "running": True,
             "progress": 0,
             "message": message,
             "results": {},
         })
+        _write_status(conn, status, version, _owner())
+        conn.execute("DELETE FROM task_events")
         return True
 
 
 def update_task_status(**kwargs: Any) -> None:
-    with _state_lock:
-        _task_status.update(kwargs)
+    with _transaction(write=True) as conn:
+        version, status, owner, _ = _read_status(conn)
+        status.update(kwargs)
+        _write_status(conn, status, version, owner)
+
+
+def touch_task() -> None:
+    """Take over the running task's heartbeat from the process that started it.
+
+    Worker processes call this while they run a queued job, so the task is not
+    reported as interrupted when the web process that enqueued it goes away.
+    """
+    with _transaction(write=True) as conn:
+        conn.execute(
+            "UPDATE task_status SET owner = ?, heartbeat = ? WHERE id = 1 AND json_extract(data, '$.running')",
+            (_owner(), time.time()),
+        )
 
 
 def stop_task(message: str = "Task stopped") -> None:
-    with _state_lock:
-        _task_status.update({
+    with _transaction(write=True) as conn:
+        version, status, owner, _ = _read_status(conn)
+        status.update({
             "running": False,
             "progress": 0,
             "message": message,
         })
+        _write_status(conn, status, version, owner)
+
+
+def publish_event(kind: str, **data: Any) -> None:
+    """Record a progress event (e.g. one show finished) for stream listeners."""
+    with _transaction(write=True) as conn:
+        seq = conn.execute(
+            "INSERT INTO task_events (data) VALUES (?)", (json.dumps(dict(data, type=kind)),)
+        ).lastrowid
+        conn.execute("DELETE FROM task_events WHERE seq <= ?", (seq - EVENT_HISTORY,))
+        # Bump the status version so waiting streams pick the event up.
+        conn.execute("UPDATE task_status SET version = version + 1 WHERE id = 1")
+
+
+def wait_for_task_update(since_version: int, since_event: int, timeout: float) -> Snapshot:
+    """Block until the status moves past ``since_version`` or ``timeout`` expires.
+
+    Returns the current version, a copy of the status and the events newer than
+    ``since_event``. The version is unchanged if the wait timed out.
+    """
+    deadline = time.monotonic() + timeout
+    interval = POLL_INTERVAL_SECONDS
+    while True:
+        snapshot = get_task_update(since_event)
+        remaining = deadline - time.monotonic()
+        if snapshot[0] != since_version or remaining <= 0:
+            return snapshot
+        with _changed:
+            _changed.wait(min(interval, remaining))
+        interval = min(interval * 2, MAX_POLL_INTERVAL_SECONDS)
+
+
+def get_task_update(since_event: int) -> Snapshot:
+    """Non-blocking variant of :func:`wait_for_task_update`."""
+    with _transaction(write=False) as conn:
+        version, status, owner, heartbeat = _read_status(conn)
+        events = [
+            (seq, json.loads(data))
+            for seq, data in conn.execute(
+                "SELECT seq, data FROM task_events WHERE seq > ? ORDER BY seq", (since_event,)
+            )
+        ]
+    return version, _effective_status(status, owner, heartbeat), events
+
+
+def get_last_event_seq() -> int:
+    with _transaction(write=False) as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'task_events'").fetchone()
+    return row[0] if row else 0
 
 
 def get_task_status() -> Dict[str, Any]:
-    with _state_lock:
-        return dict(_task_status)
+    with _transaction(write=False) as conn:
+        _, status, owner, heartbeat = _read_status(conn)
+    return _effective_status(status, owner, heartbeat)
 
 
-def set_missing_episodes_cache(rows: List[Dict[str, Any]]) -> None:
-    with _state_lock:
-        _missing_episodes_cache.clear()
-        _missing_episodes_cache.extend(rows)
+def _set_value(name: str, value: Any) -> None:
+    with _transaction(write=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO shared_values (name, value) VALUES (?, ?)", (name, json.dumps(value))
+        )
 
 
-def get_missing_episodes_cache() -> List[Dict[str, Any]]:
-    with _state_lock:
-        return list(_missing_episodes_cache)
+def _get_value(name: str, default: Any = None) -> Any:
+    with _transaction(write=False) as conn:
+        row = conn.execute("SELECT value FROM shared_values WHERE name = ?", (name,)).fetchone()
+    return json.loads(row[0]) if row and row[0] is not None else default
 
 
 def set_current_detection_run(run_id: Optional[int]) -> None:
-    global _current_detection_run_id
-    with _state_lock:
-        _current_detection_run_id = run_id
+    _set_value("current_detection_run", run_id)
 
 
 def get_current_detection_run() -> Optional[int]:
-    with _state_lock:
-        return _current_detection_run_id
+    return _get_value("current_detection_run")
+
+
+def get_next_scheduled_run() -> Optional[float]:
+    return _get_value("scheduler_next_run")
+
+
+def set_next_scheduled_run(when: Optional[float]) -> None:
+    _set_value("scheduler_next_run", when)
+
+
+def claim_scheduled_run(expected: Optional[float], when: float) -> bool:
+    """Move the next scheduled run from ``expected`` to ``when``.
+
+    Returns False if another process moved it first, so of several processes
+    running the scheduler only one acts on each scheduled time.
+    """
+    with _transaction(write=True) as conn:
+        row = conn.execute("SELECT value FROM shared_values WHERE name = 'scheduler_next_run'").fetchone()
+        current = json.loads(row[0]) if row and row[0] is not None else None
+        if current != expected:
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO shared_values (name, value) VALUES ('scheduler_next_run', ?)",
+            (json.dumps(when),),
+        )
+        return True
+
+
+def bump_data_version() -> None:
+    """Record that a batch of database writes has been committed."""
+    with _transaction(write=True) as conn:
+        conn.execute(
+            "UPDATE shared_values SET value = CAST(value AS INTEGER) + 1 WHERE name = 'data_version'"
+        )
+
+
+def get_data_version() -> str:
+    with _transaction(write=False) as conn:
+        values = dict(
+            conn.execute("SELECT name, value FROM shared_values WHERE name IN ('data_boot', 'data_version')")
+        )
+    return f"{values['data_boot']}.{values['data_version']}"
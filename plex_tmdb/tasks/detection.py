@@ -1,23 +1,40 @@
-"""Background tasks for detection and data synchronization."""
+"""Detection and reprocessing jobs, run by :mod:`plex_tmdb.worker`."""
 
 from __future__ import annotations
 
-import json
 import logging
-import threading
+import multiprocessing
+import os
 import time
+import zlib
 from collections import defaultdict
-from datetime import datetime
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 
 from flask import current_app
 from plexapi.exceptions import BadRequest, NotFound, Unauthorized
 from plexapi.server import PlexServer
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
 
-from models import DetectionRun, Episode, MissingEpisode, Show, db
+from models import DetectionRun, Episode, Job, MissingEpisode, Show, db
+from show_filters import NO_FILTER, ShowFilter, load_filter_index
 
 from .. import state
+from ..database import create_read_engine, read_session
+from ..services import config as config_store
+from ..services import jobs
+from ..services import plex as plex_connections
+from ..services import stats
 from ..services.tmdb import (
     get_tmdb_season_details,
     get_tmdb_tv_details,
@@ -29,7 +46,7 @@ from ..services.tmdb import (
 logger = logging.getLogger(__name__)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-CONFIG_PATH = PROJECT_ROOT / "config.json"
+FILTERS_PATH = PROJECT_ROOT / "filters.json"
 
 
 class ConfigurationError(RuntimeError):
@@ -37,183 +54,825 @@ class ConfigurationError(RuntimeError):
 
 
 def _load_config() -> Dict[str, str]:
-    if not CONFIG_PATH.exists():
+    if not config_store.config_exists():
         raise ConfigurationError("Configuration file not found. Please configure Plex settings first.")
 
-    with CONFIG_PATH.open("r", encoding="utf-8") as handle:
-        config = json.load(handle)
+    return config_store.load_config()
+
+
+# Job kinds handled by plex_tmdb.worker.
+JOB_DETECTION = "detection"
+JOB_DETECTION_SHARD = "detection_shard"
+JOB_REPROCESSING = "reprocessing"
+
+MAX_SHARDS = 64
+
+
+def _shard_count(options: Dict[str, str], config: Dict[str, str]) -> int:
+    try:
+        shards = int(options.get("shards") or config.get("detectionShards") or 1)
+    except (TypeError, ValueError):
+        shards = 1
+    return max(1, min(shards, MAX_SHARDS))
+
+
+# Request options that bound a run, and the DetectionRun columns they set.
+BUDGET_OPTIONS = (("max_duration", "max_duration_seconds"), ("max_api_calls", "max_api_calls"))
+
+
+def _detection_budget(options: Dict[str, Any]) -> Dict[str, int]:
+    budget = {}
+    for option, column in BUDGET_OPTIONS:
+        value = options.get(option)
+        if value in (None, ""):
+            continue
+        try:
+            budget[column] = int(value)
+        except (TypeError, ValueError):
+            budget[column] = 0
+        if budget[column] <= 0:
+            raise ValueError(f"{option} must be a positive integer")
+    return budget
+
+
+def start_detection_run(options: Dict[str, Any], trigger: str = "manual") -> DetectionRun:
+    """Create a detection run for the task that was just started and queue it.
+
+    The caller must have started the task with :func:`state.start_task`.
+    Raises ValueError, before anything is written, when a budget option is
+    invalid. If the run cannot be queued once it exists, it is marked failed
+    before the error propagates, so it is not left "running".
+    """
+    detection_run = DetectionRun(trigger=trigger, **_detection_budget(options))
+    db.session.add(detection_run)
+    db.session.commit()
+    state.bump_data_version()
 
-    return config
+    try:
+        state.set_current_detection_run(detection_run.id)
+        run_missing_episodes_task(options, detection_run.id)
+    except Exception as exc:
+        db.session.rollback()
+        jobs.cancel_queued(detection_run.id)
+        detection_run.status = "failed"
+        detection_run.error_message = str(exc)
+        detection_run.completed_at = datetime.utcnow()
+        db.session.commit()
+        state.set_current_detection_run(None)
+        state.bump_data_version()
+        raise
+    return detection_run
 
 
 def run_missing_episodes_task(options: Dict[str, str], detection_run_id: int) -> None:
-    """Execute missing episode detection in a background thread."""
+    """Queue missing episode detection for the workers.
 
-    app = current_app._get_current_object()
-    thread = threading.Thread(
-        target=_missing_episodes_worker,
-        args=(app, options, detection_run_id),
-        daemon=True,
-    )
-    thread.start()
+    A planning job lists the TV libraries and splits the run into
+    ``detection_shard`` jobs that each take a share of the series across all
+    libraries (``shards`` in the options or ``detectionShards`` in
+    config.json), so several workers can share it.
+    """
+    payload = {
+        "library": options.get("library", "all"),
+        "shards": _shard_count(options, config_store.load_config()),
+    }
+    jobs.enqueue(JOB_DETECTION, payload, detection_run_id)
+    state.update_task_status(message="Waiting for a worker...", progress=5, eta_seconds=None)
 
 
 def run_reprocessing_task(show_titles: Iterable[Dict[str, Optional[str]]]) -> None:
-    app = current_app._get_current_object()
-    thread = threading.Thread(
-        target=_reprocessing_worker,
-        args=(app, list(show_titles)),
-        daemon=True,
+    """Queue reprocessing of ``show_titles`` for the workers."""
+    jobs.enqueue(JOB_REPROCESSING, {"shows": list(show_titles)})
+    state.update_task_status(message="Waiting for a worker...", progress=2)
+
+
+def _run_active(detection_run_id: int) -> bool:
+    """Whether the run is still the one the task state is tracking."""
+    return state.is_task_running() and state.get_current_detection_run() == detection_run_id
+
+
+def _detection_settings() -> Tuple[Dict[str, str], str, str]:
+    config = _load_config()
+    tmdb_api_key = config.get("tmdbApiKey")
+    if not config.get("plexUrl") or not config.get("plexToken"):
+        raise ConfigurationError("Plex configuration incomplete. Please check your settings.")
+    if not tmdb_api_key:
+        raise ConfigurationError("TMDB API key not configured.")
+    return config, tmdb_api_key, config.get("tmdbLanguage", "en-US")
+
+
+def plan_detection_job(job: Job) -> Dict[str, int]:
+    """Resolve the libraries of a detection run and queue its shard jobs."""
+    detection_run = DetectionRun.query.get(job.detection_run_id)
+    if not detection_run:
+        raise ConfigurationError("Detection run not found")
+
+    payload = job.get_payload()
+    config, _, _ = _detection_settings()
+
+    state.update_task_status(message="Connecting to Plex server...", progress=10)
+    plex = plex_connections.get_configured_server(config)
+    state.update_task_status(message=f"Connected to Plex server: {plex.friendlyName}", progress=20)
+
+    tv_libraries, library_ids, library_names = _collect_tv_libraries(plex, payload.get("library", "all"))
+    detection_run.set_library_ids(library_ids)
+    detection_run.set_library_names(library_names)
+    db.session.commit()
+
+    # Every shard covers all libraries, so a series kept in several of them
+    # is checked once, by the shard its group key falls in.
+    shards = int(payload.get("shards") or 1)
+    libraries = [{"key": str(library.key), "title": library.title} for library in tv_libraries]
+    for shard in range(shards):
+        jobs.enqueue(
+            JOB_DETECTION_SHARD,
+            {"libraries": libraries, "shard": shard, "shards": shards},
+            job.detection_run_id,
+        )
+
+    state.update_task_status(message=f"Processing {len(tv_libraries)} TV libraries...", progress=30)
+    return {"libraries": len(tv_libraries), "shards": shards}
+
+
+def _in_shard(group_key: str, shard: int, shards: int) -> bool:
+    # crc32 rather than hash(): every worker process must agree on the shard.
+    return shards <= 1 or zlib.crc32(group_key.encode("utf-8")) % shards == shard
+
+
+def tmdb_guid(plex_show) -> Optional[int]:
+    """TMDB id among the guids Plex matched ``plex_show`` to, if any.
+
+    Attributes are read from ``__dict__``: plexapi reloads a partial object
+    whose ``guids`` list is empty, as it is for every show of a legacy agent,
+    which would cost one Plex request per show. Those shows carry the id in
+    their own guid instead (``com.plexapp.agents.themoviedb://1399?lang=en``).
+    """
+    attributes = vars(plex_show)
+    guids = [str(getattr(guid, "id", "")) for guid in attributes.get("guids") or ()]
+    for guid in guids + [str(attributes.get("guid") or "")]:
+        provider, _, value = guid.partition("://")
+        value = value.split("?", 1)[0]
+        if provider in ("tmdb", "com.plexapp.agents.themoviedb") and value.isdigit():
+            return int(value)
+    return None
+
+
+def _group_shows(library_shows: List[Tuple[Any, Any]]) -> Dict[str, List[Tuple[Any, Any]]]:
+    """Group ``(plex_show, library)`` pairs that are the same series.
+
+    Shows are grouped by the TMDB id of their Plex guids. Shows without one
+    (older agents) join the group of a show with the same title and year
+    that has one, or form a group keyed by title and year, the same key
+    the TMDB cache uses.
+    """
+    tmdb_ids = [tmdb_guid(plex_show) for plex_show, _ in library_shows]
+    tmdb_by_title: Dict[Tuple[str, Optional[int]], int] = {}
+    for (plex_show, _), tmdb_id in zip(library_shows, tmdb_ids):
+        if tmdb_id is not None:
+            tmdb_by_title.setdefault((plex_show.title, getattr(plex_show, "year", None)), tmdb_id)
+
+    groups: Dict[str, List[Tuple[Any, Any]]] = defaultdict(list)
+    for (plex_show, library), tmdb_id in zip(library_shows, tmdb_ids):
+        title_year = (plex_show.title, getattr(plex_show, "year", None))
+        tmdb_id = tmdb_id or tmdb_by_title.get(title_year)
+        group_key = f"tmdb:{tmdb_id}" if tmdb_id is not None else f"title:{title_year[0]}:{title_year[1]}"
+        groups[group_key].append((plex_show, library))
+    return groups
+
+
+def run_detection_shard(job: Job) -> Dict[str, int]:
+    """Check the shows of one shard; totals are combined by :func:`finish_detection_run`.
+
+    The shows of all the run's libraries are grouped by series first, so a
+    series kept in several libraries is looked up, refreshed and compared
+    once, against the episodes of all its copies together. Its missing
+    episodes are still recorded for each library.
+    """
+    detection_run_id = job.detection_run_id
+    payload = job.get_payload()
+    shard, shards = int(payload.get("shard", 0)), int(payload.get("shards", 1))
+    # A retried shard replaces what an earlier attempt recorded.
+    replace_existing = (job.attempts or 0) > 1
+
+    config, tmdb_api_key, tmdb_language = _detection_settings()
+    plex = plex_connections.get_configured_server(config)
+    filter_index = load_filter_index(config.get("filtersFile") or FILTERS_PATH)
+
+    totals = {
+        "total_shows_processed": 0,
+        "total_missing_episodes": 0,
+        "shows_with_missing": 0,
+        "api_calls_made": 0,
+        "api_calls_saved": 0,
+    }
+
+    library_refs = payload["libraries"]
+    library_names = ", ".join(str(ref.get("title")) for ref in library_refs)
+    state.update_task_status(message=f"Processing libraries: {library_names}")
+
+    library_shows: List[Tuple[Any, Any]] = []
+    for ref in library_refs:
+        try:
+            library = plex.library.sectionByID(int(ref["key"]))
+            library_shows.extend((plex_show, library) for plex_show in library.all())
+        except (BadRequest, Unauthorized, NotFound) as lib_error:
+            logger.error("Error loading shows for library %s: %s", ref.get("title"), lib_error)
+
+    groups = [members for key, members in _group_shows(library_shows).items() if _in_shard(key, shard, shards)]
+    logger.info(
+        "Processing shard %s/%s of %s with %s shows in %s series",
+        shard + 1,
+        shards,
+        library_names,
+        sum(len(members) for members in groups),
+        len(groups),
     )
-    thread.start()
 
+    visible: List[Tuple[List[Tuple[Any, Any]], ShowFilter]] = []
+    for members in groups:
+        plex_show = members[0][0]
+        show_filter = filter_index.lookup_show(plex_show.title, getattr(plex_show, "year", None))
+        if show_filter.hide_show:
+            logger.info("Skipping '%s': hidden by filters", plex_show.title)
+            continue
+        visible.append((members, show_filter))
+
+    processes = _pool_size(config, "detectionProcesses", os.cpu_count() or 1)
+    threads = _pool_size(config, "detectionThreads", MAX_DETECTION_THREADS)
+    budget = RunBudget(db.session.get(DetectionRun, detection_run_id), max(processes, threads))
+
+    # With a budget the shows most likely to be out of date are refreshed
+    # first; otherwise the longest ones go first.
+    checks = _schedule_checks(visible, by_staleness=budget.limited)
+    total_cost = sum(check.cost for check in checks) or 1.0
+    jobs.set_progress(job.id, 0.0, cost_estimate=total_cost)
+    logger.info(
+        "Estimated %.0f s of work for %s shows, %s first",
+        total_cost,
+        len(checks),
+        "stalest" if budget.limited else "longest",
+    )
 
-def _missing_episodes_worker(app, options: Dict[str, str], detection_run_id: int) -> None:  # type: ignore[annotation-unchecked]
-    with app.app_context():
-        detection_run = DetectionRun.query.get(detection_run_id)
-        if not detection_run:
-            logger.error("Detection run %s not found", detection_run_id)
-            state.stop_task("Detection run not found")
-            return
+    def report(done_cost: float, message: str) -> None:
+        jobs.set_progress(job.id, done_cost / total_cost)
+        fraction, eta_seconds = jobs.run_progress(detection_run_id, JOB_DETECTION_SHARD)
+        state.update_task_status(
+            progress=min(30 + int(fraction * 60), 90),
+            eta_seconds=round(eta_seconds) if eta_seconds is not None else None,
+            message=message,
+        )
 
-        state.set_current_detection_run(detection_run_id)
+    if len(checks) > 1 and (processes > 1 or threads > 1):
+        if processes > 1:
+            logger.info("Checking shows in %s processes", processes)
+            executor: Executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pool_process,
+                initargs=(db.engine.url.render_as_string(hide_password=False), config),
+            )
+        else:
+            logger.info("Checking shows in %s threads", threads)
+            executor = ThreadPoolExecutor(
+                max_workers=threads,
+                thread_name_prefix="detection",
+                initializer=_init_pool_thread,
+                initargs=(current_app._get_current_object(), config),
+            )
+        outcomes = _check_shows_in_pool(
+            checks, executor, max(processes, threads), detection_run_id, replace_existing, budget, report
+        )
+    else:
+        outcomes = _check_shows_in_thread(
+            checks, tmdb_api_key, tmdb_language, detection_run_id, replace_existing, budget, report
+        )
 
-        api_calls_made = 0
-        api_calls_saved = 0
+    # Shows are committed one at a time; readers see them via the data
+    # version, bumped at most every DATA_VERSION_INTERVAL_SECONDS.
+    last_bump = time.monotonic()
+    for check, outcome in outcomes:
+        if time.monotonic() - last_bump >= DATA_VERSION_INTERVAL_SECONDS:
+            state.bump_data_version()
+            last_bump = time.monotonic()
+        plex_show = check.plex_show
+        if isinstance(outcome, Exception):
+            budget.record_calls(plex_show.ratingKey, 0)
+            logger.error("Error processing show %s: %s", plex_show.title, outcome)
+            continue
 
-        try:
-            config = _load_config()
-            plex_url = config.get("plexUrl")
-            plex_token = config.get("plexToken")
-            tmdb_api_key = config.get("tmdbApiKey")
-            tmdb_language = config.get("tmdbLanguage", "en-US")
-
-            if not plex_url or not plex_token:
-                raise ConfigurationError("Plex configuration incomplete. Please check your settings.")
-            if not tmdb_api_key:
-                raise ConfigurationError("TMDB API key not configured.")
-
-            state.update_task_status(message="Connecting to Plex server...", progress=10)
-            plex = PlexServer(plex_url, plex_token)
-            state.update_task_status(
-                message=f"Connected to Plex server: {plex.friendlyName}", progress=20
+        missing_data, calls_made, calls_saved = outcome
+        budget.record_calls(plex_show.ratingKey, calls_made)
+        totals["api_calls_made"] += calls_made
+        totals["api_calls_saved"] += calls_saved
+
+        # Totals count each library's copy of a series, as separate checks did.
+        libraries = _member_libraries(check.members)
+        if missing_data:
+            totals["total_missing_episodes"] += len(missing_data)
+            totals["shows_with_missing"] += len(libraries)
+            logger.info("Found %s missing episodes for %s", len(missing_data), plex_show.title)
+
+        totals["total_shows_processed"] += len(libraries)
+        state.publish_event(
+            "show",
+            title=plex_show.title,
+            library=", ".join(name for _, name in libraries),
+            missing=len(missing_data),
+        )
+
+    state.bump_data_version()
+    if not _run_active(detection_run_id):
+        totals["cancelled"] = 1
+    return totals
+
+
+# Rough per-show costs in seconds, used to check the most expensive shows
+# first. Shows that were refreshed before use their measured fetch time.
+CACHED_SHOW_SECONDS = 0.2
+PLEX_SECONDS_PER_SEASON = 0.05
+TMDB_BASE_SECONDS = 0.8
+TMDB_SECONDS_PER_SEASON = 0.4
+TMDB_SECONDS_PER_EPISODE = 0.01
+NEW_SHOW_SECONDS = 3.0
+
+MAX_DETECTION_THREADS = 16
+# How often a running shard announces its committed writes to readers.
+DATA_VERSION_INTERVAL_SECONDS = 2.0
+# Cached show lookups per query when scheduling, below SQLite's variable limit.
+SCHEDULE_LOOKUP_CHUNK = 500
+
+
+# TMDB data of shows that are still airing goes out of date much faster.
+VOLATILE_STATUSES = ("Returning Series", "In Production", "Planned", "Pilot")
+SETTLED_STATUSES = ("Ended", "Canceled")
+RECENTLY_AIRED_DAYS = 60
+
+
+class ShowCheck(NamedTuple):
+    plex_show: Any  # the first of ``members``; stands for the series
+    members: List[Tuple[Any, Any]]  # (plex_show, library) copies of the series
+    show_filter: ShowFilter
+    cost: float
+    cached_cost: float  # cost when checked against cached data only
+    refresh: bool  # cached TMDB data is missing or stale
+    priority: float  # how urgently the cached data needs refreshing
+
+
+def _cached_seconds(show: Optional[Show]) -> float:
+    seasons = (show.number_of_seasons if show else None) or 1
+    return CACHED_SHOW_SECONDS + seasons * PLEX_SECONDS_PER_SEASON
+
+
+def _estimate_seconds(show: Optional[Show]) -> float:
+    if show is None:
+        return NEW_SHOW_SECONDS
+    seasons = show.number_of_seasons or 1
+    cost = _cached_seconds(show)
+    if show.needs_update(max_age_days=7):
+        cost += show.last_fetch_seconds or (
+            TMDB_BASE_SECONDS
+            + seasons * TMDB_SECONDS_PER_SEASON
+            + (show.number_of_episodes or 0) * TMDB_SECONDS_PER_EPISODE
+        )
+    return cost
+
+
+def _refresh_priority(show: Optional[Show]) -> float:
+    """Days since the last refresh, weighted by how likely the show has changed."""
+    if show is None or show.last_updated is None:
+        return float("inf")
+    age_days = (datetime.utcnow() - show.last_updated).total_seconds() / 86400
+    volatility = 1.0
+    if show.status in VOLATILE_STATUSES:
+        volatility = 3.0
+    elif show.status in SETTLED_STATUSES:
+        volatility = 0.5
+    if show.last_air_date and (date.today() - show.last_air_date).days <= RECENTLY_AIRED_DAYS:
+        volatility *= 2
+    return age_days * volatility
+
+
+def _schedule_checks(
+    visible: List[Tuple[List[Tuple[Any, Any]], ShowFilter]], by_staleness: bool = False
+) -> List[ShowCheck]:
+    """Attach a cost estimate to every show and order the checks.
+
+    Starting the longest shows first keeps a thousand-episode soap from
+    becoming the tail that a concurrent run waits on at the end. A budgeted
+    run (``by_staleness``) instead starts with the shows that need a refresh,
+    the stalest and most volatile first, so the budget goes where it matters.
+    """
+    titles = sorted({members[0][0].title for members, _ in visible})
+    known: Dict[Tuple[str, Optional[int]], Show] = {}
+    session = read_session()
+    try:
+        for start in range(0, len(titles), SCHEDULE_LOOKUP_CHUNK):
+            chunk = titles[start:start + SCHEDULE_LOOKUP_CHUNK]
+            for show in session.query(Show).filter(Show.title.in_(chunk)).order_by(Show.id):
+                known.setdefault((show.title, show.year), show)
+    finally:
+        session.close()
+
+    checks = []
+    for members, show_filter in visible:
+        plex_show = members[0][0]
+        show = known.get((plex_show.title, getattr(plex_show, "year", None)))
+        # Each further copy only adds its Plex episode listing.
+        extra_plex = (len(members) - 1) * ((show.number_of_seasons if show else None) or 1) * PLEX_SECONDS_PER_SEASON
+        checks.append(
+            ShowCheck(
+                plex_show,
+                members,
+                show_filter,
+                _estimate_seconds(show) + extra_plex,
+                _cached_seconds(show) + extra_plex,
+                show is None or show.needs_update(max_age_days=7),
+                _refresh_priority(show),
             )
+        )
 
-            library_key = options.get("library", "all")
-            tv_libraries, library_ids, library_names = _collect_tv_libraries(plex, library_key)
+    if by_staleness:
+        checks.sort(key=lambda check: (check.refresh, check.priority, check.cost), reverse=True)
+    else:
+        checks.sort(key=lambda check: check.cost, reverse=True)
+    return checks
+
+
+class RunBudget:
+    """Time and TMDB call limits of a detection run, shared by all of its shards.
+
+    Calls are added to ``DetectionRun.api_calls_made`` as shows finish, so
+    concurrent shards see each other's usage; refreshes still in flight in
+    this shard count with the average calls of a refresh so far. Once TMDB
+    may no longer be queried the remaining shows are checked against cached
+    data, and time for that is held back from the duration limit.
+    """
+
+    def __init__(self, detection_run: DetectionRun, workers: int) -> None:
+        self.detection_run_id = detection_run.id
+        self.max_api_calls = detection_run.max_api_calls
+        self.deadline = (
+            detection_run.started_at + timedelta(seconds=detection_run.max_duration_seconds)
+            if detection_run.max_duration_seconds
+            else None
+        )
+        self.workers = max(workers, 1)
+        self.exhausted = False
+        self._in_flight: Set[Any] = set()
+        self._refreshes = 0
+        self._refresh_calls = 0
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.max_api_calls or self.deadline)
+
+    def expired(self) -> bool:
+        """Whether the time limit has passed; no more shows are checked then."""
+        if self.deadline is None or datetime.utcnow() < self.deadline:
+            return False
+        self._exhaust("time")
+        return True
+
+    def allows_refresh(self, key: Any, cached_seconds_left: float) -> bool:
+        """Whether the show ``key`` may still query TMDB, leaving time to check the rest from cache."""
+        if not self.limited:
+            return True
+        if self.exhausted:
+            return False
+        reserve = timedelta(seconds=cached_seconds_left / self.workers)
+        if self.deadline is not None and datetime.utcnow() + reserve >= self.deadline:
+            return self._exhaust("time")
+        if self.max_api_calls:
+            used = db.session.execute(
+                select(DetectionRun.api_calls_made).where(DetectionRun.id == self.detection_run_id)
+            ).scalar()
+            per_refresh = self._refresh_calls / self._refreshes if self._refreshes else 1.0
+            if (used or 0) + len(self._in_flight) * per_refresh >= self.max_api_calls:
+                return self._exhaust("TMDB call")
+        self._in_flight.add(key)
+        return True
+
+    def record_calls(self, key: Any, calls: int) -> None:
+        """Record the TMDB calls made for the show ``key`` once it is done."""
+        if key in self._in_flight:
+            self._in_flight.discard(key)
+            self._refreshes += 1
+            self._refresh_calls += calls
+        if not calls or not self.limited:
+            return
+        db.session.execute(
+            DetectionRun.__table__.update()
+            .where(DetectionRun.id == self.detection_run_id)
+            .values(api_calls_made=func.coalesce(DetectionRun.api_calls_made, 0) + calls)
+        )
+        db.session.commit()
 
-            detection_run.set_library_ids(library_ids)
-            detection_run.set_library_names(library_names)
+    def _exhaust(self, kind: str) -> bool:
+        if not self.exhausted:
+            self.exhausted = True
+            logger.info("Detection run %s used up its %s budget", self.detection_run_id, kind)
+            db.session.execute(
+                DetectionRun.__table__.update()
+                .where(DetectionRun.id == self.detection_run_id)
+                .values(budget_exhausted=True)
+            )
             db.session.commit()
+        return False
 
-            state.update_task_status(
-                message=f"Processing {len(tv_libraries)} TV libraries...", progress=30
+
+ShowOutcome = Union[Tuple[List[Dict[str, Optional[str]]], int, int], Exception]
+
+
+def _check_shows_in_thread(
+    checks: List[ShowCheck],
+    tmdb_api_key: str,
+    tmdb_language: str,
+    detection_run_id: int,
+    replace_existing: bool,
+    budget: RunBudget,
+    report: Callable[[float, str], None],
+) -> Iterator[Tuple[ShowCheck, ShowOutcome]]:
+    done_cost = 0.0
+    cached_left = sum(check.cached_cost for check in checks)
+    for check in checks:
+        if not _run_active(detection_run_id) or budget.expired():
+            return
+        cached_left -= check.cached_cost
+        report(done_cost, f"Checking: {check.plex_show.title}")
+        try:
+            outcome: ShowOutcome = _find_missing_episodes_for_show(
+                check.members,
+                tmdb_api_key,
+                tmdb_language,
+                detection_run_id,
+                check.show_filter,
+                replace_existing=replace_existing,
+                allow_fetch=not check.refresh or budget.allows_refresh(check.plex_show.ratingKey, cached_left),
             )
+        except Exception as show_error:  # pylint: disable=broad-except
+            outcome = show_error
+        done_cost += check.cost
+        yield check, outcome
+        time.sleep(0.1)
+
+
+def _pool_size(config: Dict[str, str], key: str, limit: int) -> int:
+    try:
+        size = int(config.get(key) or 1)
+    except (TypeError, ValueError):
+        size = 1
+    return max(1, min(size, limit))
 
-            all_missing_episodes: List[Dict[str, Optional[str]]] = []
-            total_shows_processed = 0
 
-            for lib_idx, library in enumerate(tv_libraries):
-                state.update_task_status(message=f"Processing library: {library.title}")
+def _check_shows_in_pool(
+    checks: List[ShowCheck],
+    executor: Executor,
+    workers: int,
+    detection_run_id: int,
+    replace_existing: bool,
+    budget: RunBudget,
+    report: Callable[[float, str], None],
+) -> Iterator[Tuple[ShowCheck, ShowOutcome]]:
+    """Check shows with a thread or process pool, storing the results from this thread.
+
+    Pool workers search TMDB, decode the responses and read the Plex
+    episodes, each with its own TMDB session, Plex connection and read-only
+    database session when they are processes. This thread is the only
+    writer: it stores the fetched data and records the missing episodes as
+    results arrive. Shows are submitted in schedule order, only a few per
+    worker ahead, so a stopped task ends quickly.
+    """
+    pending: Dict[Future, ShowCheck] = {}
+    remaining = iter(checks)
+    done_cost = 0.0
+    cached_left = sum(check.cached_cost for check in checks)
+
+    with executor:
+
+        def submit_next() -> None:
+            nonlocal cached_left
+            if budget.expired():
+                return
+            for check in remaining:
+                cached_left -= check.cached_cost
+                item = {
+                    "rating_keys": [plex_show.ratingKey for plex_show, _ in check.members],
+                    "title": check.plex_show.title,
+                    "year": getattr(check.plex_show, "year", None),
+                    "allow_fetch": not check.refresh
+                    or budget.allows_refresh(check.plex_show.ratingKey, cached_left),
+                }
+                pending[executor.submit(_prepare_show, item)] = check
+                return
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            active = _run_active(detection_run_id)
+            for future in finished:
+                check = pending.pop(future)
+                done_cost += check.cost
+                report(done_cost, f"Checked: {check.plex_show.title}")
                 try:
-                    shows = library.all()
-                except (BadRequest, Unauthorized, NotFound) as lib_error:
-                    logger.error("Error loading shows for library %s: %s", library.title, lib_error)
-                    continue
+                    outcome: ShowOutcome = _apply_prepared_show(
+                        check.plex_show,
+                        future.result(),
+                        _member_libraries(check.members),
+                        detection_run_id,
+                        check.show_filter,
+                        replace_existing,
+                    )
+                except Exception as show_error:  # pylint: disable=broad-except
+                    db.session.rollback()
+                    outcome = show_error
+                yield check, outcome
+                if active:
+                    submit_next()
+            if not active:
+                for future in pending:
+                    future.cancel()
 
-                total_shows = max(len(shows), 1)
-                logger.info("Processing library '%s' with %s shows", library.title, len(shows))
 
-                for show_idx, plex_show in enumerate(shows):
-                    if not state.is_task_running():
-                        break
+# Configuration seen by detection pool workers.
+_pool_config: Dict[str, str] = {}
+# Read-only sessions of a pool process; thread workers use read_session().
+_pool_sessions: Optional[sessionmaker] = None
 
-                    progress = 30 + int(((lib_idx + (show_idx / total_shows)) / max(len(tv_libraries), 1)) * 60)
-                    state.update_task_status(
-                        progress=min(progress, 90),
-                        message=f"Checking: {plex_show.title}",
-                    )
 
-                    try:
-                        missing_data, calls_made, calls_saved = _find_missing_episodes_for_show(
-                            plex_show,
-                            tmdb_api_key,
-                            tmdb_language,
-                            library.key,
-                            library.title,
-                            detection_run_id,
-                        )
-                        api_calls_made += calls_made
-                        api_calls_saved += calls_saved
-
-                        if missing_data:
-                            all_missing_episodes.extend(missing_data)
-                            logger.info(
-                                "Found %s missing episodes for %s",
-                                len(missing_data),
-                                plex_show.title,
-                            )
-
-                        total_shows_processed += 1
-                    except Exception as show_error:  # pylint: disable=broad-except
-                        logger.error("Error processing show %s: %s", plex_show.title, show_error)
-                        continue
+def _init_pool_process(database_url: str, config: Dict[str, str]) -> None:
+    """Set up a spawned pool process with only what :func:`_prepare_show` needs.
 
-                    time.sleep(0.1)
+    The process gets its own read-only engine instead of an app, so it does
+    not create tables or start the stats thread.
+    """
+    global _pool_sessions
+    from .. import _configure_logging  # pylint: disable=import-outside-toplevel
 
-            shows_with_missing = len({ep["show_title"] for ep in all_missing_episodes})
-            detection_run.total_shows_processed = total_shows_processed
-            detection_run.total_missing_episodes = len(all_missing_episodes)
-            detection_run.shows_with_missing = shows_with_missing
-            detection_run.api_calls_made = api_calls_made
-            detection_run.api_calls_saved = api_calls_saved
-            detection_run.status = "completed"
-            detection_run.completed_at = datetime.utcnow()
-            db.session.commit()
+    _configure_logging()
+    _pool_sessions = sessionmaker(bind=create_read_engine(database_url), autoflush=False, expire_on_commit=False)
+    _pool_config.update(config)
 
-            state.set_missing_episodes_cache(all_missing_episodes)
-            state.update_task_status(
-                progress=100,
-                message=(
-                    f"Completed! Found {len(all_missing_episodes)} missing episodes. "
-                    f"API calls made: {api_calls_made}, saved: {api_calls_saved}"
-                ),
-                results={
-                    "total_missing": len(all_missing_episodes),
-                    "shows_with_missing": shows_with_missing,
-                    "api_calls_made": api_calls_made,
-                    "api_calls_saved": api_calls_saved,
-                },
-            )
 
-            logger.info(
-                "Missing episode detection finished. Missing: %s, API calls made: %s, saved: %s",
-                len(all_missing_episodes),
-                api_calls_made,
-                api_calls_saved,
-            )
+def _init_pool_thread(app, config: Dict[str, str]) -> None:
+    app.app_context().push()
+    _pool_config.update(config)
+
+
+def _pool_session() -> Session:
+    return _pool_sessions() if _pool_sessions is not None else read_session()
+
+
+def _prepare_show(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Pool worker half of checking one show: network and reads only."""
+    title, year = item["title"], item["year"]
+    session = _pool_session()
+    try:
+        existing_show = session.query(Show).filter_by(title=title, year=year).first()
+        stale = not existing_show or existing_show.needs_update(max_age_days=7)
+        prepared: Dict[str, Any] = {
+            "show_id": existing_show.id if existing_show else None,
+            "fetched": False,
+            "data": None,
+            "calls": 0,
+            "fetch_seconds": None,
+        }
+    finally:
+        session.close()
+
+    if stale and not item.get("allow_fetch", True):
+        logger.info("Skipping the TMDB refresh of %s: the run's budget is used up", title)
+    elif stale:
+        logger.info("Fetching TMDB data for %s (%s)", title, "update" if prepared["show_id"] else "new")
+        started = time.monotonic()
+        data, calls = _fetch_show_data(
+            title, year, _pool_config.get("tmdbApiKey"), _pool_config.get("tmdbLanguage", "en-US")
+        )
+        prepared.update(fetched=True, data=data, calls=calls, fetch_seconds=time.monotonic() - started)
+
+    plex = plex_connections.get_configured_server(_pool_config)
+    plex_episodes = _union_episode_numbers(plex.fetchItem(int(key)) for key in item["rating_keys"])
+    prepared["plex_episodes"] = {season: sorted(numbers) for season, numbers in plex_episodes.items()}
+    return prepared
 
-        except ConfigurationError as config_error:
-            detection_run.status = "failed"
-            detection_run.error_message = str(config_error)
-            detection_run.completed_at = datetime.utcnow()
-            detection_run.api_calls_made = api_calls_made
-            detection_run.api_calls_saved = api_calls_saved
-            db.session.commit()
-            state.stop_task(str(config_error))
-            logger.error("Missing episodes task configuration error: %s", config_error)
-        except Exception as exc:  # pylint: disable=broad-except
-            detection_run.status = "failed"
-            detection_run.error_message = str(exc)
-            detection_run.completed_at = datetime.utcnow()
-            detection_run.api_calls_made = api_calls_made
-            detection_run.api_calls_saved = api_calls_saved
-            db.session.commit()
-            state.stop_task(f"Error: {exc}")
-            logger.exception("Missing episodes task error")
-        finally:
-            state.set_current_detection_run(None)
-            state.update_task_status(running=False)
+
+def _apply_prepared_show(
+    plex_show,
+    prepared: Dict[str, Any],
+    libraries: List[Tuple[str, str]],
+    detection_run_id: int,
+    show_filter: ShowFilter,
+    replace_existing: bool,
+) -> Tuple[List[Dict[str, Optional[str]]], int, int]:
+    api_calls_made = int(prepared["calls"])
+    api_calls_saved = 0
+    existing_show = db.session.get(Show, prepared["show_id"]) if prepared["show_id"] else None
+
+    if prepared["fetched"]:
+        if prepared["data"] is None:
+            return [], api_calls_made, api_calls_saved
+        existing_show = _store_show_data(
+            plex_show.title,
+            getattr(plex_show, "year", None),
+            existing_show,
+            prepared["data"],
+            prepared["fetch_seconds"],
+        )
+    elif existing_show is not None:
+        logger.info("Using cached data for %s", plex_show.title)
+        api_calls_saved += existing_show.episodes.count()
+    if existing_show is None:
+        return [], api_calls_made, api_calls_saved
+
+    plex_episodes = {int(season): set(numbers) for season, numbers in prepared["plex_episodes"].items()}
+    missing_episodes = _record_missing_episodes(
+        existing_show,
+        plex_episodes,
+        libraries,
+        detection_run_id,
+        show_filter,
+        replace_existing,
+    )
+    return missing_episodes, api_calls_made, api_calls_saved
+
+
+def finish_detection_run(detection_run_id: int) -> None:
+    """Complete a detection run once none of its jobs are queued or running.
+
+    Shard totals are added up into the run. Whichever worker finishes the
+    last job does this; the status guard makes sure it happens only once.
+    """
+    if jobs.unfinished_count(detection_run_id):
+        return
+
+    run_jobs = jobs.run_jobs(detection_run_id)
+    results = [job.get_result() for job in run_jobs if job.kind == JOB_DETECTION_SHARD]
+    totals = {
+        name: sum(int(result.get(name) or 0) for result in results)
+        for name in (
+            "total_shows_processed",
+            "total_missing_episodes",
+            "shows_with_missing",
+            "api_calls_made",
+            "api_calls_saved",
+        )
+    }
+    failed = [job for job in run_jobs if job.status == "failed"]
+    cancelled = any(job.status == "cancelled" or job.get_result().get("cancelled") for job in run_jobs)
+    status = "failed" if failed else "cancelled" if cancelled else "completed"
+    error_message = failed[0].error_message if failed else None
+
+    finished = db.session.execute(
+        DetectionRun.__table__.update()
+        .where(DetectionRun.id == detection_run_id, DetectionRun.status == "running")
+        .values(status=status, error_message=error_message, completed_at=datetime.utcnow())
+    ).rowcount
+    if not finished:
+        db.session.rollback()
+        return
+
+    detection_run = db.session.get(DetectionRun, detection_run_id)
+    db.session.refresh(detection_run)
+    for name, value in totals.items():
+        setattr(detection_run, name, value)
+    if detection_run.started_at and detection_run.completed_at:
+        detection_run.duration_seconds = (detection_run.completed_at - detection_run.started_at).total_seconds()
+    db.session.commit()
+    state.bump_data_version()
+
+    logger.info(
+        "Missing episode detection %s. Missing: %s, API calls made: %s, saved: %s",
+        status,
+        totals["total_missing_episodes"],
+        totals["api_calls_made"],
+        totals["api_calls_saved"],
+    )
+
+    if state.get_current_detection_run() != detection_run_id:
+        return
+    state.set_current_detection_run(None)
+    if status == "failed":
+        state.stop_task(error_message or "Detection failed")
+    elif status == "completed":
+        state.update_task_status(
+            running=False,
+            progress=100,
+            eta_seconds=None,
+            message=(
+                f"Completed! Found {totals['total_missing_episodes']} missing episodes. "
+                f"API calls made: {totals['api_calls_made']}, saved: {totals['api_calls_saved']}"
+                + (" (budget reached; some shows were checked against cached data)"
+                   if detection_run.budget_exhausted else "")
+            ),
+            results={
+                "task": "detection",
+                "total_missing": totals["total_missing_episodes"],
+                "shows_with_missing": totals["shows_with_missing"],
+                "api_calls_made": totals["api_calls_made"],
+                "api_calls_saved": totals["api_calls_saved"],
+            },
+        )
 
 
 def _collect_tv_libraries(plex: PlexServer, library_key: str) -> Tuple[List, List[str], List[str]]:  # type: ignore[override]
@@ -250,206 +909,342 @@ def _collect_tv_libraries(plex: PlexServer, library_key: str) -> Tuple[List, Lis
 
 
 def _find_missing_episodes_for_show(
-    plex_show,
+    members: List[Tuple[Any, Any]],
     tmdb_api_key: str,
     language: str,
-    plex_library_id: str,
-    plex_library_name: str,
     detection_run_id: int,
+    show_filter: ShowFilter = NO_FILTER,
+    replace_existing: bool = False,
+    allow_fetch: bool = True,
 ) -> Tuple[List[Dict[str, Optional[str]]], int, int]:
+    """Check one series, given as the ``(plex_show, library)`` copies of it."""
     api_calls_made = 0
     api_calls_saved = 0
 
+    plex_show = members[0][0]
     show_title = plex_show.title
     show_year = getattr(plex_show, "year", None)
 
     existing_show = Show.query.filter_by(title=show_title, year=show_year).first()
+    stale = not existing_show or existing_show.needs_update(max_age_days=7)
 
-    if not existing_show or existing_show.needs_update(max_age_days=7):
+    if stale and not allow_fetch:
+        logger.info("Skipping the TMDB refresh of %s: the run's budget is used up", show_title)
+        if existing_show is None:
+            return [], api_calls_made, api_calls_saved
+        api_calls_saved += existing_show.episodes.count()
+    elif stale:
         logger.info("Fetching TMDB data for %s (%s)", show_title, "update" if existing_show else "new")
-        tmdb_show = search_tmdb_show(show_title, show_year, tmdb_api_key, language)
-        api_calls_made += 1
-
-        if not tmdb_show and show_year:
-            logger.info("Retrying TMDB search for '%s' without year", show_title)
-            tmdb_show = search_tmdb_show(show_title, None, tmdb_api_key, language)
-            api_calls_made += 1
+        started = time.monotonic()
+        data, api_calls_made = _fetch_show_data(show_title, show_year, tmdb_api_key, language)
+        if data is None:
+            return [], api_calls_made, api_calls_saved
 
-        if not tmdb_show:
-            logger.warning("Failed to locate '%s' on TMDB", show_title)
+        existing_show = _store_show_data(
+            show_title, show_year, existing_show, data, time.monotonic() - started
+        )
+        if existing_show is None:
             return [], api_calls_made, api_calls_saved
+    else:
+        logger.info(
+            "Using cached data for %s (age: %s)",
+            show_title,
+            datetime.utcnow() - (existing_show.last_updated or datetime.utcnow()),
+        )
+        api_calls_saved += existing_show.episodes.count()
+
+    missing_episodes = _record_missing_episodes(
+        existing_show,
+        _union_episode_numbers(member for member, _ in members),
+        _member_libraries(members),
+        detection_run_id,
+        show_filter,
+        replace_existing,
+    )
+    return missing_episodes, api_calls_made, api_calls_saved
 
-        tmdb_id = tmdb_show["id"]
-        existing_show_by_tmdb_id = Show.query.filter_by(tmdb_id=tmdb_id).first()
-        if existing_show_by_tmdb_id and not existing_show:
-            existing_show = existing_show_by_tmdb_id
-        elif existing_show_by_tmdb_id and existing_show and existing_show_by_tmdb_id.id != existing_show.id:
-            logger.warning(
-                "Duplicate show records detected for TMDB ID %s. Using the first instance.",
-                tmdb_id,
-            )
-            existing_show = existing_show_by_tmdb_id
 
-        tmdb_show_details = get_tmdb_tv_details(tmdb_id, tmdb_api_key, language)
+def _fetch_show_data(
+    show_title: str,
+    show_year: Optional[int],
+    tmdb_api_key: str,
+    language: str,
+) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Search TMDB for a show and fetch its details and seasons.
+
+    Returns ``({"tmdb_id", "details", "seasons"}, api_calls)``, with None
+    instead of the data when the show cannot be found. Makes no database
+    access, so it can run in a pool process.
+    """
+    api_calls_made = 0
+
+    tmdb_show = search_tmdb_show(show_title, show_year, tmdb_api_key, language)
+    api_calls_made += 1
+
+    if not tmdb_show and show_year:
+        logger.info("Retrying TMDB search for '%s' without year", show_title)
+        tmdb_show = search_tmdb_show(show_title, None, tmdb_api_key, language)
         api_calls_made += 1
 
-        if not tmdb_show_details:
-            logger.error("Failed to fetch TMDB details for '%s' (ID %s)", show_title, tmdb_id)
-            return [], api_calls_made, api_calls_saved
+    if not tmdb_show:
+        logger.warning("Failed to locate '%s' on TMDB", show_title)
+        return None, api_calls_made
 
-        if not existing_show:
-            existing_show = Show(
-                tmdb_id=tmdb_id,
-                title=tmdb_show_details.get("name", show_title or f"Show {tmdb_id}"),
-                year=show_year,
-                poster_path=tmdb_show_details.get("poster_path"),
-                overview=tmdb_show_details.get("overview"),
-                number_of_seasons=tmdb_show_details.get("number_of_seasons"),
-                number_of_episodes=tmdb_show_details.get("number_of_episodes"),
-                status=tmdb_show_details.get("status"),
-                last_updated=datetime.utcnow(),
-                created_at=datetime.utcnow(),
-            )
+    tmdb_id = tmdb_show["id"]
+    tmdb_show_details = get_tmdb_tv_details(tmdb_id, tmdb_api_key, language)
+    api_calls_made += 1
 
-            existing_show.first_air_date = parse_tmdb_date(tmdb_show_details.get("first_air_date"))
-            existing_show.last_air_date = parse_tmdb_date(tmdb_show_details.get("last_air_date"))
+    if not tmdb_show_details:
+        logger.error("Failed to fetch TMDB details for '%s' (ID %s)", show_title, tmdb_id)
+        return None, api_calls_made
 
-            db.session.add(existing_show)
-            try:
-                db.session.flush()
-            except Exception as flush_error:  # pylint: disable=broad-except
-                db.session.rollback()
-                logger.error(
-                    "Failed to create show record for '%s': %s", show_title, flush_error
-                )
-                existing_show = Show.query.filter_by(tmdb_id=tmdb_id).first()
-                if not existing_show:
-                    return [], api_calls_made, api_calls_saved
-        else:
-            existing_show.title = tmdb_show_details.get("name", show_title or existing_show.title)
-            existing_show.year = show_year
-            existing_show.poster_path = tmdb_show_details.get("poster_path")
-            existing_show.overview = tmdb_show_details.get("overview")
-            existing_show.first_air_date = parse_tmdb_date(tmdb_show_details.get("first_air_date"))
-            existing_show.last_air_date = parse_tmdb_date(tmdb_show_details.get("last_air_date"))
-            existing_show.number_of_seasons = tmdb_show_details.get("number_of_seasons")
-            existing_show.number_of_episodes = tmdb_show_details.get("number_of_episodes")
-            existing_show.status = tmdb_show_details.get("status")
-            existing_show.last_updated = datetime.utcnow()
-
-        total_episodes_processed = 0
-        for season_data in tmdb_show_details.get("seasons", []):
-            season_number = season_data.get("season_number")
-            if season_number in (None, 0):
-                continue
+    seasons: List[Dict[str, Any]] = []
+    for season_data in tmdb_show_details.get("seasons", []):
+        season_number = season_data.get("season_number")
+        if season_number in (None, 0):
+            continue
 
-            if season_data.get("episode_count", 0) <= 0:
-                continue
+        if season_data.get("episode_count", 0) <= 0:
+            continue
 
-            time.sleep(0.1)
-            season_details = get_tmdb_season_details(tmdb_id, season_number, tmdb_api_key, language)
-            api_calls_made += 1
-            if not season_details or "episodes" not in season_details:
-                logger.warning(
-                    "No season details returned for %s season %s", show_title, season_number
-                )
-                continue
+        time.sleep(0.1)
+        season_details = get_tmdb_season_details(tmdb_id, season_number, tmdb_api_key, language)
+        api_calls_made += 1
+        if not season_details or "episodes" not in season_details:
+            logger.warning(
+                "No season details returned for %s season %s", show_title, season_number
+            )
+            continue
 
-            for episode_data in season_details.get("episodes", []):
-                tmdb_episode_id = episode_data.get("id")
-                if not tmdb_episode_id:
-                    logger.warning(
-                        "Episode missing TMDB ID in %s season %s", show_title, season_number
-                    )
-                    continue
+        seasons.append({"season_number": season_number, "episodes": season_details.get("episodes", [])})
 
-                existing_episode = Episode.query.filter_by(tmdb_id=tmdb_episode_id).first()
-                if not existing_episode:
-                    existing_episode = Episode(tmdb_id=tmdb_episode_id, show_id=existing_show.id)
-                    db.session.add(existing_episode)
+    return {"tmdb_id": tmdb_id, "details": tmdb_show_details, "seasons": seasons}, api_calls_made
 
-                existing_episode.season_number = episode_data.get("season_number", season_number)
-                existing_episode.episode_number = episode_data.get("episode_number", 0)
-                existing_episode.title = episode_data.get(
-                    "name", f"Episode {existing_episode.episode_number}"
-                )
-                existing_episode.overview = episode_data.get("overview", "")
-                existing_episode.air_date = parse_tmdb_date(episode_data.get("air_date"))
 
-                vote_average = episode_data.get("vote_average")
-                if isinstance(vote_average, (int, float)):
-                    existing_episode.vote_average = float(vote_average)
-                else:
-                    existing_episode.vote_average = 0.0
+def _store_show_data(
+    show_title: str,
+    show_year: Optional[int],
+    existing_show: Optional[Show],
+    data: Dict[str, Any],
+    fetch_seconds: Optional[float] = None,
+) -> Optional[Show]:
+    """Create or update a show and its episodes from :func:`_fetch_show_data` output.
+
+    ``fetch_seconds`` is how long fetching took; it is kept for scheduling.
+    """
+    tmdb_id = data["tmdb_id"]
+    tmdb_show_details = data["details"]
 
-                existing_episode.still_path = episode_data.get("still_path")
-                runtime = episode_data.get("runtime")
-                if isinstance(runtime, (int, float)):
-                    existing_episode.runtime = int(runtime)
+    existing_show_by_tmdb_id = Show.query.filter_by(tmdb_id=tmdb_id).first()
+    if existing_show_by_tmdb_id and not existing_show:
+        existing_show = existing_show_by_tmdb_id
+    elif existing_show_by_tmdb_id and existing_show and existing_show_by_tmdb_id.id != existing_show.id:
+        logger.warning(
+            "Duplicate show records detected for TMDB ID %s. Using the first instance.",
+            tmdb_id,
+        )
+        existing_show = existing_show_by_tmdb_id
+
+    if not existing_show:
+        existing_show = Show(
+            tmdb_id=tmdb_id,
+            title=tmdb_show_details.get("name", show_title or f"Show {tmdb_id}"),
+            year=show_year,
+            poster_path=tmdb_show_details.get("poster_path"),
+            overview=tmdb_show_details.get("overview"),
+            number_of_seasons=tmdb_show_details.get("number_of_seasons"),
+            number_of_episodes=tmdb_show_details.get("number_of_episodes"),
+            status=tmdb_show_details.get("status"),
+            last_updated=datetime.utcnow(),
+            last_fetch_seconds=fetch_seconds,
+            created_at=datetime.utcnow(),
+        )
 
-                total_episodes_processed += 1
+        existing_show.first_air_date = parse_tmdb_date(tmdb_show_details.get("first_air_date"))
+        existing_show.last_air_date = parse_tmdb_date(tmdb_show_details.get("last_air_date"))
 
+        db.session.add(existing_show)
         try:
-            db.session.commit()
-            logger.info(
-                "Saved %s episodes for '%s' to the database",
-                total_episodes_processed,
-                show_title,
-            )
-        except Exception as commit_error:  # pylint: disable=broad-except
+            db.session.flush()
+        except Exception as flush_error:  # pylint: disable=broad-except
             db.session.rollback()
-            logger.error("Failed to persist episode data for '%s': %s", show_title, commit_error)
+            logger.error(
+                "Failed to create show record for '%s': %s", show_title, flush_error
+            )
             existing_show = Show.query.filter_by(tmdb_id=tmdb_id).first()
             if not existing_show:
-                return [], api_calls_made, api_calls_saved
+                return None
     else:
+        existing_show.title = tmdb_show_details.get("name", show_title or existing_show.title)
+        existing_show.year = show_year
+        existing_show.poster_path = tmdb_show_details.get("poster_path")
+        existing_show.overview = tmdb_show_details.get("overview")
+        existing_show.first_air_date = parse_tmdb_date(tmdb_show_details.get("first_air_date"))
+        existing_show.last_air_date = parse_tmdb_date(tmdb_show_details.get("last_air_date"))
+        existing_show.number_of_seasons = tmdb_show_details.get("number_of_seasons")
+        existing_show.number_of_episodes = tmdb_show_details.get("number_of_episodes")
+        existing_show.status = tmdb_show_details.get("status")
+        existing_show.last_updated = datetime.utcnow()
+        if fetch_seconds is not None:
+            existing_show.last_fetch_seconds = fetch_seconds
+
+    total_episodes_processed = 0
+    for season in data["seasons"]:
+        season_number = season["season_number"]
+        for episode_data in season["episodes"]:
+            tmdb_episode_id = episode_data.get("id")
+            if not tmdb_episode_id:
+                logger.warning(
+                    "Episode missing TMDB ID in %s season %s", show_title, season_number
+                )
+                continue
+
+            existing_episode = Episode.query.filter_by(tmdb_id=tmdb_episode_id).first()
+            if not existing_episode:
+                existing_episode = Episode(tmdb_id=tmdb_episode_id, show_id=existing_show.id)
+                db.session.add(existing_episode)
+
+            existing_episode.season_number = episode_data.get("season_number", season_number)
+            existing_episode.episode_number = episode_data.get("episode_number", 0)
+            existing_episode.title = episode_data.get(
+                "name", f"Episode {existing_episode.episode_number}"
+            )
+            existing_episode.overview = episode_data.get("overview", "")
+            existing_episode.air_date = parse_tmdb_date(episode_data.get("air_date"))
+
+            vote_average = episode_data.get("vote_average")
+            if isinstance(vote_average, (int, float)):
+                existing_episode.vote_average = float(vote_average)
+            else:
+                existing_episode.vote_average = 0.0
+
+            existing_episode.still_path = episode_data.get("still_path")
+            runtime = episode_data.get("runtime")
+            if isinstance(runtime, (int, float)):
+                existing_episode.runtime = int(runtime)
+
+            total_episodes_processed += 1
+
+    try:
+        db.session.commit()
         logger.info(
-            "Using cached data for %s (age: %s)",
+            "Saved %s episodes for '%s' to the database",
+            total_episodes_processed,
             show_title,
-            datetime.utcnow() - (existing_show.last_updated or datetime.utcnow()),
         )
-        api_calls_saved += existing_show.episodes.count()
+    except Exception as commit_error:  # pylint: disable=broad-except
+        db.session.rollback()
+        logger.error("Failed to persist episode data for '%s': %s", show_title, commit_error)
+        existing_show = Show.query.filter_by(tmdb_id=tmdb_id).first()
 
-    plex_episodes = defaultdict(set)
-    for season in plex_show.seasons():
-        if getattr(season, "seasonNumber", None) == 0:
-            continue
-        for episode in season.episodes():
-            plex_episodes[season.seasonNumber].add(episode.episodeNumber)
+    return existing_show
 
-    missing_episodes: List[Dict[str, Optional[str]]] = []
-    db_episodes = existing_show.episodes.filter(Episode.season_number > 0).all()
 
-    for db_episode in db_episodes:
-        season_num = db_episode.season_number
-        episode_num = db_episode.episode_number
+def _plex_episode_numbers(plex_show) -> Dict[int, Set[int]]:
+    """Episode numbers per season that Plex has for a show, without specials.
 
-        if episode_num not in plex_episodes.get(season_num, set()):
+    All episodes come from the show's ``allLeaves`` listing, one request
+    instead of one per season.
+    """
+    plex_episodes: Dict[int, Set[int]] = defaultdict(set)
+    for episode in plex_show.episodes():
+        season_number, episode_number = episode.parentIndex, episode.index
+        if season_number is None or episode_number is None or season_number == 0:
+            continue
+        plex_episodes[season_number].add(episode_number)
+    return plex_episodes
+
+
+def _union_episode_numbers(plex_shows: Iterable[Any]) -> Dict[int, Set[int]]:
+    """Episode numbers per season that any of several Plex copies of a show has."""
+    plex_episodes: Dict[int, Set[int]] = defaultdict(set)
+    for plex_show in plex_shows:
+        for season_number, numbers in _plex_episode_numbers(plex_show).items():
+            plex_episodes[season_number] |= numbers
+    return plex_episodes
+
+
+def _member_libraries(members: List[Tuple[Any, Any]]) -> List[Tuple[str, str]]:
+    """Distinct ``(library id, library name)`` pairs of a series' copies."""
+    libraries: Dict[str, str] = {}
+    for _, library in members:
+        libraries.setdefault(str(library.key), library.title)
+    return list(libraries.items())
+
+
+def _missing_db_episodes(
+    existing_show: Show, plex_episodes: Dict[int, Set[int]], show_filter: ShowFilter = NO_FILTER
+) -> List[Episode]:
+    """Cached TMDB episodes of a show that Plex does not have, without specials or hidden ones."""
+    return [
+        db_episode
+        for db_episode in existing_show.episodes.filter(Episode.season_number > 0).all()
+        if not show_filter.is_episode_hidden(db_episode.season_number, db_episode.episode_number)
+        and db_episode.episode_number not in plex_episodes.get(db_episode.season_number, set())
+    ]
+
+
+def _missing_episode_to_dict(existing_show: Show, db_episode: Episode) -> Dict[str, Optional[str]]:
+    return {
+        "show_title": existing_show.title,
+        "show_year": existing_show.year,
+        "season_number": db_episode.season_number,
+        "episode_number": db_episode.episode_number,
+        "episode_title": db_episode.title,
+        "air_date": db_episode.air_date.isoformat() if db_episode.air_date else None,
+        "overview": db_episode.overview or "",
+        "tmdb_show_id": existing_show.tmdb_id,
+        "tmdb_episode_id": db_episode.tmdb_id,
+        "still_path": db_episode.still_path,
+        "vote_average": db_episode.vote_average or 0,
+        "show_poster_path": existing_show.poster_path,
+    }
+
+
+def check_show_from_cache(
+    plex_show, existing_show: Show, show_filter: ShowFilter = NO_FILTER
+) -> List[Dict[str, Optional[str]]]:
+    """Missing episodes of one Plex show against its cached TMDB data.
+
+    Makes a single Plex request and writes nothing, so it is cheap enough to
+    answer a request inline.
+    """
+    return [
+        _missing_episode_to_dict(existing_show, db_episode)
+        for db_episode in _missing_db_episodes(existing_show, _plex_episode_numbers(plex_show), show_filter)
+    ]
+
+
+def _record_missing_episodes(
+    existing_show: Show,
+    plex_episodes: Dict[int, Set[int]],
+    libraries: List[Tuple[str, str]],
+    detection_run_id: int,
+    show_filter: ShowFilter = NO_FILTER,
+    replace_existing: bool = False,
+) -> List[Dict[str, Optional[str]]]:
+    """Record the show's missing episodes once for each of ``libraries`` (id, name)."""
+    if replace_existing:
+        replaced = MissingEpisode.query.filter(
+            MissingEpisode.show_id == existing_show.id,
+            MissingEpisode.detection_run_id == detection_run_id,
+            MissingEpisode.plex_library_id.in_([library_id for library_id, _ in libraries]),
+        ).delete(synchronize_session=False)
+        stats.adjust(missing_episodes_count=-replaced)
+
+    missing_episodes: List[Dict[str, Optional[str]]] = []
+    for db_episode in _missing_db_episodes(existing_show, plex_episodes, show_filter):
+        entry = _missing_episode_to_dict(existing_show, db_episode)
+        for library_id, library_name in libraries:
             missing_entry = MissingEpisode(
                 show_id=existing_show.id,
                 episode_id=db_episode.id,
                 detection_run_id=detection_run_id,
-                plex_library_id=str(plex_library_id),
-                plex_library_name=plex_library_name,
+                plex_library_id=library_id,
+                plex_library_name=library_name,
             )
             db.session.add(missing_entry)
-
-            missing_episodes.append(
-                {
-                    "show_title": existing_show.title,
-                    "show_year": existing_show.year,
-                    "season_number": db_episode.season_number,
-                    "episode_number": db_episode.episode_number,
-                    "episode_title": db_episode.title,
-                    "air_date": db_episode.air_date.isoformat() if db_episode.air_date else None,
-                    "overview": db_episode.overview or "",
-                    "tmdb_show_id": existing_show.tmdb_id,
-                    "tmdb_episode_id": db_episode.tmdb_id,
-                    "still_path": db_episode.still_path,
-                    "vote_average": db_episode.vote_average or 0,
-                    "show_poster_path": existing_show.poster_path,
-                }
-            )
+            missing_episodes.append(dict(entry, plex_library_id=library_id, plex_library_name=library_name))
 
     try:
         db.session.commit()
@@ -466,113 +1261,121 @@ def _find_missing_episodes_for_show(
             missing_commit_error,
         )
 
-    return missing_episodes, api_calls_made, api_calls_saved
+    return missing_episodes
 
 
-def _reprocessing_worker(app, show_titles: List[Dict[str, Optional[str]]]) -> None:  # type: ignore[annotation-unchecked]
-    with app.app_context():
-        try:
-            config = _load_config()
-            tmdb_api_key = config.get("tmdbApiKey")
-            tmdb_language = config.get("tmdbLanguage", "en-US")
-            if not tmdb_api_key:
-                raise ConfigurationError("TMDB API key not configured.")
+def run_reprocessing_job(job: Job) -> Dict[str, int]:
+    """Refetch TMDB data for the shows listed in a reprocessing job."""
+    show_titles: List[Dict[str, Optional[str]]] = job.get_payload().get("shows", [])
+    try:
+        config = _load_config()
+        tmdb_api_key = config.get("tmdbApiKey")
+        tmdb_language = config.get("tmdbLanguage", "en-US")
+        if not tmdb_api_key:
+            raise ConfigurationError("TMDB API key not configured.")
 
-            total_shows = len(show_titles)
-            successful = 0
-            failed = 0
+        total_shows = len(show_titles)
+        successful = 0
+        failed = 0
 
-            state.update_task_status(message="Initializing reprocessing...", progress=5)
+        state.update_task_status(message="Initializing reprocessing...", progress=5)
 
-            for index, show_data in enumerate(show_titles):
-                if not state.is_task_running():
-                    break
+        for index, show_data in enumerate(show_titles):
+            if not state.is_task_running():
+                break
 
-                show_title = show_data.get("title") if isinstance(show_data, dict) else str(show_data)
-                show_year = show_data.get("year") if isinstance(show_data, dict) else None
+            show_title = show_data.get("title") if isinstance(show_data, dict) else str(show_data)
+            show_year = show_data.get("year") if isinstance(show_data, dict) else None
 
-                state.update_task_status(
-                    message=f"Reprocessing '{show_title}'...",
-                    progress=min(10 + (index * 80 // max(total_shows, 1)), 90),
-                )
+            state.update_task_status(
+                message=f"Reprocessing '{show_title}'...",
+                progress=min(10 + (index * 80 // max(total_shows, 1)), 90),
+            )
 
-                try:
-                    query = Show.query.filter_by(title=show_title)
-                    if show_year:
-                        query = query.filter_by(year=show_year)
-                    existing_show = query.first()
-
-                    if not existing_show:
-                        failed += 1
-                        logger.warning("Show not found in database: %s", show_title)
-                        continue
+            try:
+                query = Show.query.filter_by(title=show_title)
+                if show_year:
+                    query = query.filter_by(year=show_year)
+                existing_show = query.first()
 
-                    existing_show.last_updated = None
+                if not existing_show:
+                    failed += 1
+                    logger.warning("Show not found in database: %s", show_title)
+                    continue
 
-                    tmdb_search_result = search_tmdb_show(show_title, show_year, tmdb_api_key, tmdb_language)
-                    if not tmdb_search_result:
-                        failed += 1
-                        logger.warning("Failed to find TMDB results for: %s", show_title)
-                        continue
+                existing_show.last_updated = None
 
-                    tmdb_details = get_tmdb_tv_details(
-                        tmdb_search_result["id"], tmdb_api_key, tmdb_language
-                    )
-                    if not tmdb_details:
-                        failed += 1
-                        logger.warning("Failed to fetch TMDB details for: %s", show_title)
-                        continue
+                tmdb_search_result = search_tmdb_show(show_title, show_year, tmdb_api_key, tmdb_language)
+                if not tmdb_search_result:
+                    failed += 1
+                    logger.warning("Failed to find TMDB results for: %s", show_title)
+                    continue
 
-                    existing_show.tmdb_id = tmdb_details.get("id")
-                    existing_show.overview = tmdb_details.get("overview")
-                    existing_show.poster_path = tmdb_details.get("poster_path")
-                    existing_show.first_air_date = parse_tmdb_date(tmdb_details.get("first_air_date"))
-                    existing_show.status = tmdb_details.get("status")
-                    existing_show.last_updated = datetime.utcnow()
+                tmdb_details = get_tmdb_tv_details(
+                    tmdb_search_result["id"], tmdb_api_key, tmdb_language
+                )
+                if not tmdb_details:
+                    failed += 1
+                    logger.warning("Failed to fetch TMDB details for: %s", show_title)
+                    continue
+
+                existing_show.tmdb_id = tmdb_details.get("id")
+                existing_show.overview = tmdb_details.get("overview")
+                existing_show.poster_path = tmdb_details.get("poster_path")
+                existing_show.first_air_date = parse_tmdb_date(tmdb_details.get("first_air_date"))
+                existing_show.status = tmdb_details.get("status")
+                existing_show.last_updated = datetime.utcnow()
 
-                    Episode.query.filter_by(show_id=existing_show.id).delete()
+                deleted_episodes = Episode.query.filter_by(show_id=existing_show.id).delete()
+                stats.adjust(episodes_count=-deleted_episodes)
+
+                number_of_seasons = tmdb_details.get("number_of_seasons") or 0
+                for season_num in range(1, number_of_seasons + 1):
+                    season_details = get_tmdb_season_details(
+                        tmdb_details["id"], season_num, tmdb_api_key, tmdb_language
+                    )
+                    if not season_details:
+                        continue
 
-                    number_of_seasons = tmdb_details.get("number_of_seasons") or 0
-                    for season_num in range(1, number_of_seasons + 1):
-                        season_details = get_tmdb_season_details(
-                            tmdb_details["id"], season_num, tmdb_api_key, tmdb_language
+                    for ep_data in season_details.get("episodes", []):
+                        episode = Episode(
+                            tmdb_id=ep_data.get("id"),
+                            show_id=existing_show.id,
+                            season_number=ep_data.get("season_number"),
+                            episode_number=ep_data.get("episode_number"),
+                            title=ep_data.get("name"),
+                            overview=ep_data.get("overview"),
+                            air_date=parse_tmdb_date(ep_data.get("air_date")),
+                            vote_average=ep_data.get("vote_average"),
+                            still_path=ep_data.get("still_path"),
                         )
-                        if not season_details:
-                            continue
-
-                        for ep_data in season_details.get("episodes", []):
-                            episode = Episode(
-                                tmdb_id=ep_data.get("id"),
-                                show_id=existing_show.id,
-                                season_number=ep_data.get("season_number"),
-                                episode_number=ep_data.get("episode_number"),
-                                title=ep_data.get("name"),
-                                overview=ep_data.get("overview"),
-                                air_date=parse_tmdb_date(ep_data.get("air_date")),
-                                vote_average=ep_data.get("vote_average"),
-                                still_path=ep_data.get("still_path"),
-                            )
-                            db.session.add(episode)
-
-                    db.session.commit()
-                    successful += 1
-                    logger.info("Successfully reprocessed: %s", show_title)
-                except Exception as exc:  # pylint: disable=broad-except
-                    failed += 1
-                    logger.exception("Error reprocessing %s", show_title)
-                    db.session.rollback()
+                        db.session.add(episode)
+
+                db.session.commit()
+                state.bump_data_version()
+                successful += 1
+                state.publish_event("show", title=show_title, reprocessed=True)
+                logger.info("Successfully reprocessed: %s", show_title)
+            except Exception as exc:  # pylint: disable=broad-except
+                failed += 1
+                logger.exception("Error reprocessing %s", show_title)
+                db.session.rollback()
 
-            state.update_task_status(
-                progress=100,
-                message=f"Reprocessing complete! {successful} successful, {failed} failed",
-                results={"total": total_shows, "successful": successful, "failed": failed},
-            )
-            logger.info("Reprocessing complete: %s/%s successful", successful, total_shows)
-        except ConfigurationError as config_error:
-            state.stop_task(str(config_error))
-            logger.error("Reprocessing configuration error: %s", config_error)
-        except Exception as exc:  # pylint: disable=broad-except
-            state.stop_task(f"Error: {exc}")
-            logger.exception("Reprocessing task error")
-        finally:
-            state.update_task_status(running=False)
\ No newline at end of file
+        results = {"total": total_shows, "successful": successful, "failed": failed}
+        state.update_task_status(
+            progress=100,
+            message=f"Reprocessing complete! {successful} successful, {failed} failed",
+            results=dict(results, task="reprocessing"),
+        )
+        logger.info("Reprocessing complete: %s/%s successful", successful, total_shows)
+        return results
+    except ConfigurationError as config_error:
+        state.stop_task(str(config_error))
+        logger.error("Reprocessing configuration error: %s", config_error)
+        raise
+    except Exception as exc:
+        state.stop_task(f"Error: {exc}")
+        logger.exception("Reprocessing task error")
+        raise
+    finally:
+        state.update_task_status(running=False)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Database maintenance that runs inline or as a queued job."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import or_, select
+
+from models import Episode, Job, MissingEpisode, Show, db
+
+from .. import state
+from ..services import jobs, stats
+
+
+logger = logging.getLogger(__name__)
+
+# Job kind handled by plex_tmdb.worker.
+JOB_ORPHAN_CLEANUP = "orphan_cleanup"
+
+ORPHAN_CHUNK_SIZE = 5000
+# Pause between chunks so readers are not starved of the database lock.
+ORPHAN_CHUNK_PAUSE = 0.05
+
+
+def _orphaned_missing_episode_ids():
+    missing = MissingEpisode.__table__
+    episodes = Episode.__table__
+    shows = Show.__table__
+    return (
+        select(missing.c.id)
+        .select_from(
+            missing.outerjoin(episodes, missing.c.episode_id == episodes.c.id).outerjoin(
+                shows, missing.c.show_id == shows.c.id
+            )
+        )
+        .where(or_(episodes.c.id.is_(None), shows.c.id.is_(None)))
+    )
+
+
+def delete_orphaned_missing_episodes(
+    chunk_size: int = ORPHAN_CHUNK_SIZE,
+    pause: float = ORPHAN_CHUNK_PAUSE,
+    progress: Optional[Callable[[int], bool]] = None,
+) -> int:
+    """Delete missing episode records whose episode or show no longer exists.
+
+    Rows are removed with ``DELETE ... WHERE id IN (subquery LIMIT n)`` and each
+    chunk is committed on its own, so no ORM objects are loaded and the write
+    lock is released between chunks. ``progress`` is called with the running
+    total after every full chunk; returning False stops early. Returns the
+    number of deleted rows.
+    """
+    missing = MissingEpisode.__table__
+    total = 0
+
+    while True:
+        deleted = db.session.execute(
+            missing.delete().where(
+                missing.c.id.in_(_orphaned_missing_episode_ids().limit(chunk_size))
+            )
+        ).rowcount
+        if deleted:
+            stats.adjust(missing_episodes_count=-deleted)
+        db.session.commit()
+        total += deleted
+
+        if deleted < chunk_size:
+            break
+        if progress and progress(total) is False:
+            break
+        time.sleep(pause)
+
+    if total:
+        state.bump_data_version()
+        logger.info("Deleted %s orphaned missing episode records", total)
+    return total
+
+
+def run_orphan_cleanup_task() -> None:
+    """Queue the orphan cleanup for the workers; progress goes through the task state."""
+    jobs.enqueue(JOB_ORPHAN_CLEANUP, {})
+    state.update_task_status(message="Waiting for a worker...", progress=5)
+
+
+def run_orphan_cleanup_job(job: Job) -> Dict[str, int]:  # pylint: disable=unused-argument
+    """Delete orphaned missing episode records for a queued cleanup job."""
+    try:
+        state.update_task_status(message="Deleting orphaned missing episode records...", progress=10)
+
+        def report(total: int) -> bool:
+            state.update_task_status(message=f"Deleted {total} orphaned records so far...")
+            return state.is_task_running()
+
+        cleaned_count = delete_orphaned_missing_episodes(progress=report)
+        state.update_task_status(
+            progress=100,
+            message=f"Cleaned up {cleaned_count} orphaned missing episode records",
+            results={"task": "cleanup", "cleaned_count": cleaned_count},
+        )
+        return {"cleaned_count": cleaned_count}
+    except Exception as exc:
+        state.stop_task(f"Error: {exc}")
+        logger.exception("Orphan cleanup task error")
+        raise
+    finally:
+        state.update_task_status(running=False)
@@ -0,0 +1,145 @@
+"""Job worker that claims queued jobs and runs detection, reprocessing or cleanup.
+
+Start standalone workers with ``plex-tmdb worker``; ``plex-tmdb serve``
+also runs one in the web process unless ``--no-worker`` is given. Any number
+of workers, on one machine or several sharing the database, can take part:
+each worker thread claims one job at a time under a lease and renews it with
+heartbeats, so a shard abandoned by a crashed worker is retried elsewhere.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence
+
+from flask import Flask
+
+from models import Job, db
+
+from . import state
+from .services import jobs
+from .tasks import detection, maintenance
+
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL_SECONDS = jobs.LEASE_SECONDS / 4
+POLL_INTERVAL_SECONDS = 2.0
+
+HANDLERS: Dict[str, Callable[[Job], Optional[Dict]]] = {
+    detection.JOB_DETECTION: detection.plan_detection_job,
+    detection.JOB_DETECTION_SHARD: detection.run_detection_shard,
+    detection.JOB_REPROCESSING: detection.run_reprocessing_job,
+    maintenance.JOB_ORPHAN_CLEANUP: maintenance.run_orphan_cleanup_job,
+}
+
+
+def _owner_id(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}:{uuid.uuid4().hex[:8]}"
+
+
+def _heartbeat_loop(app: Flask, job_id: int, owner: str, done: threading.Event) -> None:
+    with app.app_context():
+        while not done.wait(HEARTBEAT_INTERVAL_SECONDS):
+            try:
+                if not jobs.heartbeat(job_id, owner):
+                    logger.warning("Lost the lease on job %s", job_id)
+                    return
+                state.touch_task()
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Heartbeat for job %s failed", job_id)
+
+
+def _execute(app: Flask, job: Job, owner: str) -> None:
+    job_id, kind, detection_run_id = job.id, job.kind, job.detection_run_id
+    logger.info("Running job %s (%s, attempt %s)", job_id, kind, job.attempts)
+
+    done = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat_loop, args=(app, job_id, owner, done), name=f"job-{job_id}-heartbeat", daemon=True
+    )
+    heartbeat.start()
+    state.touch_task()
+
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    try:
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {kind}")
+        result = handler(job)
+    except Exception as exc:  # pylint: disable=broad-except
+        db.session.rollback()
+        error = str(exc)
+        logger.exception("Job %s (%s) failed", job_id, kind)
+    finally:
+        done.set()
+        heartbeat.join()
+
+    jobs.finish(job_id, owner, "failed" if error is not None else "completed", result, error)
+    if detection_run_id is not None:
+        detection.finish_detection_run(detection_run_id)
+
+
+def _work_loop(app: Flask, index: int, stop: threading.Event, once: bool, kinds: Optional[Sequence[str]]) -> None:
+    owner = _owner_id(index)
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                for detection_run_id in jobs.reap_expired():
+                    detection.finish_detection_run(detection_run_id)
+                job = jobs.claim(owner, kinds)
+                if job is not None:
+                    _execute(app, job, owner)
+                    continue
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Worker %s could not process the queue", owner)
+
+        if once:
+            return
+        stop.wait(POLL_INTERVAL_SECONDS)
+
+
+def start(
+    app: Flask,
+    threads: int = 1,
+    once: bool = False,
+    kinds: Optional[Sequence[str]] = None,
+    stop: Optional[threading.Event] = None,
+) -> List[threading.Thread]:
+    """Start ``threads`` worker threads; setting ``stop`` makes them exit after their current job."""
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(
+            target=_work_loop,
+            args=(app, index, stop, once, kinds),
+            name=f"plex-tmdb-worker-{index}",
+            daemon=True,
+        )
+        for index in range(max(threads, 1))
+    ]
+    for thread in workers:
+        thread.start()
+    return workers
+
+
+def run(app: Flask, threads: int = 1, once: bool = False, kinds: Optional[Sequence[str]] = None) -> None:
+    """Process jobs until interrupted, or until the queue is empty with ``once``."""
+    stop = threading.Event()
+    workers = start(app, threads, once, kinds, stop)
+    logger.info("Worker started with %s thread(s)", len(workers))
+    try:
+        for thread in workers:
+            while thread.is_alive():
+                thread.join(timeout=1.0)
+    except KeyboardInterrupt:
+        logger.info("Stopping worker after the current jobs...")
+        stop.set()
+        for thread in workers:
+            thread.join()
@@ -0,0 +1,153 @@
+"""Compiled show/season/episode filters loaded from ``filters.json``.
+
+The filter file is a list of entries such as::
+
+    {"show": "Black Mirror (2011)", "episodes": [-4]}
+    {"show": "Inside No. 9 (2014)", "episodes": [-6, 1]}
+    {"show": "How to Become a Mob Boss (2023)"}
+
+An entry without ``episodes`` hides the whole show. Inside ``episodes`` a
+negative number selects a season; the positive numbers that follow it hide
+individual episodes of that season, and a season with no episodes after it
+is hidden entirely.
+
+The file is compiled once into a dictionary keyed by show name, so lookups
+are constant time for both the CLI (``main.py``) and the web detection task.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple, Union
+
+
+logger = logging.getLogger(__name__)
+
+_DATED_TITLE_PATTERN = re.compile(r"\(\d{4}\)$")
+
+
+class ShowFilter:
+    """Hidden seasons and episodes for a single show."""
+
+    __slots__ = ("hide_show", "hidden_seasons", "hidden_episodes")
+
+    def __init__(
+        self,
+        hide_show: bool = False,
+        hidden_seasons: Iterable[int] = (),
+        hidden_episodes: Optional[Mapping[int, Iterable[int]]] = None,
+    ) -> None:
+        self.hide_show = hide_show
+        self.hidden_seasons: FrozenSet[int] = frozenset(hidden_seasons)
+        self.hidden_episodes: Dict[int, FrozenSet[int]] = {
+            season: frozenset(episodes) for season, episodes in (hidden_episodes or {}).items()
+        }
+
+    def is_season_hidden(self, season_number: int) -> bool:
+        return self.hide_show or season_number in self.hidden_seasons
+
+    def is_episode_hidden(self, season_number: int, episode_number: int) -> bool:
+        if self.is_season_hidden(season_number):
+            return True
+        return episode_number in self.hidden_episodes.get(season_number, ())
+
+    def __bool__(self) -> bool:
+        return bool(self.hide_show or self.hidden_seasons or self.hidden_episodes)
+
+
+NO_FILTER = ShowFilter()
+
+
+def _compile_entry(entry: Mapping[str, Any]) -> ShowFilter:
+    if "episodes" not in entry:
+        return ShowFilter(hide_show=True)
+
+    listed: Dict[int, set] = {}
+    season: Optional[int] = None
+    for value in entry.get("episodes") or []:
+        value = int(value)
+        if value < 0:
+            season = -value
+            listed.setdefault(season, set())
+        elif season is not None:
+            listed[season].add(value)
+
+    return ShowFilter(
+        hidden_seasons=[number for number, episodes in listed.items() if not episodes],
+        hidden_episodes={number: episodes for number, episodes in listed.items() if episodes},
+    )
+
+
+class FilterIndex:
+    """Mapping of show name to its compiled :class:`ShowFilter`."""
+
+    def __init__(self, filters: Optional[Dict[str, ShowFilter]] = None) -> None:
+        self._filters = filters or {}
+
+    @classmethod
+    def compile(cls, entries: Iterable[Mapping[str, Any]]) -> "FilterIndex":
+        filters: Dict[str, ShowFilter] = {}
+        for entry in entries or []:
+            name = entry.get("show")
+            # the first entry for a show wins, matching the original linear scan
+            if name and name not in filters:
+                filters[name] = _compile_entry(entry)
+        return cls(filters)
+
+    def lookup(self, show_name: str) -> ShowFilter:
+        """Return the filter for ``show_name``, or a filter that hides nothing."""
+        return self._filters.get(show_name, NO_FILTER)
+
+    def lookup_show(self, title: str, year: Optional[int]) -> ShowFilter:
+        """Look up a show by its Plex title and year."""
+        show_filter = self._filters.get(show_filter_key(title, year))
+        if show_filter is None:
+            show_filter = self._filters.get(title, NO_FILTER)
+        return show_filter
+
+    def __len__(self) -> int:
+        return len(self._filters)
+
+
+def show_filter_key(title: str, year: Optional[int]) -> str:
+    """Build the ``"Title (YYYY)"`` name used by filter entries."""
+    if year and not _DATED_TITLE_PATTERN.search(title or ""):
+        return f"{title} ({year})"
+    return title
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, FilterIndex]] = {}
+
+
+def load_filter_index(path: Union[str, os.PathLike, None]) -> FilterIndex:
+    """Load and compile a filter file, reusing the compiled index until its mtime changes.
+
+    A missing path or file yields an empty index.
+    """
+    if not path:
+        return FilterIndex()
+
+    resolved = str(Path(path).resolve())
+    try:
+        mtime = os.stat(resolved).st_mtime
+    except FileNotFoundError:
+        return FilterIndex()
+
+    with _cache_lock:
+        cached = _cache.get(resolved)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with open(resolved, "r", encoding="utf-8") as handle:
+        index = FilterIndex.compile(json.load(handle))
+    logger.info("Loaded %s show filters from %s", len(index), resolved)
+
+    with _cache_lock:
+        _cache[resolved] = (mtime, index)
+    return index
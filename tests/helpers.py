@@ -0,0 +1,91 @@
+"""Shared setup for tests that need the Flask app and its database."""
+
+import json
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from models import DetectionRun, Episode, MissingEpisode, Show, db
+from plex_tmdb import create_app
+from plex_tmdb.routes import caching
+from plex_tmdb.services import config as config_store
+
+
+def make_app(test_case, config=None, **settings):
+    """App with its own database, task state and ``config.json`` in a temporary folder.
+
+    An app context is pushed for the duration of the test.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    root = Path(directory.name)
+
+    config_path = root / "config.json"
+    if config is not None:
+        config_path.write_text(json.dumps(config), encoding="utf-8")
+    patcher = mock.patch.object(config_store, "CONFIG_PATH", config_path)
+    patcher.start()
+    test_case.addCleanup(config_store._refresh, force=True)
+    test_case.addCleanup(patcher.stop)
+    config_store._refresh(force=True)
+
+    app = create_app(
+        dict(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{root / 'plex_tmdb.db'}",
+                "TASK_STATE_PATH": root / "task_state.sqlite3",
+                "STATS_RECONCILE_INTERVAL": 0,
+            },
+            **settings,
+        )
+    )
+    # Stores created within the same second start at the same data version.
+    caching._response_cache.clear()
+    context = app.app_context()
+    context.push()
+    test_case.addCleanup(context.pop)
+    test_case.addCleanup(db.session.remove)
+    return app
+
+
+def add_show(tmdb_id, title, year=2000, episodes=((1, 1), (1, 2)), **fields):
+    """A cached show with TMDB episodes ``(season, episode)``, all aired long ago."""
+    fields.setdefault("last_updated", datetime.utcnow())
+    show = Show(tmdb_id=tmdb_id, title=title, year=year, **fields)
+    db.session.add(show)
+    db.session.flush()
+    for season, number in episodes:
+        db.session.add(
+            Episode(
+                tmdb_id=tmdb_id * 1000 + season * 100 + number,
+                show_id=show.id,
+                season_number=season,
+                episode_number=number,
+                title=f"Episode {season}x{number}",
+                air_date=date(2000, 1, 1) + timedelta(days=season * 100 + number),
+            )
+        )
+    db.session.flush()
+    return show
+
+
+def add_completed_run(missing=(), library_id="1", library_name="TV"):
+    """A completed detection run recording ``missing`` ``(show, season, episode)`` triples."""
+    run = DetectionRun(status="completed", completed_at=datetime.utcnow())
+    db.session.add(run)
+    db.session.flush()
+    for show, season, number in missing:
+        episode = show.episodes.filter_by(season_number=season, episode_number=number).one()
+        db.session.add(
+            MissingEpisode(
+                show_id=show.id,
+                episode_id=episode.id,
+                detection_run_id=run.id,
+                plex_library_id=library_id,
+                plex_library_name=library_name,
+            )
+        )
+    db.session.commit()
+    return run
@@ -0,0 +1,59 @@
+"""Cost estimates and ordering of the shows a detection shard checks."""
+
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from helpers import add_show, make_app
+from models import db
+from plex_tmdb.tasks import detection
+from show_filters import NO_FILTER
+
+
+def _visible(*titles):
+    library = SimpleNamespace(key=1, title="TV")
+    return [
+        ([(SimpleNamespace(title=title, year=2000, ratingKey=index), library)], NO_FILTER)
+        for index, title in enumerate(titles)
+    ]
+
+
+class CheckScheduleTest(unittest.TestCase):
+    def setUp(self):
+        make_app(self)
+        month_ago = datetime.utcnow() - timedelta(days=30)
+        add_show(1, "Soap", number_of_seasons=40)
+        add_show(2, "Mini", number_of_seasons=1)
+        add_show(3, "Airing", number_of_seasons=2, status="Returning Series", last_updated=month_ago)
+        add_show(4, "Ended", number_of_seasons=2, status="Ended", last_updated=month_ago)
+        db.session.commit()
+
+    def titles(self, checks):
+        return [check.plex_show.title for check in checks]
+
+    def test_longest_checks_go_first(self):
+        checks = detection._schedule_checks(_visible("Mini", "Soap"))
+        self.assertEqual(self.titles(checks), ["Soap", "Mini"])
+        self.assertGreater(checks[0].cost, checks[1].cost)
+        self.assertEqual([check.refresh for check in checks], [False, False])
+
+    def test_cached_cost_leaves_out_the_refresh(self):
+        [check] = detection._schedule_checks(_visible("Airing"))
+        self.assertTrue(check.refresh)
+        self.assertLess(check.cached_cost, check.cost)
+
+    def test_budgeted_run_starts_with_the_stalest_and_most_volatile(self):
+        checks = detection._schedule_checks(_visible("Soap", "Ended", "Mini", "New", "Airing"), by_staleness=True)
+        self.assertEqual(self.titles(checks)[:3], ["New", "Airing", "Ended"])
+        self.assertEqual(checks[0].cost, detection.NEW_SHOW_SECONDS)
+
+    def test_further_copies_add_their_plex_listing(self):
+        [single] = detection._schedule_checks(_visible("Mini"))
+        [(members, show_filter)] = _visible("Mini")
+        copies = members + [(members[0][0], SimpleNamespace(key=2, title="4K"))]
+        [double] = detection._schedule_checks([(copies, show_filter)])
+        self.assertAlmostEqual(double.cost - single.cost, detection.PLEX_SECONDS_PER_SEASON)
+
+
+if __name__ == "__main__":
+    unittest.main()
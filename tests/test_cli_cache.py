@@ -0,0 +1,60 @@
+"""TTL and LRU eviction of the CLI's SQLite response cache."""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import main
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "cache.sqlite3"
+
+    def open_cache(self, **kwargs):
+        cache = main.ResponseCache(self.path, **kwargs)
+        self.addCleanup(cache._conn.close)
+        return cache
+
+    def test_key_ignores_api_key_and_parameter_order(self):
+        self.assertEqual(
+            main.ResponseCache.make_key("https://tmdb/tv", {"query": "x", "api_key": "secret", "page": 1}),
+            main.ResponseCache.make_key("https://tmdb/tv", {"page": 1, "query": "x"}),
+        )
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.open_cache(ttl=60)
+        cache.put("a", {"id": 1})
+        self.assertEqual(cache.get("a"), {"id": 1})
+
+        with mock.patch.object(main.time, "time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.open_cache(ttl=3600)
+        now = time.time()
+        for offset, key in enumerate(("old", "used", "new")):
+            with mock.patch.object(main.time, "time", return_value=now + offset):
+                cache.put(key, {"key": key, "padding": "x" * 100})
+        with mock.patch.object(main.time, "time", return_value=now + 10):
+            cache.get("used")
+
+        sizes = dict(cache._conn.execute("SELECT key, size FROM responses"))
+        cache.max_bytes = sizes["used"] + sizes["new"]
+        cache._evict()
+
+        keys = {row[0] for row in cache._conn.execute("SELECT key FROM responses")}
+        self.assertEqual(keys, {"used", "new"})
+
+    def test_cache_is_shared_through_the_file(self):
+        self.open_cache().put("a", [1, 2])
+        self.assertEqual(self.open_cache().get("a"), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Concurrent show checks and the shared TMDB rate limiter of the CLI."""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+import main
+
+
+class ProcessShowsTest(unittest.TestCase):
+    def test_results_keep_input_order_with_several_jobs(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def process_show(show_name, seasons):
+            with lock:
+                running.append(show_name)
+                peak.append(len(running))
+            # Later shows finish first.
+            time.sleep(0.01 * (10 - seasons))
+            with lock:
+                running.remove(show_name)
+            return [], True, [f"checked {show_name}"]
+
+        shows = [(f"Show {index}", index) for index in range(10)]
+        with mock.patch.object(main, "process_show", side_effect=process_show):
+            results = list(main.process_shows(iter(shows), jobs=4))
+
+        self.assertEqual([result[0] for result in results], [name for name, _ in shows])
+        self.assertEqual(results[3], ("Show 3", [], True, ["checked Show 3"]))
+        self.assertGreater(max(peak), 1)
+        self.assertLessEqual(max(peak), 4)
+
+    def test_single_job_runs_in_the_calling_thread(self):
+        threads = set()
+
+        def process_show(show_name, seasons):
+            threads.add(threading.current_thread())
+            return [], False, []
+
+        with mock.patch.object(main, "process_show", side_effect=process_show):
+            results = list(main.process_shows([("A", {}), ("B", {})], jobs=1))
+
+        self.assertEqual([result[0] for result in results], ["A", "B"])
+        self.assertEqual(threads, {threading.current_thread()})
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_requests_beyond_the_burst_wait_for_tokens(self):
+        limiter = main.RateLimiter(rate=100, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # Two requests pass at once, the other four need 10 ms each.
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+
+    def test_zero_rate_disables_limiting(self):
+        limiter = main.RateLimiter(rate=0)
+        start = time.monotonic()
+        for _ in range(1000):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Streaming CLI mode and its NDJSON output."""
+
+import io
+import json
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+from unittest import mock
+
+import main
+
+
+def _process_show(show_name, seasons):
+    if show_name == "Unknown (2001)":
+        return [], False, []
+    episode = {
+        "show_name": show_name,
+        "season_num": 1,
+        "episode_num": 2,
+        "title": "Second",
+        "air_dt": datetime(2020, 1, 5),
+    }
+    return [episode], True, []
+
+
+class StreamingTest(unittest.TestCase):
+    def test_ndjson_lines_are_written_while_shows_are_enumerated(self):
+        consumed = []
+
+        def iter_plex_shows():
+            for name in ("Known (2020)", "Unknown (2001)"):
+                consumed.append(name)
+                yield name, {1: {1: {"title": "First"}}}
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch.object(main, "iter_plex_shows", iter_plex_shows), mock.patch.object(
+            main, "process_show", side_effect=_process_show
+        ), redirect_stdout(stdout), redirect_stderr(stderr):
+            main.main_streaming(ndjson=True)
+
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(
+            lines,
+            [
+                {
+                    "type": "missing",
+                    "show": "Known (2020)",
+                    "season": 1,
+                    "episode": 2,
+                    "title": "Second",
+                    "air_date": "2020-01-05",
+                    "aired": True,
+                },
+                {"type": "not_found", "show": "Unknown (2001)"},
+            ],
+        )
+        self.assertEqual(consumed, ["Known (2020)", "Unknown (2001)"])
+
+    def test_unaired_episodes_are_left_out_when_hidden(self):
+        def process_show(show_name, seasons):
+            missing, found, messages = _process_show(show_name, seasons)
+            missing[0]["air_dt"] = datetime(2999, 1, 1)
+            return missing, found, messages
+
+        stdout = io.StringIO()
+        with mock.patch.object(main, "iter_plex_shows", return_value=iter([("Known (2020)", {})])), mock.patch.object(
+            main, "process_show", side_effect=process_show
+        ), mock.patch.object(main, "HIDE_UNAIRED_EPISODES", True), redirect_stdout(stdout), redirect_stderr(
+            io.StringIO()
+        ):
+            main.main_streaming(ndjson=True)
+
+        self.assertEqual(stdout.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Saving the configuration form through /api/save_config."""
+
+import json
+import unittest
+
+from helpers import make_app
+from plex_tmdb.services import config as config_store
+
+
+SAVED = {
+    "plexUrl": "http://plex.local:32400",
+    "plexToken": "token",
+    "tmdbApiKey": "key",
+    "schedule": {"enabled": True, "intervalMinutes": 120},
+    "detectionShards": 4,
+    "plexTimeout": 20,
+}
+FORM = {
+    "plexUrl": "http://10.0.0.2:32400",
+    "plexToken": "token",
+    "plexUrls": [],
+    "tmdbApiKey": "key",
+    "tmdbLanguage": "de-DE",
+    "updatePosters": True,
+    "updateBackdrops": False,
+    "updateMetadata": True,
+    "updateRatings": True,
+}
+
+
+class SaveConfigApiTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self, config=SAVED).test_client()
+
+    def test_form_save_keeps_settings_the_form_does_not_show(self):
+        body = self.client.post("/api/save_config", json=FORM).get_json()
+        self.assertTrue(body["success"])
+
+        saved = json.loads(config_store.CONFIG_PATH.read_text(encoding="utf-8"))
+        self.assertEqual(saved, dict(SAVED, **FORM))
+        self.assertEqual(config_store.load_config()["schedule"], SAVED["schedule"])
+
+    def test_missing_required_field_is_not_saved(self):
+        body = self.client.post("/api/save_config", json=dict(FORM, tmdbApiKey="")).get_json()
+        self.assertFalse(body["success"])
+        self.assertEqual(config_store.load_config()["plexUrl"], SAVED["plexUrl"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Cached reads and atomic writes of ``config.json``."""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from plex_tmdb.services import config as config_store
+
+
+class ConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.path = self.directory / "config.json"
+        self.path.write_text(json.dumps({"plexUrl": "http://one"}), encoding="utf-8")
+
+        patcher = mock.patch.object(config_store, "CONFIG_PATH", self.path)
+        patcher.start()
+        self.addCleanup(config_store._refresh, force=True)
+        self.addCleanup(patcher.stop)
+        config_store._refresh(force=True)
+
+    def rewrite(self, config, mtime):
+        self.path.write_text(json.dumps(config), encoding="utf-8")
+        os.utime(self.path, (mtime, mtime))
+
+    def test_file_is_only_reread_when_its_mtime_changes(self):
+        mtime = self.path.stat().st_mtime
+        self.rewrite({"plexUrl": "http://two"}, mtime)
+        with mock.patch.object(config_store, "CHECK_INTERVAL_SECONDS", 0):
+            self.assertEqual(config_store.load_config(), {"plexUrl": "http://one"})
+
+            self.rewrite({"plexUrl": "http://two"}, mtime + 10)
+            self.assertEqual(config_store.load_config(), {"plexUrl": "http://two"})
+
+    def test_mtime_is_not_checked_within_the_interval(self):
+        self.rewrite({"plexUrl": "http://two"}, self.path.stat().st_mtime + 10)
+        with mock.patch.object(config_store, "CHECK_INTERVAL_SECONDS", 3600):
+            self.assertEqual(config_store.load_config(), {"plexUrl": "http://one"})
+
+    def test_save_replaces_the_file_keeps_its_mode_and_notifies(self):
+        os.chmod(self.path, 0o640)
+        changes = []
+        with mock.patch.object(config_store, "_subscribers", [lambda old, new: changes.append((old, new))]):
+            config_store.save_config({"plexUrl": "http://two"})
+
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"plexUrl": "http://two"})
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o640)
+        self.assertEqual(changes, [({"plexUrl": "http://one"}, {"plexUrl": "http://two"})])
+        self.assertEqual(list(self.directory.iterdir()), [self.path])
+
+    def test_update_keeps_keys_it_does_not_change(self):
+        config_store.save_config({"plexUrl": "http://one", "schedule": {"enabled": True}})
+        self.assertEqual(
+            config_store.update_config({"plexUrl": "http://two"}),
+            {"plexUrl": "http://two", "schedule": {"enabled": True}},
+        )
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8"))["schedule"], {"enabled": True})
+
+    def test_failed_save_leaves_the_file_and_cache_untouched(self):
+        with self.assertRaises(TypeError):
+            config_store.save_config({"plexUrl": object()})
+
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"plexUrl": "http://one"})
+        self.assertEqual(config_store.load_config(), {"plexUrl": "http://one"})
+        self.assertEqual(list(self.directory.iterdir()), [self.path])
+
+
+if __name__ == "__main__":
+    unittest.main()
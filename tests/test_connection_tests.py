@@ -0,0 +1,68 @@
+"""Concurrent, cached checks of /api/test_connections."""
+
+import time
+import unittest
+from unittest import mock
+
+from helpers import make_app
+from plex_tmdb.routes import config_api
+
+
+CREDENTIALS = {"plexUrl": "http://plex.local:32400", "plexToken": "token", "tmdbApiKey": "key"}
+
+
+def _slow_probe(result):
+    def probe(*args):
+        time.sleep(0.3)
+        return dict(result)
+
+    return probe
+
+
+class ConnectionTestsApiTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+        config_api._results.clear()
+        self.addCleanup(config_api._results.clear)
+        patches = [
+            mock.patch.object(config_api, "_test_plex", side_effect=_slow_probe({"success": True, "message": "plex"})),
+            mock.patch.object(config_api, "_test_tmdb", side_effect=_slow_probe({"success": True, "message": "tmdb"})),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **data):
+        return self.client.post("/api/test_connections", json=dict(CREDENTIALS, **data)).get_json()
+
+    def test_plex_and_tmdb_are_probed_at_the_same_time(self):
+        start = time.monotonic()
+        body = self.post()
+        self.assertLess(time.monotonic() - start, 0.55)
+
+        self.assertTrue(body["success"])
+        self.assertEqual((body["plex"]["message"], body["tmdb"]["message"]), ("plex", "tmdb"))
+        config_api._test_plex.assert_called_once_with(CREDENTIALS["plexUrl"], CREDENTIALS["plexToken"])
+
+    def test_results_are_reused_until_a_refresh_is_asked_for(self):
+        self.post()
+        body = self.post()
+        self.assertTrue(body["plex"]["cached"] and body["tmdb"]["cached"])
+        self.assertEqual(config_api._test_tmdb.call_count, 1)
+
+        body = self.post(refresh=True)
+        self.assertFalse(body["plex"]["cached"] or body["tmdb"]["cached"])
+        self.assertEqual(config_api._test_tmdb.call_count, 2)
+
+    def test_other_credentials_are_probed_again(self):
+        self.post()
+        self.assertFalse(self.post(tmdbApiKey="other")["tmdb"]["cached"])
+
+    def test_missing_credentials_are_rejected_without_probing(self):
+        body = self.client.post("/api/test_connections", json={"plexUrl": "http://plex"}).get_json()
+        self.assertFalse(body["success"])
+        config_api._test_plex.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Set-up of detection pool processes."""
+
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from helpers import add_show, make_app
+from models import db
+from plex_tmdb.tasks import detection
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class DetectionPoolTest(unittest.TestCase):
+    def test_importing_the_tasks_does_not_create_the_app(self):
+        script = "import plex_tmdb, plex_tmdb.tasks.detection; print('app' in vars(plex_tmdb))"
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_pool_process_reads_through_its_own_read_only_engine(self):
+        make_app(self)
+        show_id = add_show(7, "Alpha").id
+        db.session.commit()
+        url = db.engine.url.render_as_string(hide_password=False)
+
+        patches = [
+            mock.patch.object(detection, "_pool_sessions", None),
+            mock.patch.dict(detection._pool_config, clear=True),
+            mock.patch.object(detection.plex_connections, "get_configured_server"),
+            mock.patch.object(detection, "_union_episode_numbers", return_value={1: {2, 1}}),
+            mock.patch.object(detection, "_fetch_show_data"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with mock.patch.object(detection, "read_session", side_effect=AssertionError("uses the app")):
+            detection._init_pool_process(url, {"tmdbApiKey": "key"})
+            prepared = detection._prepare_show({"rating_keys": [1], "title": "Alpha", "year": 2000})
+
+        self.assertEqual(detection._pool_config, {"tmdbApiKey": "key"})
+        self.assertEqual((prepared["show_id"], prepared["fetched"]), (show_id, False))
+        self.assertEqual(prepared["plex_episodes"], {1: [1, 2]})
+        detection._fetch_show_data.assert_not_called()
+        session = detection._pool_sessions()
+        self.addCleanup(session.close)
+        with self.assertRaises(OperationalError):
+            session.execute(text("DELETE FROM shows"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Starting a detection run through /api/find_missing_episodes."""
+
+import unittest
+from unittest import mock
+
+from helpers import make_app
+from models import DetectionRun, Job
+from plex_tmdb import state
+from plex_tmdb.tasks import detection
+
+
+class DetectionStartTest(unittest.TestCase):
+    def setUp(self):
+        config = {"plexUrl": "http://plex", "plexToken": "token", "tmdbApiKey": "key"}
+        self.client = make_app(self, config=config).test_client()
+
+    def post(self, **options):
+        response = self.client.post("/api/find_missing_episodes", json=options)
+        return response.status_code, response.get_json()
+
+    def test_run_is_queued_for_the_workers(self):
+        status, body = self.post(library="1")
+        self.assertEqual(status, 200)
+        self.assertTrue(body["success"])
+        self.assertEqual(Job.query.one().detection_run_id, body["detection_run_id"])
+        self.assertEqual(state.get_current_detection_run(), body["detection_run_id"])
+
+    def test_invalid_budget_is_rejected_before_a_run_exists(self):
+        status, body = self.post(max_api_calls="lots")
+        self.assertEqual(status, 400)
+        self.assertEqual(DetectionRun.query.count(), 0)
+        self.assertFalse(state.is_task_running())
+
+    def test_run_that_cannot_be_queued_is_marked_failed(self):
+        with mock.patch.object(detection, "run_missing_episodes_task", side_effect=ValueError("bad shards")):
+            status, body = self.post()
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body["message"], "bad shards")
+        run = DetectionRun.query.one()
+        self.assertEqual((run.status, run.error_message), ("failed", "bad shards"))
+        self.assertIsNotNone(run.completed_at)
+        self.assertFalse(state.is_task_running())
+        self.assertIsNone(state.get_current_detection_run())
+        self.assertTrue(self.post()[1]["success"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Merging shows that share a TMDB ID."""
+
+import unittest
+from datetime import datetime, timedelta
+
+from helpers import add_completed_run, add_show, make_app
+from sqlalchemy import text
+
+from models import Episode, MissingEpisode, Show, db
+from plex_tmdb.services import stats
+
+
+class DuplicateMergeTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+        # Databases created before tmdb_id was unique can hold duplicates.
+        db.session.execute(text("DROP INDEX ix_shows_tmdb_id"))
+        db.session.execute(text("DROP INDEX ix_episodes_tmdb_id"))
+        now = datetime.utcnow()
+        self.primary = add_show(7, "Show", episodes=[(1, 1)], created_at=now - timedelta(days=2))
+        duplicate = add_show(7, "Show", episodes=[(1, 1), (1, 2)], created_at=now, poster_path="/poster.jpg")
+        add_completed_run([(duplicate, 1, 2)])
+        stats.reconcile()
+
+    def post(self, **payload):
+        return self.client.post("/api/cleanup_duplicate_shows", json=payload).get_json()
+
+    def test_dry_run_counts_without_changing_anything(self):
+        body = self.post(dry_run=True)
+
+        self.assertEqual(
+            {key: body[key] for key in ("shows_merged", "episodes_deleted", "episodes_moved", "missing_reassigned")},
+            {"shows_merged": 1, "episodes_deleted": 1, "episodes_moved": 1, "missing_reassigned": 1},
+        )
+        self.assertEqual(Show.query.count(), 2)
+
+    def test_duplicates_fold_into_the_oldest_show(self):
+        body = self.post()
+
+        self.assertTrue(body["success"])
+        self.assertEqual(body["cleaned_count"], 1)
+        db.session.expire_all()
+        show = Show.query.one()
+        self.assertEqual(show.id, self.primary.id)
+        self.assertEqual(show.poster_path, "/poster.jpg")
+        self.assertEqual(sorted(episode.episode_number for episode in show.episodes), [1, 2])
+        self.assertEqual({row.show_id for row in MissingEpisode.query}, {show.id})
+        self.assertEqual(stats.get_counters()["shows_count"], 1)
+        self.assertEqual(stats.get_counters()["episodes_count"], Episode.query.count())
+
+
+if __name__ == "__main__":
+    unittest.main()
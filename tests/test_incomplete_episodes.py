@@ -0,0 +1,50 @@
+"""/api/shows_with_incomplete_episodes."""
+
+import unittest
+
+from helpers import add_show, make_app
+
+from models import db
+
+
+class IncompleteEpisodesTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+
+    def test_counts_each_kind_of_gap_per_show(self):
+        sparse = add_show(1, "Sparse", episodes=[(1, 1), (1, 2), (1, 3)])
+        gaps = [(0, "x"), (None, ""), (7.5, "x")]
+        for episode, (rating, overview) in zip(sparse.episodes.order_by("episode_number"), gaps):
+            episode.vote_average, episode.overview = rating, overview
+        barely = add_show(2, "Barely", episodes=[(1, 1), (1, 2)])
+        for episode in barely.episodes:
+            episode.vote_average, episode.overview = 8.0, "x"
+        barely.episodes.first().title = ""
+        complete = add_show(3, "Complete", episodes=[(1, 1)])
+        complete.episodes.one().vote_average, complete.episodes.one().overview = 9.0, "x"
+        db.session.commit()
+
+        body = self.client.get("/api/shows_with_incomplete_episodes").get_json()
+
+        self.assertEqual(body["total_count"], 2)
+        self.assertEqual(
+            [
+                (show["title"], show["episode_count"], show["incomplete_episodes"], show["missing_data_types"])
+                for show in body["shows"]
+            ],
+            [("Sparse", 3, 2, "ratings (2), overviews (1)"), ("Barely", 2, 1, "titles (1)")],
+        )
+
+    def test_limit_pages_and_reports_the_full_total(self):
+        for tmdb_id in range(1, 6):
+            add_show(tmdb_id, f"Show {tmdb_id}")
+        db.session.commit()
+
+        body = self.client.get("/api/shows_with_incomplete_episodes?limit=2&offset=4").get_json()
+
+        self.assertEqual(body["total_count"], 5)
+        self.assertEqual([show["title"] for show in body["shows"]], ["Show 5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Claiming, leases and progress of the job queue."""
+
+import unittest
+from datetime import datetime, timedelta
+
+from helpers import make_app
+from models import DetectionRun, Job, db
+from plex_tmdb.services import jobs
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        make_app(self)
+
+    def expire_lease(self, job_id):
+        db.session.get(Job, job_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    def test_jobs_are_claimed_oldest_first_and_only_once(self):
+        first = jobs.enqueue("detection_shard", {"shard": 0}).id
+        second = jobs.enqueue("detection_shard", {"shard": 1}).id
+
+        self.assertEqual(jobs.claim("worker-a").id, first)
+        self.assertEqual(jobs.claim("worker-b").id, second)
+        self.assertIsNone(jobs.claim("worker-c"))
+
+    def test_claim_can_be_limited_to_kinds(self):
+        jobs.enqueue("detection_shard", {})
+        reprocess = jobs.enqueue("reprocessing", {}).id
+
+        self.assertEqual(jobs.claim("worker", kinds=["reprocessing"]).id, reprocess)
+        self.assertIsNone(jobs.claim("other", kinds=["reprocessing"]))
+
+    def test_expired_lease_is_taken_over_and_the_old_owner_loses_it(self):
+        job_id = jobs.enqueue("detection_shard", {}).id
+        jobs.claim("worker-a")
+        self.assertTrue(jobs.heartbeat(job_id, "worker-a"))
+        self.assertIsNone(jobs.claim("worker-b"))
+
+        self.expire_lease(job_id)
+        job = jobs.claim("worker-b")
+        self.assertEqual((job.id, job.attempts), (job_id, 2))
+
+        self.assertFalse(jobs.heartbeat(job_id, "worker-a"))
+        self.assertFalse(jobs.finish(job_id, "worker-a", "completed"))
+        self.assertTrue(jobs.finish(job_id, "worker-b", "completed", result={"shows": 3}))
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        self.assertEqual((job.status, job.progress), ("completed", 1.0))
+
+    def test_jobs_out_of_attempts_are_reaped(self):
+        run = DetectionRun(status="running")
+        db.session.add(run)
+        db.session.commit()
+        job_id = jobs.enqueue("detection_shard", {}, detection_run_id=run.id).id
+        for attempt in range(jobs.MAX_ATTEMPTS):
+            jobs.claim(f"worker-{attempt}")
+            self.expire_lease(job_id)
+
+        self.assertIsNone(jobs.claim("worker-last"))
+        self.assertEqual(jobs.reap_expired(), [run.id])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Job, job_id).status, "failed")
+
+    def test_run_progress_is_weighted_by_cost(self):
+        run = DetectionRun(status="running")
+        db.session.add(run)
+        db.session.commit()
+        cheap = jobs.enqueue("detection_shard", {}, detection_run_id=run.id).id
+        costly = jobs.enqueue("detection_shard", {}, detection_run_id=run.id).id
+        jobs.set_progress(cheap, 1.0, cost_estimate=10)
+        jobs.set_progress(costly, 0.0, cost_estimate=30)
+
+        fraction, _ = jobs.run_progress(run.id, "detection_shard")
+        self.assertAlmostEqual(fraction, 0.25)
+        self.assertEqual(jobs.cancel_queued(run.id), 2)
+        self.assertEqual(jobs.unfinished_count(run.id), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Filtering and keyset paging of /api/get_missing_episodes."""
+
+import unittest
+
+from helpers import add_completed_run, add_show, make_app
+
+
+class MissingEpisodesApiTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+        alpha = add_show(101, "Alpha", episodes=[(1, 1), (1, 2), (2, 1)])
+        self.twenty_four = add_show(1973, "24", episodes=[(1, 1)])
+        numbered = add_show(24, "Numbered", episodes=[(1, 1)])
+        self.run = add_completed_run(
+            [(alpha, 1, 1), (alpha, 1, 2), (alpha, 2, 1), (self.twenty_four, 1, 1), (numbered, 1, 1)]
+        )
+
+    def get(self, **params):
+        response = self.client.get("/api/get_missing_episodes", query_string=params)
+        return response.status_code, response.get_json()
+
+    def test_pages_follow_the_cursor_and_carry_the_total(self):
+        seen = []
+        params = {"limit": 2, "sort": "show"}
+        while True:
+            status, body = self.get(**params)
+            self.assertEqual(status, 200)
+            self.assertEqual(body["total_missing"], 5)
+            seen.extend(
+                (row["show_title"], row["season_number"], row["episode_number"]) for row in body["missing_episodes"]
+            )
+            if not body["next_cursor"]:
+                break
+            params["cursor"] = body["next_cursor"]
+
+        self.assertEqual(
+            seen,
+            [("24", 1, 1), ("Alpha", 1, 1), ("Alpha", 1, 2), ("Alpha", 2, 1), ("Numbered", 1, 1)],
+        )
+
+    def test_cursor_of_an_older_run_is_rejected(self):
+        _, body = self.get(limit=1)
+        add_completed_run([(self.twenty_four, 1, 1)])
+
+        status, body = self.get(limit=1, cursor=body["next_cursor"])
+        self.assertEqual(status, 409)
+        self.assertFalse(body["success"])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        self.assertEqual(self.get(cursor="not-a-cursor")[0], 400)
+
+    def test_numeric_show_matches_title_or_tmdb_id(self):
+        _, body = self.get(show="24")
+        self.assertEqual({row["show_title"] for row in body["missing_episodes"]}, {"24", "Numbered"})
+
+        _, body = self.get(show="alp", season=2)
+        self.assertEqual([row["show_title"] for row in body["missing_episodes"]], ["Alpha"])
+
+    def test_grouped_format_lists_each_show_once_with_episode_columns(self):
+        # Skips "24" so the page holds the first two of Alpha's three episodes.
+        cursor = self.get(sort="show", limit=1)[1]["next_cursor"]
+        _, body = self.get(format="grouped", sort="show", limit=2, cursor=cursor)
+        self.assertNotIn("missing_episodes", body)
+        self.assertEqual(body["total_missing"], 5)
+
+        [alpha] = body["shows"]
+        self.assertEqual((alpha["title"], alpha["tmdb_id"]), ("Alpha", 101))
+        self.assertEqual(alpha["episodes"]["season_number"], [1, 1])
+        self.assertEqual(alpha["episodes"]["episode_number"], [1, 2])
+        self.assertEqual(alpha["episodes"]["plex_library_name"], ["TV", "TV"])
+
+        self.assertEqual(self.get(format="table")[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
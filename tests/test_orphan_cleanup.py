@@ -0,0 +1,56 @@
+"""Chunked orphan cleanup, inline and as a queued job."""
+
+import unittest
+
+from helpers import add_completed_run, add_show, make_app
+
+from models import Job, MissingEpisode, db
+from plex_tmdb import state, worker
+from plex_tmdb.services import stats
+from plex_tmdb.tasks import maintenance
+
+
+class OrphanCleanupTest(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app(self)
+        self.client = self.app.test_client()
+        kept = add_show(1, "Kept", episodes=[(1, 1)])
+        run = add_completed_run([(kept, 1, 1)])
+        # Missing episode rows left behind by shows deleted without cascading.
+        for index in range(5):
+            db.session.add(
+                MissingEpisode(show_id=999, episode_id=999 + index, detection_run_id=run.id, plex_library_id="1")
+            )
+        db.session.commit()
+        stats.reconcile()
+
+    def test_orphans_are_deleted_in_chunks(self):
+        totals = []
+        deleted = maintenance.delete_orphaned_missing_episodes(chunk_size=2, pause=0, progress=totals.append)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(totals, [2, 4])
+        self.assertEqual(MissingEpisode.query.count(), 1)
+        self.assertEqual(stats.get_counters()["missing_episodes_count"], 1)
+
+    def test_background_cleanup_is_queued_for_a_worker(self):
+        body = self.client.post("/api/cleanup_orphaned_records", json={"background": True}).get_json()
+
+        self.assertTrue(body["success"])
+        job = Job.query.one()
+        self.assertEqual((job.kind, job.status), (maintenance.JOB_ORPHAN_CLEANUP, "queued"))
+        self.assertEqual(MissingEpisode.query.count(), 6)
+
+        worker.run(self.app, once=True)
+
+        db.session.expire_all()
+        self.assertEqual(Job.query.one().status, "completed")
+        self.assertEqual(Job.query.one().get_result(), {"cleaned_count": 5})
+        self.assertEqual(MissingEpisode.query.count(), 1)
+        status = state.get_task_status()
+        self.assertFalse(status["running"])
+        self.assertEqual(status["results"], {"task": "cleanup", "cleaned_count": 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Reuse and re-validation of cached Plex connections."""
+
+import unittest
+from unittest import mock
+
+from plex_tmdb.services import plex
+
+
+URL = "http://plex.local:32400"
+
+
+class PlexConnectionCacheTest(unittest.TestCase):
+    def setUp(self):
+        plex.invalidate()
+        self.addCleanup(plex.invalidate)
+        patcher = mock.patch.object(plex, "PlexServer", side_effect=lambda *args, **kwargs: mock.Mock())
+        self.PlexServer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expire(self):
+        for connection in plex._connections.values():
+            connection.checked_at -= plex.HEALTH_TTL_SECONDS + 1
+
+    def test_connection_is_reused_without_a_request_within_the_ttl(self):
+        server = plex.get_server(URL + "/", "token", timeout=5)
+
+        self.assertIs(plex.get_server(URL, "token", timeout=5), server)
+        self.assertEqual(self.PlexServer.call_count, 1)
+        server.query.assert_not_called()
+
+    def test_expired_connection_is_checked_with_identity(self):
+        server = plex.get_server(URL, "token", timeout=5)
+        self.expire()
+
+        self.assertIs(plex.get_server(URL, "token", timeout=5), server)
+        server.query.assert_called_once_with("/identity", timeout=5)
+
+    def test_unhealthy_connection_is_replaced(self):
+        server = plex.get_server(URL, "token", timeout=5)
+        server.query.side_effect = ConnectionError("gone")
+        self.expire()
+
+        self.assertIsNot(plex.get_server(URL, "token", timeout=5), server)
+        self.assertEqual(self.PlexServer.call_count, 2)
+
+    def test_other_tokens_get_their_own_connection(self):
+        self.assertIsNot(plex.get_server(URL, "one", timeout=5), plex.get_server(URL, "two", timeout=5))
+
+    def test_changing_plex_settings_drops_cached_connections(self):
+        server = plex.get_server(URL, "token", timeout=5)
+        plex._on_config_change({"plexToken": "token"}, {"plexToken": "token", "tmdbApiKey": "key"})
+        self.assertIs(plex.get_server(URL, "token", timeout=5), server)
+
+        plex._on_config_change({"plexToken": "token"}, {"plexToken": "other"})
+        self.assertIsNot(plex.get_server(URL, "token", timeout=5), server)
+
+
+if __name__ == "__main__":
+    unittest.main()
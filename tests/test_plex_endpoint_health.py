@@ -0,0 +1,66 @@
+"""Failover decisions of the multi-address Plex session."""
+
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from plex_tmdb.services import plex
+
+
+BASE_URL = "http://plex.local:32400"
+
+
+def _slow_response(method, url, *args, **kwargs):
+    time.sleep(0.05)
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b"<MediaContainer/>"
+    return response
+
+
+class EndpointHealthTest(unittest.TestCase):
+    def setUp(self):
+        self.session = plex._EndpointSession(BASE_URL, [BASE_URL, "http://10.0.0.2:32400"], "token", 5)
+        self.session._baseline = 0.001
+        self.session._reprobe_after = 0.0
+        patches = [
+            mock.patch.object(plex, "DEGRADED_MIN_SECONDS", 0.0),
+            mock.patch.object(requests.Session, "request", side_effect=_slow_response),
+            mock.patch.object(self.session, "select_endpoint"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_slow_large_response_does_not_fail_over(self):
+        for _ in range(5):
+            self.session.get(f"{BASE_URL}/library/sections/1/all?type=2")
+        self.session.select_endpoint.assert_not_called()
+
+    def test_slow_identity_request_fails_over(self):
+        self.session.get(f"{BASE_URL}/identity")
+        self.session.select_endpoint.assert_called_once_with()
+
+    def test_endpoint_slowing_down_during_a_run_is_noticed_by_the_periodic_check(self):
+        self.session._check_after = 0.0
+        self.session.get(f"{BASE_URL}/library/metadata/1/allLeaves")
+
+        self.assertEqual(requests.Session.request.call_args[0][:2], ("GET", f"{BASE_URL}/identity"))
+        self.session.select_endpoint.assert_called_once_with()
+
+        for _ in range(3):
+            self.session.get(f"{BASE_URL}/library/metadata/1/allLeaves")
+        self.assertEqual(requests.Session.request.call_count, 5)
+
+    def test_failing_periodic_check_fails_over(self):
+        self.session._check_after = 0.0
+        requests.Session.request.side_effect = [_slow_response("GET", ""), requests.ConnectionError("reset")]
+        self.session.get(f"{BASE_URL}/library/metadata/1/allLeaves")
+
+        self.session.select_endpoint.assert_called_once_with(exclude=[BASE_URL])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""The read-only session and SQLite tuning of ``plex_tmdb.database``."""
+
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from helpers import add_show, make_app
+from models import Show, db
+from plex_tmdb.database import read_session
+
+
+class ReadSessionTest(unittest.TestCase):
+    def test_read_session_cannot_write(self):
+        make_app(self)
+        session = read_session()
+        self.assertIsNot(session, db.session())
+
+        with self.assertRaises(OperationalError):
+            session.execute(text("INSERT INTO shows (tmdb_id, title) VALUES (1, 'x')"))
+        session.rollback()
+
+    def test_read_session_sees_committed_writes(self):
+        make_app(self)
+        self.assertEqual(db.session.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+
+        add_show(1, "Alpha")
+        db.session.commit()
+        self.assertEqual([show.title for show in read_session().query(Show)], ["Alpha"])
+
+    def test_untuned_database_reads_through_the_writer_session(self):
+        make_app(self, SQLITE_TUNING=False)
+        self.assertIs(read_session(), db.session())
+
+
+if __name__ == "__main__":
+    unittest.main()
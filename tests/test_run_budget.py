@@ -0,0 +1,73 @@
+"""Time and TMDB call budgets of detection runs."""
+
+import unittest
+from datetime import datetime, timedelta
+
+from helpers import make_app
+from models import DetectionRun, db
+from plex_tmdb.tasks import detection
+
+
+class RunBudgetTest(unittest.TestCase):
+    def setUp(self):
+        make_app(self)
+
+    def run_with(self, **fields):
+        run = DetectionRun(**fields)
+        db.session.add(run)
+        db.session.commit()
+        return run
+
+    def exhausted(self, run):
+        db.session.expire_all()
+        return db.session.get(DetectionRun, run.id).budget_exhausted
+
+    def test_options_are_validated(self):
+        self.assertEqual(
+            detection._detection_budget({"max_duration": "600", "max_api_calls": ""}),
+            {"max_duration_seconds": 600},
+        )
+        for options in ({"max_api_calls": "0"}, {"max_duration": "soon"}, {"max_duration": -5}):
+            with self.assertRaises(ValueError):
+                detection._detection_budget(options)
+
+    def test_unlimited_run_always_refreshes(self):
+        budget = detection.RunBudget(self.run_with(), workers=4)
+        self.assertFalse(budget.limited)
+        self.assertTrue(budget.allows_refresh("a", cached_seconds_left=10 ** 6))
+        self.assertFalse(budget.expired())
+
+    def test_call_budget_counts_refreshes_still_in_flight(self):
+        run = self.run_with(max_api_calls=10)
+        budget = detection.RunBudget(run, workers=2)
+
+        self.assertTrue(budget.allows_refresh("a", 0))
+        budget.record_calls("a", 4)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(DetectionRun, run.id).api_calls_made, 4)
+
+        # Each refresh in flight is expected to take as many calls as "a" did.
+        self.assertTrue(budget.allows_refresh("b", 0))
+        self.assertTrue(budget.allows_refresh("c", 0))
+        self.assertFalse(budget.allows_refresh("d", 0))
+        self.assertTrue(self.exhausted(run))
+        budget.record_calls("b", 1)
+        self.assertFalse(budget.allows_refresh("e", 0))
+
+    def test_time_is_held_back_for_checking_the_rest_from_cache(self):
+        run = self.run_with(max_duration_seconds=100)
+        budget = detection.RunBudget(run, workers=2)
+
+        self.assertTrue(budget.allows_refresh("a", cached_seconds_left=100))
+        self.assertFalse(budget.allows_refresh("b", cached_seconds_left=400))
+        self.assertTrue(self.exhausted(run))
+        self.assertFalse(budget.expired())
+
+    def test_run_past_its_deadline_has_expired(self):
+        run = self.run_with(max_duration_seconds=60, started_at=datetime.utcnow() - timedelta(minutes=5))
+        self.assertTrue(detection.RunBudget(run, workers=1).expired())
+        self.assertTrue(self.exhausted(run))
+
+
+if __name__ == "__main__":
+    unittest.main()
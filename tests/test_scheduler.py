@@ -0,0 +1,61 @@
+"""Quiet hours and the adaptive interval of scheduled detection."""
+
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from helpers import make_app
+from plex_tmdb import scheduler, state
+
+
+class QuietHoursTest(unittest.TestCase):
+    def settings(self, quiet_hours):
+        return scheduler.ScheduleSettings(quiet_hours=scheduler._parse_quiet_hours(quiet_hours))
+
+    def test_windows_are_parsed_and_invalid_ones_skipped(self):
+        self.assertEqual(scheduler._parse_quiet_hours("23:00-07:30"), ((1380, 450),))
+        self.assertEqual(scheduler._parse_quiet_hours(["9-17", "lunch", "24:00-1"]), ((540, 1020), (0, 60)))
+        self.assertEqual(scheduler._parse_quiet_hours(None), ())
+
+    def test_overnight_window_ends_the_next_morning(self):
+        settings = self.settings("23:00-07:00")
+        self.assertEqual(quiet(settings, 2026, 3, 1, 23, 30), datetime(2026, 3, 2, 7, 0))
+        self.assertEqual(quiet(settings, 2026, 3, 2, 6, 59), datetime(2026, 3, 2, 7, 0))
+        self.assertIsNone(quiet(settings, 2026, 3, 2, 7, 0))
+        self.assertIsNone(quiet(settings, 2026, 3, 2, 22, 59))
+
+    def test_daytime_window(self):
+        settings = self.settings(["09:00-17:00"])
+        self.assertEqual(quiet(settings, 2026, 3, 2, 9, 0), datetime(2026, 3, 2, 17, 0))
+        self.assertIsNone(quiet(settings, 2026, 3, 2, 17, 0))
+
+
+def quiet(settings, *moment):
+    return scheduler.quiet_until(settings, datetime(*moment))
+
+
+class ScheduleTest(unittest.TestCase):
+    def test_interval_shrinks_with_more_shows_due_within_its_bounds(self):
+        settings = scheduler.ScheduleSettings(
+            interval_minutes=360, min_interval_minutes=90, max_interval_minutes=1440, jitter_minutes=0
+        )
+        self.assertEqual(scheduler.next_delay(settings, 50), 360 * 60)
+        self.assertEqual(scheduler.next_delay(settings, 100), 180 * 60)
+        self.assertEqual(scheduler.next_delay(settings, 10 ** 6), 90 * 60)
+        self.assertEqual(scheduler.next_delay(settings, 0), 1440 * 60)
+
+    def test_run_due_in_quiet_hours_is_postponed_to_their_end(self):
+        schedule = {"enabled": True, "quietHours": "23:00-07:00", "jitterMinutes": 0}
+        make_app(self, config={"plexUrl": "http://plex", "schedule": schedule})
+        due = datetime(2026, 3, 1, 23, 30).timestamp()
+        state.set_next_scheduled_run(due - 60)
+
+        with mock.patch.object(scheduler, "_start_scheduled_detection") as start:
+            scheduler.tick(now=due)
+
+        start.assert_not_called()
+        self.assertEqual(state.get_next_scheduled_run(), datetime(2026, 3, 2, 7, 0).timestamp())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Matching Plex shows to TMDB ids and grouping copies of a series."""
+
+import unittest
+from types import SimpleNamespace
+
+from plex_tmdb.tasks import detection
+
+
+class _PartialShow:
+    """Plex show whose missing attributes would trigger a reload."""
+
+    def __init__(self, title, year=2011, guid=None, guids=None):
+        self.title = title
+        self.year = year
+        self.guid = guid
+        if guids is not None:
+            self.guids = [SimpleNamespace(id=value) for value in guids]
+
+    def __getattr__(self, name):
+        raise AssertionError(f"reloaded to read {name}")
+
+
+class TmdbGuidTest(unittest.TestCase):
+    def test_tmdb_id_is_read_from_the_guid_list(self):
+        show = _PartialShow("Show", guid="plex://show/1", guids=["imdb://tt0944947", "tmdb://1399"])
+        self.assertEqual(detection.tmdb_guid(show), 1399)
+
+    def test_legacy_agent_guid_is_read_without_a_reload(self):
+        show = _PartialShow("Show", guid="com.plexapp.agents.themoviedb://1399?lang=en")
+        self.assertEqual(detection.tmdb_guid(show), 1399)
+
+    def test_other_agents_have_no_tmdb_id(self):
+        self.assertIsNone(detection.tmdb_guid(_PartialShow("Show", guid="com.plexapp.agents.thetvdb://121361")))
+        self.assertIsNone(detection.tmdb_guid(_PartialShow("Show", guids=["tmdb://abc"])))
+
+
+class GroupShowsTest(unittest.TestCase):
+    def test_copies_are_grouped_by_tmdb_id_then_title_and_year(self):
+        tv, uhd, anime = (SimpleNamespace(key=key, title=title) for key, title in ((1, "TV"), (2, "4K"), (3, "Anime")))
+        new_agent = _PartialShow("Game of Thrones", guids=["tmdb://1399"])
+        renamed = _PartialShow("Juego de tronos", guids=["tmdb://1399"])
+        legacy = _PartialShow("Game of Thrones", guid="local://5")
+        remake = _PartialShow("Game of Thrones", year=2030, guid="local://6")
+        other = _PartialShow("Frieren", year=2023, guid="local://7")
+
+        groups = detection._group_shows(
+            [(new_agent, tv), (renamed, uhd), (legacy, uhd), (remake, tv), (other, anime)]
+        )
+
+        self.assertEqual(
+            {key: [(show.title, library.key) for show, library in members] for key, members in groups.items()},
+            {
+                "tmdb:1399": [("Game of Thrones", 1), ("Juego de tronos", 2), ("Game of Thrones", 2)],
+                "title:Game of Thrones:2030": [("Game of Thrones", 1)],
+                "title:Frieren:2023": [("Frieren", 3)],
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Checking a single show through /api/shows/<id>/missing."""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from plexapi.exceptions import NotFound
+
+from helpers import add_show, make_app
+from models import Show, db
+from plex_tmdb.routes import detection_api
+from show_filters import NO_FILTER
+
+
+def _plex_show(rating_key, title, year=2011, guid="plex://show/1", guids=()):
+    return SimpleNamespace(
+        ratingKey=rating_key,
+        title=title,
+        year=year,
+        guid=guid,
+        guids=[SimpleNamespace(id=value) for value in guids],
+        librarySectionID=1,
+        librarySectionTitle="TV",
+    )
+
+
+def _section(kind, found=None):
+    section = mock.Mock(type=kind)
+    if found is None:
+        section.getGuid.side_effect = NotFound("not in this library")
+    else:
+        section.getGuid.return_value = found
+    return section
+
+
+class ShowCheckTest(unittest.TestCase):
+    def setUp(self):
+        config = {"plexUrl": "http://plex", "plexToken": "token", "tmdbApiKey": "key"}
+        self.client = make_app(self, config=config).test_client()
+        add_show(1399, "Game of Thrones", year=2011)
+        db.session.commit()
+
+        self.plex = mock.Mock()
+        self.plex.library.search.return_value = []
+        self.sections = []
+        patches = [
+            mock.patch.object(detection_api.plex_connections, "get_configured_server", return_value=self.plex),
+            mock.patch.object(detection_api.plex_connections, "get_sections", side_effect=lambda plex: self.sections),
+            mock.patch.object(detection_api, "check_show_from_cache", return_value=[]),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_show_is_found_by_tmdb_guid_under_its_plex_title(self):
+        renamed = _plex_show(10, "Juego de tronos", guids=["tmdb://1399"])
+        self.sections = [_section("show", renamed), _section("show"), _section("movie")]
+
+        with mock.patch.object(detection_api, "load_filter_index") as load_filter_index:
+            load_filter_index.return_value.lookup_show.return_value = NO_FILTER
+            body = self.client.get("/api/shows/1399/missing").get_json()
+
+        self.assertTrue(body["success"])
+        self.assertEqual([library["plex_rating_key"] for library in body["libraries"]], [10])
+        self.sections[0].getGuid.assert_called_once_with("tmdb://1399")
+        self.sections[2].getGuid.assert_not_called()
+        load_filter_index.return_value.lookup_show.assert_called_once_with("Juego de tronos", 2011)
+
+    def test_title_search_only_adds_shows_of_legacy_agents(self):
+        self.sections = [_section("show")]
+        self.plex.library.search.return_value = [
+            _plex_show(20, "Game of Thrones", guid="com.plexapp.agents.themoviedb://1399?lang=en"),
+            _plex_show(21, "Game of Thrones", guid="com.plexapp.agents.thetvdb://121361?lang=en"),
+            _plex_show(22, "Game of Thrones", guids=["tmdb://999"]),
+            _plex_show(23, "Game of Thrones", year=1990, guid="local://23"),
+        ]
+
+        shows = detection_api._plex_shows_for(Show.query.one(), self.plex)
+        self.assertEqual([show.ratingKey for show in shows], [20, 21])
+
+    def test_show_missing_from_plex_is_not_found(self):
+        self.sections = [_section("show")]
+        response = self.client.get("/api/shows/1399/missing")
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
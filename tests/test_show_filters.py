@@ -0,0 +1,70 @@
+"""Compiled filters.json index."""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from show_filters import FilterIndex, load_filter_index, show_filter_key
+
+
+ENTRIES = [
+    {"show": "Black Mirror (2011)", "episodes": [-4]},
+    {"show": "Inside No. 9 (2014)", "episodes": [-6, 1, 3, -2]},
+    {"show": "How to Become a Mob Boss (2023)"},
+    {"show": "Inside No. 9 (2014)"},
+    {"show": "Undated", "episodes": [-1, 5]},
+]
+
+
+class FilterIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FilterIndex.compile(ENTRIES)
+
+    def test_negative_number_hides_a_season_or_selects_its_episodes(self):
+        black_mirror = self.index.lookup_show("Black Mirror", 2011)
+        self.assertTrue(black_mirror.is_season_hidden(4))
+        self.assertFalse(black_mirror.is_season_hidden(3))
+
+        inside = self.index.lookup_show("Inside No. 9", 2014)
+        self.assertTrue(inside.is_episode_hidden(6, 3))
+        self.assertFalse(inside.is_episode_hidden(6, 2))
+        self.assertTrue(inside.is_season_hidden(2))
+
+    def test_entry_without_episodes_hides_the_show(self):
+        self.assertTrue(self.index.lookup_show("How to Become a Mob Boss", 2023).hide_show)
+
+    def test_first_entry_for_a_show_wins(self):
+        self.assertFalse(self.index.lookup("Inside No. 9 (2014)").hide_show)
+
+    def test_lookup_falls_back_to_the_bare_title(self):
+        self.assertTrue(self.index.lookup_show("Undated", 1999).is_episode_hidden(1, 5))
+        self.assertFalse(self.index.lookup_show("Unlisted", 2000))
+
+    def test_dated_titles_are_not_dated_twice(self):
+        self.assertEqual(show_filter_key("Show (2020)", 2020), "Show (2020)")
+        self.assertEqual(show_filter_key("Show", 2020), "Show (2020)")
+        self.assertEqual(show_filter_key("Show", None), "Show")
+
+
+class LoadFilterIndexTest(unittest.TestCase):
+    def test_index_is_reused_until_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "filters.json"
+            path.write_text(json.dumps(ENTRIES[:1]), encoding="utf-8")
+            first = load_filter_index(path)
+            self.assertIs(load_filter_index(path), first)
+
+            path.write_text(json.dumps(ENTRIES), encoding="utf-8")
+            stat = path.stat()
+            os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+            self.assertEqual(len(load_filter_index(path)), 4)
+
+    def test_missing_file_gives_an_empty_index(self):
+        self.assertEqual(len(load_filter_index("/nonexistent/filters.json")), 0)
+        self.assertEqual(len(load_filter_index(None)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Row counters behind /api/database_stats."""
+
+import unittest
+
+from helpers import add_completed_run, add_show, make_app
+
+from models import Episode, db
+from plex_tmdb.services import stats
+
+
+class StatsCountersTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+
+    def stats(self):
+        return self.client.get("/api/database_stats").get_json()["stats"]
+
+    def test_counters_follow_inserts_and_deletes(self):
+        show = add_show(1, "Show", episodes=[(1, 1), (1, 2), (1, 3)])
+        add_completed_run([(show, 1, 1)])
+        run = add_completed_run([])
+        run.api_calls_saved = 7
+        db.session.commit()
+
+        counters = stats.get_counters()
+        self.assertEqual(
+            {name: counters[name] for name in stats.COUNTER_NAMES},
+            {
+                "shows_count": 1,
+                "episodes_count": 3,
+                "missing_episodes_count": 1,
+                "detection_runs_count": 2,
+                "api_calls_saved": 7,
+            },
+        )
+
+        db.session.delete(run)
+        db.session.commit()
+        self.assertEqual(stats.get_counters()["detection_runs_count"], 1)
+        self.assertEqual(stats.get_counters()["api_calls_saved"], 0)
+
+    def test_bulk_deletes_report_through_adjust(self):
+        add_show(1, "Show", episodes=[(1, 1), (1, 2)])
+        db.session.commit()
+
+        deleted = Episode.query.filter_by(episode_number=2).delete()
+        stats.adjust(episodes_count=-deleted)
+        db.session.commit()
+
+        self.assertEqual(stats.get_counters()["episodes_count"], 1)
+        self.assertEqual(stats.reconcile()["episodes_count"], 1)
+
+    def test_reconcile_corrects_drift(self):
+        add_show(1, "Show")
+        db.session.commit()
+        Episode.query.delete()
+        db.session.commit()
+        self.assertEqual(stats.get_counters()["episodes_count"], 2)
+
+        stats.reconcile()
+        self.assertEqual(self.stats()["episodes_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Task state shared through SQLite and the back-off of waiting for it."""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from plex_tmdb import state
+
+
+class TaskStateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "task_state.sqlite3"
+        self.addCleanup(state.configure, state._path)
+        state.configure(self.path)
+
+    def write_from_another_process(self, **changes):
+        """Change the status the way another process would: without waking local waiters."""
+        conn = sqlite3.connect(str(self.path), isolation_level=None)
+        try:
+            data, version = conn.execute("SELECT data, version FROM task_status WHERE id = 1").fetchone()
+            status = dict(json.loads(data), **changes)
+            conn.execute("UPDATE task_status SET data = ?, version = ? WHERE id = 1", (json.dumps(status), version + 1))
+        finally:
+            conn.close()
+
+    def test_only_one_task_runs_at_a_time(self):
+        self.assertTrue(state.start_task("first"))
+        self.assertFalse(state.start_task("second"))
+        self.assertEqual(state.get_task_status()["message"], "first")
+
+        state.stop_task("done")
+        self.assertTrue(state.start_task("second"))
+
+    def test_task_of_a_dead_process_is_reported_interrupted(self):
+        state.start_task("running")
+        with state._transaction(write=True) as conn:
+            conn.execute("UPDATE task_status SET owner = ?", (f"{state.socket.gethostname()}:12345",))
+
+        with mock.patch.object(state, "_pid_alive", return_value=False):
+            self.assertFalse(state.is_task_running())
+            self.assertEqual(state.get_task_status()["message"], "Task was interrupted")
+            self.assertTrue(state.start_task("again"))
+
+    def test_only_one_process_claims_a_scheduled_run(self):
+        state.set_next_scheduled_run(100.0)
+        self.assertTrue(state.claim_scheduled_run(100.0, 200.0))
+        self.assertFalse(state.claim_scheduled_run(100.0, 300.0))
+        self.assertEqual(state.get_next_scheduled_run(), 200.0)
+
+    def test_local_changes_wake_waiters_immediately(self):
+        version = state.get_task_update(0)[0]
+        threading.Timer(0.05, state.update_task_status, kwargs={"progress": 50}).start()
+
+        start = time.monotonic()
+        new_version, status, _ = state.wait_for_task_update(version, 0, timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(status["progress"], 50)
+
+    def test_changes_from_other_processes_are_polled_with_back_off(self):
+        version = state.get_task_update(0)[0]
+        waits = []
+        real_wait = state._changed.wait
+
+        def wait(timeout):
+            waits.append(timeout)
+            if len(waits) == 6:
+                self.write_from_another_process(progress=75)
+            real_wait(0)
+
+        with mock.patch.object(state._changed, "wait", side_effect=wait):
+            new_version, status, _ = state.wait_for_task_update(version, 0, timeout=60)
+
+        self.assertEqual(status["progress"], 75)
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(waits, [0.25, 0.5, 1.0, 2.0, 2.0, 2.0])
+
+    def test_each_process_opens_its_own_connection(self):
+        conn = state._connection()
+        self.assertIs(state._connection(), conn)
+        with mock.patch.object(os, "getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(state._connection(), conn)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Server-Sent Events stream of the task status."""
+
+import json
+import unittest
+from unittest import mock
+
+from helpers import make_app
+
+from plex_tmdb import state
+from plex_tmdb.routes import task_api
+
+
+def _events(body):
+    """``(event, data)`` pairs of an event-stream body, keepalives left out."""
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            parsed.append((fields.get("event"), json.loads(fields["data"])))
+    return parsed
+
+
+class TaskStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+
+    def test_stream_ends_once_the_task_is_not_running(self):
+        events = _events(self.client.get("/api/task_status/stream").get_data(as_text=True))
+        self.assertEqual([event for event, _ in events], ["status"])
+        self.assertFalse(events[0][1]["running"])
+
+    def test_long_stream_asks_the_page_to_reconnect_after_the_last_event(self):
+        state.start_task("Detecting")
+        state.publish_event("show", title="First", missing=1)
+        first = state.get_last_event_seq()
+        state.publish_event("show", title="Second", missing=2)
+
+        with mock.patch.object(task_api, "STREAM_MAX_SECONDS", 0.2), mock.patch.object(
+            task_api, "STREAM_MAX_UPDATES_PER_SECOND", 1000
+        ):
+            body = self.client.get(f"/api/task_status/stream?after={first}").get_data(as_text=True)
+
+        events = _events(body)
+        self.assertEqual([event for event, _ in events], ["show", "status", "reconnect"])
+        self.assertEqual(events[0][1]["title"], "Second")
+        self.assertEqual(events[-1][1], {"after": state.get_last_event_seq()})
+
+
+if __name__ == "__main__":
+    unittest.main()
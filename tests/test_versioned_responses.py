@@ -0,0 +1,46 @@
+"""ETags and the response cache keyed on the data version."""
+
+import gzip
+import unittest
+
+from helpers import add_completed_run, add_show, make_app
+
+from plex_tmdb import state
+
+
+class VersionedResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app(self).test_client()
+        show = add_show(1, "Show", episodes=[(1, number) for number in range(1, 40)])
+        add_completed_run([(show, 1, number) for number in range(1, 40)])
+
+    def test_matching_etag_gets_not_modified_until_the_data_changes(self):
+        first = self.client.get("/api/get_missing_episodes")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+
+        again = self.client.get("/api/get_missing_episodes", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.get_data(), b"")
+
+        state.bump_data_version()
+        changed = self.client.get("/api/get_missing_episodes", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    def test_large_bodies_are_compressed_for_clients_that_accept_it(self):
+        plain = self.client.get("/api/get_missing_episodes")
+        compressed = self.client.get("/api/get_missing_episodes", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.get_data()), plain.get_data())
+        self.assertNotEqual(compressed.headers["ETag"], plain.headers["ETag"])
+
+    def test_failed_responses_are_not_cached(self):
+        bad = self.client.get("/api/get_missing_episodes?sort=nonsense")
+        self.assertEqual(bad.status_code, 400)
+        self.assertNotIn("ETag", bad.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()